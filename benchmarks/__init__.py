@@ -0,0 +1 @@
+"""Бенчмарки движка интервью (запускаются вручную, без реального API)."""
@@ -0,0 +1,58 @@
+"""Пропускная способность ходов в зависимости от числа одновременных сессий.
+
+Все сессии крутятся в одном процессе на одном движке поверх фейковой модели
+с фиксированной задержкой, поэтому результат показывает, насколько хорошо
+async-API перекрывает ожидание I/O.
+
+Запуск:
+    python -m benchmarks.bench_async_sessions --sessions 1 10 50 100 200 --turns 3
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import PROFILE, disable_caches
+from benchmarks.fake_llm import FakeChatModel
+from interview_engine import InterviewEngine
+
+
+async def _run_session(engine: InterviewEngine, turns: int) -> int:
+    state = engine.start_interview(dict(PROFILE))
+    state = await engine.abootstrap_first_question(state)
+    for i in range(turns):
+        state = await engine.aprocess_user_input(state, f"Ответ кандидата #{i}")
+    return turns
+
+
+async def _measure(engine: InterviewEngine, sessions: int, turns: int) -> dict:
+    start = time.perf_counter()
+    done = await asyncio.gather(*(_run_session(engine, turns) for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    total_turns = sum(done)
+    return {
+        "sessions": sessions,
+        "turns": total_turns,
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(total_turns / elapsed, 1),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2, help="задержка одного вызова модели, с")
+    args = parser.parse_args()
+    disable_caches()
+
+    engine = InterviewEngine(llm=FakeChatModel(latency_s=args.latency))
+
+    print(f"{'sessions':>8} {'turns':>6} {'elapsed_s':>10} {'turns/s':>8}")
+    for sessions in args.sessions:
+        row = await _measure(engine, sessions, args.turns)
+        print(f"{row['sessions']:>8} {row['turns']:>6} {row['elapsed_s']:>10} {row['turns_per_s']:>8}")
+    await engine.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,269 @@
+"""Сквозной офлайн-бенчмарк: настоящий ChatOpenAI против локальной заглушки API.
+
+Заглушка (benchmarks/fake_openai_server.py) запускается отдельным процессом,
+движок ходит в неё по HTTP, как в настоящий API. Прогоняются полные интервью
+(planner → N ходов → manager), измеряются:
+
+- время старта: импорт движка, создание InterviewEngine и агентов (в чистом процессе);
+- накладные расходы хода вне модели: время хода минус время внутри вызовов
+  модели (`llm_ms` из trace-событий узлов);
+- рост памяти процесса (RSS) по ходам;
+- латентность финального фидбэка (ход с manager);
+- доля входных токенов из кэша промптов (заглушка имитирует кэш префикса провайдера).
+
+Результат сохраняется в JSON; с --compare печатается сравнение с прошлым прогоном.
+
+Запуск:
+    python -m benchmarks.bench_e2e --interviews 3 --turns 10
+    python -m benchmarks.bench_e2e --compare logs/bench/e2e_20250101-120000.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.common import PROFILE, disable_caches
+from benchmarks.fake_openai_server import free_port, start_fake_server_process
+from config import config
+from logger import InterviewLogger
+from metrics import percentile
+
+
+RESULTS_DIR = "./logs/bench"
+
+# Замер импорта и инициализации в чистом интерпретаторе
+_STARTUP_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+from interview_engine import InterviewEngine
+t1 = time.perf_counter()
+InterviewEngine().warm_up()
+t2 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "engine_init_ms": (t2 - t1) * 1000}))
+"""
+
+
+def _rss_mb() -> float:
+    """Текущий RSS процесса (Linux), иначе пиковый."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _summary(values: list[float]) -> dict:
+    if not values:
+        return {}
+    return {
+        "p50": round(percentile(values, 50), 2),
+        "p90": round(percentile(values, 90), 2),
+        "mean": round(statistics.mean(values), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def _measure_startup(env: dict, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _STARTUP_SCRIPT], env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        name: round(statistics.median(sample[name] for sample in samples), 1)
+        for name in ("import_ms", "engine_init_ms")
+    }
+
+
+def _turn_llm_ms(logger: InterviewLogger, turn_count: int) -> int:
+    # Фоновые свёртки summarizer идут между ходами и во время хода не ждутся
+    return sum(
+        event.get("llm_ms", 0)
+        for event in logger.trace_events
+        if event["phase"] == "end" and event["turn_count"] == turn_count and event["node"] != "summarizer"
+    )
+
+
+async def _run_interview(engine, turns: int, stream: bool, results: dict) -> None:
+    logger = InterviewLogger(output_filename=f"bench_e2e_{datetime.now().strftime('%H%M%S%f')}.json")
+    state = engine.start_interview(dict(PROFILE))
+    on_token = (lambda token: None) if stream else None
+    await engine.abootstrap_first_question(state, logger, on_token)
+
+    for i in range(turns + 1):
+        # Последний ход — просьба о фидбэке, её обрабатывает manager
+        answer = "стоп, давай фидбэк" if i == turns else f"Ответ кандидата #{i}: использую list comprehension."
+        start = time.perf_counter()
+        await engine.aprocess_user_input(state, answer, logger, on_token)
+        wall_ms = (time.perf_counter() - start) * 1000
+        if state["is_finished"]:
+            results["final_feedback_ms"].append(wall_ms)
+            break
+        results["turn_wall_ms"].append(wall_ms)
+        results["turn_overhead_ms"].append(wall_ms - _turn_llm_ms(logger, state["turn_count"]))
+        results["rss_mb"].append(_rss_mb())
+    engine.finish_interview(state, logger)
+    usage = logger.session_usage()
+    results["prompt_tokens"].append(usage.get("prompt_tokens", 0))
+    results["cached_tokens"].append(usage.get("cached_tokens", 0))
+
+
+async def _run_suite(args) -> dict:
+    from interview_engine import InterviewEngine
+
+    engine = InterviewEngine()
+    results = {
+        "turn_wall_ms": [], "turn_overhead_ms": [], "final_feedback_ms": [], "rss_mb": [],
+        "prompt_tokens": [], "cached_tokens": [],
+    }
+    rss_start = _rss_mb()
+    for _ in range(args.interviews):
+        await _run_interview(engine, args.turns, args.stream, results)
+    await engine.aclose()
+
+    total_turns = len(results["rss_mb"])
+    prompt_tokens, cached_tokens = sum(results["prompt_tokens"]), sum(results["cached_tokens"])
+    return {
+        "turn_wall_ms": _summary(results["turn_wall_ms"]),
+        "turn_overhead_ms": _summary(results["turn_overhead_ms"]),
+        "final_feedback_ms": _summary(results["final_feedback_ms"]),
+        # Заглушка имитирует кэш промптов провайдера: доля входа, пришедшая из кэша
+        "prompt_cache": {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "cached_share": round(cached_tokens / prompt_tokens, 4) if prompt_tokens else None,
+        },
+        "memory": {
+            "rss_start_mb": round(rss_start, 1),
+            "rss_end_mb": round(results["rss_mb"][-1], 1),
+            "growth_mb": round(results["rss_mb"][-1] - rss_start, 1),
+            # По ходам после первого интервью: без прогрева импортов и клиентов
+            "growth_per_turn_kb": round(
+                (results["rss_mb"][-1] - results["rss_mb"][args.turns - 1]) * 1024 / max(1, total_turns - args.turns),
+                1,
+            ) if args.interviews > 1 else None,
+        },
+    }
+
+
+def _flatten(data: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def _print_comparison(baseline: dict, current: dict) -> None:
+    old, new = _flatten(baseline["metrics"]), _flatten(current["metrics"])
+    print(f"\nСравнение с {baseline.get('git_commit')} ({baseline.get('timestamp')}):")
+    for name in sorted(new):
+        if name not in old:
+            continue
+        change = f"{(new[name] - old[name]) / old[name]:+.1%}" if old[name] else "-"
+        print(f"  {name:<32} {old[name]:>10} -> {new[name]:>10}  {change}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interviews", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=10, help="ходов до запроса фидбэка")
+    parser.add_argument("--latency", type=float, default=0.2, help="задержка ответа заглушки, с")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="пауза между токенами, с")
+    parser.add_argument("--model-latency", nargs="*", default=[], metavar="MODEL=SECONDS",
+                        help="задержка заглушки по моделям (профили Config.model_profiles)")
+    parser.add_argument("--fail-models", nargs="*", default=[], help="модели, для которых заглушка отвечает ошибкой")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов заглушки с ошибкой 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="доля медленных ответов заглушки")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="задержка медленных ответов, с")
+    parser.add_argument("--stream", action="store_true", help="стримить вопросы интервьюера")
+    parser.add_argument("--startup-runs", type=int, default=3)
+    parser.add_argument("--output", help="файл результата (по умолчанию logs/bench/e2e_<время>.json)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    port = free_port()
+    tmp_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    env = {
+        **os.environ,
+        "LLM_BASE_URL": f"http://127.0.0.1:{port}/v1",
+        "VSEGPT_API_KEY": "bench",
+        "TAVILY_API_KEY": "",
+        "CHECKPOINT_DB": os.path.join(tmp_dir, "checkpoints.sqlite"),
+        "LLM_CACHE_PATH": os.path.join(tmp_dir, "llm_cache.sqlite"),
+    }
+    config.llm_base_url = env["LLM_BASE_URL"]
+    config.vsegpt_api_key = env["VSEGPT_API_KEY"]
+    config.tavily_api_key = None
+    config.checkpoint_db_path = env["CHECKPOINT_DB"]
+    config.llm_cache_path = env["LLM_CACHE_PATH"]
+    disable_caches()
+
+    faults = {"error_rate": args.error_rate, "slow_rate": args.slow_rate, "slow_latency_s": args.slow_latency}
+    model_latency_s = {model: float(latency) for model, _, latency in (i.rpartition("=") for i in args.model_latency)}
+    server = start_fake_server_process(
+        port, args.latency, args.token_delay, model_latency_s=model_latency_s, fail_models=tuple(args.fail_models),
+        faults=faults,
+    )
+    try:
+        startup = _measure_startup(env, args.startup_runs)
+        metrics = {"startup_ms": startup, **asyncio.run(_run_suite(args))}
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {
+        "benchmark": "e2e",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "params": {
+            "interviews": args.interviews,
+            "turns": args.turns,
+            "latency_s": args.latency,
+            "token_delay_s": args.token_delay,
+            "model_latency_s": model_latency_s,
+            "fail_models": args.fail_models,
+            "faults": faults,
+            "stream": args.stream,
+            "pipeline_observer": config.pipeline_observer,
+        },
+        "metrics": metrics,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+    print(f"\nРезультат сохранён в {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            _print_comparison(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Латентность финального фидбэка: холодный путь против черновика (Config.feedback_draft_enabled).
+
+Интервью из N ходов с паузой «кандидат печатает» между ходами (за неё
+успевают фоновые задачи), затем "стоп". Меряется время хода со "стоп" и
+число вызовов модели в manager. С черновиком время зависит от того, сколько
+ходов прошло после последнего черновика: если новых наблюдений нет, manager
+отдаёт черновик без вызова модели, иначе уточняет его одним вызовом.
+
+Запуск:
+    python -m benchmarks.bench_feedback_draft --turns 6 7 8 --latency 0.3
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import PROFILE, disable_caches
+from benchmarks.fake_llm import FakeChatModel
+from config import config
+from interview_engine import InterviewEngine
+from logger import InterviewLogger
+
+
+async def _stop_latency(draft: bool, turns: int, latency: float, think_time: float) -> dict:
+    config.feedback_draft_enabled = draft
+    engine = InterviewEngine(llm=FakeChatModel(latency_s=latency))
+    logger = InterviewLogger(output_filename=f"bench_feedback_draft_{time.time_ns()}.json")
+    state = engine.start_interview(dict(PROFILE))
+    await engine.abootstrap_first_question(state, logger)
+    for i in range(turns):
+        await engine.aprocess_user_input(state, f"Ответ кандидата #{i}", logger)
+        await asyncio.sleep(think_time)
+
+    start = time.perf_counter()
+    await engine.aprocess_user_input(state, "стоп", logger)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    await engine.aclose()
+
+    manager = next(e for e in logger.trace_events if e["node"] == "manager" and e["phase"] == "end")
+    return {"stop_ms": round(elapsed_ms), "manager_ms": manager["duration_ms"], "manager_llm_calls": manager.get("llm_calls", 0)}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[6, 7, 8], help="ходов до \"стоп\"")
+    parser.add_argument("--latency", type=float, default=0.3, help="задержка одного вызова модели, с")
+    parser.add_argument("--think-time", type=float, default=None, help="пауза между ходами, с (по умолчанию 3 × latency)")
+    parser.add_argument("--every", type=int, default=config.feedback_draft_every_turns, help="черновик каждые N ходов")
+    args = parser.parse_args()
+    think_time = args.think_time if args.think_time is not None else 3 * args.latency
+    disable_caches()
+    # Чекпоинты в памяти: на диск ходы не пишутся
+    config.checkpoint_db_path = None
+    config.feedback_draft_every_turns = args.every
+
+    print(f"{'turns':>5} {'mode':>6} {'stop_ms':>8} {'manager_ms':>10} {'llm_calls':>9}")
+    for turns in args.turns:
+        for draft in (False, True):
+            row = await _stop_latency(draft, turns, args.latency, think_time)
+            mode = "draft" if draft else "cold"
+            print(f"{turns:>5} {mode:>6} {row['stop_ms']:>8} {row['manager_ms']:>10} {row['manager_llm_calls']:>9}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
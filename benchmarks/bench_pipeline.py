@@ -0,0 +1,62 @@
+"""Латентность хода: последовательный режим против pipeline-режима observer.
+
+Латентность считается по trace-событиям wrap_node: в последовательном режиме
+ход — это observer + interviewer, в pipeline-режиме — узел "turn".
+
+Запуск:
+    python -m benchmarks.bench_pipeline --turns 10
+"""
+import argparse
+import asyncio
+import statistics
+
+from benchmarks.common import PROFILE, disable_caches
+from benchmarks.fake_llm import FakeChatModel
+from interview_engine import InterviewEngine
+
+
+def turn_latencies(trace_events: list[dict]) -> list[int]:
+    """Суммарная длительность узлов хода (по turn_count) из trace-событий."""
+    per_turn: dict[int, int] = {}
+    for event in trace_events:
+        if event["phase"] != "end" or not event.get("turn_count"):
+            continue
+        if event["node"] in ("observer", "interviewer", "turn") and event["duration_ms"] is not None:
+            # В pipeline-режиме вложенные observer/interviewer уже учтены в "turn"
+            if event["node"] != "turn" and any(
+                e["node"] == "turn" and e["turn_count"] == event["turn_count"] for e in trace_events
+            ):
+                continue
+            per_turn[event["turn_count"]] = per_turn.get(event["turn_count"], 0) + event["duration_ms"]
+    return [per_turn[turn] for turn in sorted(per_turn)]
+
+
+async def _run(pipeline: bool, turns: int, latency: float) -> list[int]:
+    engine = InterviewEngine(llm=FakeChatModel(latency_s=latency), pipeline_observer=pipeline)
+    state = engine.start_interview(dict(PROFILE))
+    state = await engine.abootstrap_first_question(state)
+    for i in range(turns):
+        state = await engine.aprocess_user_input(state, f"Ответ кандидата #{i}")
+    await engine.aclose()
+    return turn_latencies(engine.logger.trace_events)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="задержка одного вызова модели, с")
+    args = parser.parse_args()
+    disable_caches()
+
+    sequential = await _run(False, args.turns, args.latency)
+    pipelined = await _run(True, args.turns, args.latency)
+
+    seq_p50 = statistics.median(sequential)
+    pipe_p50 = statistics.median(pipelined)
+    print(f"sequential: p50={seq_p50:.0f} ms mean={statistics.mean(sequential):.0f} ms")
+    print(f"pipelined:  p50={pipe_p50:.0f} ms mean={statistics.mean(pipelined):.0f} ms")
+    print(f"reduction:  {100 * (1 - pipe_p50 / seq_p50):.0f}%")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""Стабильность префикса промптов между ходами (кэш промптов провайдера, prompt_assembly.py).
+
+Узлы observer и interviewer вызываются по ходам одного интервью с
+агентами-заглушками, которые запоминают запрос. Сложность и оценка
+наблюдателя меняются от хода к ходу, как в настоящем интервью. Для каждого
+запроса считается доля, совпадающая побайтно с началом предыдущего запроса того
+же узла: эту часть провайдер может взять из кэша. Отдельно — та же доля целыми
+блоками по ~128 токенов, как кэширует OpenAI.
+
+Запуск:
+    python -m benchmarks.bench_prompt_prefix --turns 10
+"""
+import argparse
+import asyncio
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.common import PROFILE
+from nodes import interviewer_node, observer_node
+from nodes.observer_node import observer_system_prompt
+from prompts import interviewer_prompt
+
+
+PLAN = " ".join(
+    f"{i}) Тема {i}: вопросы по теме с уточнениями, ожидаемые ответы и критерии оценки для уровня Junior."
+    for i in range(1, 16)
+)
+# Размер блока кэша провайдера в символах (~128 токенов по 4 символа)
+BLOCK_CHARS = 512
+
+
+class _CapturingAgent:
+    """Агент-заглушка: запоминает сообщения запроса вместе с системным промптом роли."""
+
+    def __init__(self, role_prompt: str, reply: str):
+        self.role_prompt = role_prompt
+        self.reply = reply
+        self.requests: list[str] = []
+
+    async def ainvoke(self, inputs: dict) -> dict:
+        # create_agent ставит системный промпт роли первым сообщением
+        parts = [f"\0system\0{self.role_prompt}"]
+        parts += [f"\0{message.type}\0{message.content}" for message in inputs["messages"]]
+        self.requests.append("".join(parts))
+        return {"messages": [*inputs["messages"], AIMessage(content=self.reply)]}
+
+
+def _prefix_shares(requests: list[str]) -> tuple[float, float]:
+    """Средняя доля общего с предыдущим запросом префикса: посимвольно и целыми блоками."""
+    exact, blocks = [], []
+    for previous, current in zip(requests, requests[1:]):
+        common = len(os.path.commonprefix([previous, current]))
+        exact.append(common / len(current))
+        blocks.append(common // BLOCK_CHARS * BLOCK_CHARS / len(current))
+    return sum(exact) / len(exact), sum(blocks) / len(blocks)
+
+
+async def _run(turns: int) -> dict[str, _CapturingAgent]:
+    observer = _CapturingAgent(observer_system_prompt(), "Ответ частично правильный. Пробелы: GIL.")
+    interviewer = _CapturingAgent(interviewer_prompt, "Расскажите, как работает сборщик мусора в Python?")
+    state = {
+        "candidate_profile": PROFILE,
+        "interview_plan": PLAN,
+        "messages": [AIMessage(content="Расскажите о себе и своём опыте с Python.")],
+        "internal_thoughts": [],
+        "difficulty_level": 2,
+    }
+    for turn in range(turns):
+        state["messages"].append(HumanMessage(content=f"Ответ кандидата #{turn}: использую генераторы и asyncio."))
+        out = await observer_node(state, observer)
+        # Оценка и сложность меняются от хода к ходу
+        state["internal_thoughts"].append(f"[Observer]: Оценка {turn % 10}/10, ход {turn}.\n")
+        state["difficulty_level"] = 1 + (turn % 5)
+        state.update({key: value for key, value in out.items() if key == "observer_instructions"})
+        out = await interviewer_node(state, interviewer)
+        state["messages"].extend(out["messages"])
+    return {"observer": observer, "interviewer": interviewer}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args()
+
+    agents = asyncio.run(_run(args.turns))
+    print(f"{'node':<12} {'calls':>5} {'mean_chars':>10} {'prefix_share':>12} {'block_share':>11}")
+    for name, agent in agents.items():
+        exact, blocks = _prefix_shares(agent.requests)
+        mean_chars = sum(map(len, agent.requests)) // len(agent.requests)
+        print(f"{name:<12} {len(agent.requests):>5} {mean_chars:>10} {exact:>12.1%} {blocks:>11.1%}")
+
+
+if __name__ == "__main__":
+    main()
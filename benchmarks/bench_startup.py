@@ -0,0 +1,84 @@
+"""Время старта CLI: импорты и инициализация движка по отдельности.
+
+Каждый замер — в чистом интерпретаторе (модули не закэшированы в sys.modules):
+
+- main_import_ms — импорт main.py, после него CLI уже спрашивает профиль кандидата;
+- engine_import_ms — импорт interview_engine (langchain_core, langgraph, узлы);
+- engine_init_ms — конструктор InterviewEngine (агенты ещё не созданы);
+- warm_up_ms — InterviewEngine.warm_up: langchain_openai, create_agent, граф;
+- engine_ready_ms — от старта фоновой загрузки в main до готового движка:
+  столько кандидат должен заполнять профиль, чтобы не ждать инициализацию.
+
+Запуск:
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --runs 5 --with-tavily
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+_STAGES_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from interview_engine import InterviewEngine
+t2 = time.perf_counter()
+engine = InterviewEngine()
+t3 = time.perf_counter()
+engine.warm_up()
+t4 = time.perf_counter()
+print(json.dumps({
+    "main_import_ms": (t1 - t0) * 1000,
+    "engine_import_ms": (t2 - t1) * 1000,
+    "engine_init_ms": (t3 - t2) * 1000,
+    "warm_up_ms": (t4 - t3) * 1000,
+}))
+"""
+
+# Фоновая загрузка как в CLI: main импортирован, движок грузится в потоке
+_BACKGROUND_SCRIPT = """
+import json, time
+import main
+t0 = time.perf_counter()
+main._start_engine_loading().result()
+print(json.dumps({"engine_ready_ms": (time.perf_counter() - t0) * 1000}))
+"""
+
+
+def _run(script: str, env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--with-tavily", action="store_true", help="с ключом Tavily (warm_up создаёт клиент поиска)")
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "VSEGPT_API_KEY": os.environ.get("VSEGPT_API_KEY") or "bench",
+        "TAVILY_API_KEY": "bench" if args.with_tavily else "",
+        "CHECKPOINT_DB": "",
+        "LLM_CACHE_PATH": os.path.join(tempfile.mkdtemp(prefix="bench_startup_"), "llm_cache.sqlite"),
+    }
+    samples = [{**_run(_STAGES_SCRIPT, env), **_run(_BACKGROUND_SCRIPT, env)} for _ in range(args.runs)]
+
+    print(f"{'stage':<18} {'median_ms':>10} {'min_ms':>8} {'max_ms':>8}")
+    for name in samples[0]:
+        values = [sample[name] for sample in samples]
+        print(f"{name:<18} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
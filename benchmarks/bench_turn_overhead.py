@@ -0,0 +1,65 @@
+"""Накладные расходы хода на ранних и поздних ходах длинного интервью.
+
+Модель отвечает без задержки, поэтому время хода — это работа движка и графа:
+чтение и запись чекпоинта, сборка контекста, обработка обновлений. В граф на
+каждом ходе уходит только новое сообщение, история читается из чекпоинта.
+
+Запуск:
+    python -m benchmarks.bench_turn_overhead --turns 100 --answer-chars 1500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import PROFILE, disable_caches
+from benchmarks.fake_llm import FakeChatModel
+from config import config
+from interview_engine import InterviewEngine
+
+
+async def _run(checkpoint_db_path: str | None, turns: int, answer_chars: int) -> list[float]:
+    config.checkpoint_db_path = checkpoint_db_path
+    engine = InterviewEngine(llm=FakeChatModel(latency_s=0, token_delay_s=0))
+    state = engine.start_interview(dict(PROFILE))
+    state = await engine.abootstrap_first_question(state)
+
+    answer = ("def solve(items):\n    return sorted(set(items))\n" * answer_chars)[:answer_chars]
+    durations = []
+    for i in range(turns):
+        start = time.perf_counter()
+        state = await engine.aprocess_user_input(state, f"Ответ #{i}\n{answer}")
+        durations.append((time.perf_counter() - start) * 1000)
+    await engine.aclose()
+    return durations
+
+
+def _window_ms(durations: list[float], turn: int, width: int = 5) -> float:
+    """Медиана по окну из width ходов, заканчивающемуся на ходе turn (нумерация с 1)."""
+    return statistics.median(durations[max(0, turn - width):turn])
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--answer-chars", type=int, default=1500, help="длина ответа кандидата, символов")
+    args = parser.parse_args()
+    disable_caches()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        runs = {
+            "sqlite": await _run(os.path.join(tmp_dir, "checkpoints.sqlite"), args.turns, args.answer_chars),
+            "memory": await _run(None, args.turns, args.answer_chars),
+        }
+
+    print(f"{'checkpointer':>12} {'turn 5, ms':>11} {f'turn {args.turns}, ms':>12} {'growth':>7}")
+    for name, durations in runs.items():
+        early = _window_ms(durations, 5)
+        late = _window_ms(durations, args.turns)
+        print(f"{name:>12} {early:>11.1f} {late:>12.1f} {late / early:>6.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
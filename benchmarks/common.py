@@ -0,0 +1,11 @@
+"""Общее для бенчмарков: профиль кандидата и настройки замеров."""
+from config import config
+
+
+PROFILE = {"name": "Кандидат", "role": "Python Developer", "grade": "Junior", "exp": "1 год"}
+
+
+def disable_caches() -> None:
+    """Отключает кэши ответов LLM и планов: бенчмарки меряют сами вызовы модели."""
+    config.llm_cache_enabled = False
+    config.plan_cache_enabled = False
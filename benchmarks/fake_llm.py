@@ -0,0 +1,131 @@
+"""Фейковая чат-модель с настраиваемой задержкой для офлайн-бенчмарков."""
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+def scripted_reply(messages: list[BaseMessage]) -> str:
+    """Подбирает правдоподобный ответ по системному промпту роли."""
+    system = " ".join(str(m.content) for m in messages if m.type == "system").lower()
+    if "ты — планировщик" in system:
+        return "План: 1) Python basics 2) ООП 3) асинхронность 4) базы данных."
+    if "ты — профессиональный технический интервьюер" in system:
+        return "Расскажите, как работает сборщик мусора в Python?"
+    if "ты — менеджер" in system:
+        return "Итог: Junior+. Сильные стороны: основы Python. Пробелы: asyncio."
+    if "ты — наблюдатель" in system or "суммирует" in system:
+        return "Ответ в целом правильный, но неполный. Пробелы: GIL, asyncio."
+    return "Расскажите, как работает сборщик мусора в Python?"
+
+
+# Структурированная оценка observer (ответ на response_format или вызов инструмента схемы)
+SCRIPTED_VERDICT = {
+    "score": 6,
+    "correctness": "partial",
+    "gaps": ["GIL", "asyncio"],
+    "next_action": "clarify",
+    "finished": False,
+    "comment": "Ответ в целом правильный, но неполный.",
+}
+
+
+def structured_reply(request: dict) -> tuple[str, list[dict]]:
+    """Контент и вызовы инструментов для запроса со структурированным выводом.
+
+    request — параметры вызова в формате OpenAI: response_format (json_schema)
+    или tools (ToolStrategy: модель вызывает инструмент схемы).
+    """
+    if request.get("response_format"):
+        return json.dumps(SCRIPTED_VERDICT, ensure_ascii=False), []
+    if request.get("tools"):
+        name = request["tools"][0]["function"]["name"]
+        return "", [{"name": name, "args": dict(SCRIPTED_VERDICT), "id": f"call_{uuid.uuid4().hex[:12]}"}]
+    return "", []
+
+
+def approx_usage(messages: list[BaseMessage], reply: str) -> dict:
+    """Приблизительный usage_metadata (4 символа на токен), как у настоящего провайдера."""
+    input_tokens = sum(len(str(m.content)) for m in messages) // 4
+    output_tokens = len(reply) // 4
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+def _reply_message(messages: list[BaseMessage], request: dict) -> AIMessage:
+    content, tool_calls = structured_reply(request)
+    reply = content or ("" if tool_calls else scripted_reply(messages))
+    usage = approx_usage(messages, reply or json.dumps([c["args"] for c in tool_calls], ensure_ascii=False))
+    return AIMessage(content=reply, tool_calls=tool_calls, usage_metadata=usage)
+
+
+class FakeChatModel(BaseChatModel):
+    """Возвращает заготовленные ответы, имитируя сетевую задержку."""
+
+    latency_s: float = 0.2
+    # Пауза между токенами при стриминге
+    token_delay_s: float = 0.01
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-interview-chat"
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Any = None, **kwargs: Any):
+        # Нужен агентам со структурированным выводом (ProviderStrategy/ToolStrategy)
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency_s)
+        return ChatResult(generations=[ChatGeneration(message=_reply_message(messages, kwargs))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency_s)
+        return ChatResult(generations=[ChatGeneration(message=_reply_message(messages, kwargs))])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_s)
+        message = _reply_message(messages, kwargs)
+        if message.tool_calls:
+            # Вызов инструмента приходит одним чанком
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"], ensure_ascii=False), "id": c["id"], "index": i}
+                    for i, c in enumerate(message.tool_calls)
+                ],
+                usage_metadata=message.usage_metadata,
+            ))
+            return
+        reply = message.content
+        for token in reply.split(" "):
+            await asyncio.sleep(self.token_delay_s)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        # Usage приходит последним чанком, как у OpenAI со stream_usage
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=approx_usage(messages, reply)))
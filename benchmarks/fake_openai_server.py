@@ -0,0 +1,246 @@
+"""Локальная заглушка OpenAI-совместимого API (`/v1/chat/completions`).
+
+Отвечает заготовленными репликами ролей (см. fake_llm.scripted_reply) с
+настраиваемой задержкой, поддерживает стриминг (SSE), usage в последнем
+чанке (`stream_options.include_usage`) и структурированный вывод
+(`response_format` json_schema или вызов переданного инструмента). Позволяет гонять настоящий ChatOpenAI
+без сети: `LLM_BASE_URL=http://127.0.0.1:8999/v1`.
+
+Задержку можно задать по моделям (профили моделей агентов, Config.model_profiles),
+а модели из --fail-models отвечают ошибкой 500 (проверка запасной модели).
+Для проверки resilience.py доля запросов может отвечать 503 (--error-rate) или
+медленным хвостом (--slow-rate, --slow-latency).
+
+Кэш промптов провайдера имитируется блоками по ~128 токенов, как у OpenAI:
+самое длинное начало запроса (модель, инструменты, схема ответа, сообщения),
+уже встречавшееся раньше, возвращается в usage.prompt_tokens_details.cached_tokens
+(отключается --no-prefix-cache).
+
+Запуск:
+    python -m benchmarks.fake_openai_server --port 8999 --latency 0.3 --token-delay 0.01
+    python -m benchmarks.fake_openai_server --model-latency google/gemini-2.5-flash-lite=0.1 --fail-models broken
+    python -m benchmarks.fake_openai_server --error-rate 0.1 --slow-rate 0.05 --slow-latency 3
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import OrderedDict
+
+from aiohttp import web
+from langchain_core.messages import convert_to_messages
+
+from benchmarks.fake_llm import approx_usage, scripted_reply, structured_reply
+
+
+# Имитация кэша промптов: размер блока (4 символа на токен, как в approx_usage) и сколько блоков помнить
+PREFIX_CACHE_BLOCK_CHARS = 512
+PREFIX_CACHE_SIZE = 100_000
+
+
+def _cached_tokens(app: web.Application, body: dict, messages) -> int:
+    """Токены самого длинного уже встречавшегося префикса запроса, целыми блоками."""
+    cache: OrderedDict | None = app["prefix_cache"]
+    if cache is None:
+        return 0
+    # Перед сообщениями — то, что провайдер тоже ставит в начало промпта
+    head = json.dumps([body.get("model"), body.get("tools"), body.get("response_format")], ensure_ascii=False)
+    text = head + "".join(f"\0{message.type}\0{message.content}" for message in messages)
+    digest = hashlib.sha1()
+    cached_chars = 0
+    for end in range(PREFIX_CACHE_BLOCK_CHARS, len(text) + 1, PREFIX_CACHE_BLOCK_CHARS):
+        digest.update(text[end - PREFIX_CACHE_BLOCK_CHARS:end].encode("utf-8"))
+        key = digest.hexdigest()
+        if key in cache:
+            cache.move_to_end(key)
+            cached_chars = end
+        else:
+            cache[key] = True
+    while len(cache) > PREFIX_CACHE_SIZE:
+        cache.popitem(last=False)
+    return max(0, cached_chars - len(head)) // 4
+
+
+def _usage(messages, reply: str, cached_tokens: int = 0) -> dict:
+    usage = approx_usage(messages, reply)
+    return {
+        "prompt_tokens": usage["input_tokens"],
+        "completion_tokens": usage["output_tokens"],
+        "total_tokens": usage["total_tokens"],
+        "prompt_tokens_details": {"cached_tokens": min(cached_tokens, usage["input_tokens"])},
+    }
+
+
+async def chat_completions(request: web.Request) -> web.StreamResponse:
+    body = await request.json()
+    messages = convert_to_messages(body.get("messages", []))
+    content, tool_calls = structured_reply(body)
+    reply = content or ("" if tool_calls else scripted_reply(messages))
+    completion = reply or json.dumps([c["args"] for c in tool_calls], ensure_ascii=False)
+    openai_tool_calls = [
+        {"id": c["id"], "type": "function",
+         "function": {"name": c["name"], "arguments": json.dumps(c["args"], ensure_ascii=False)}}
+        for c in tool_calls
+    ]
+    model = body.get("model", "fake")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    request.app["stats"]["requests"] += 1
+    cached_tokens = _cached_tokens(request.app, body, messages)
+
+    faults = request.app["faults"]
+    latency_s = request.app["model_latency_s"].get(model, request.app["latency_s"])
+    if random.random() < faults["slow_rate"]:
+        latency_s = faults["slow_latency_s"]
+    await asyncio.sleep(latency_s)
+    if model in request.app["fail_models"]:
+        return web.json_response(
+            {"error": {"message": f"Model {model} is unavailable", "type": "server_error"}}, status=500,
+        )
+    if random.random() < faults["error_rate"]:
+        request.app["stats"]["errors"] += 1
+        return web.json_response({"error": {"message": "Overloaded", "type": "server_error"}}, status=503)
+
+    if not body.get("stream"):
+        return web.json_response({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply, **({"tool_calls": openai_tool_calls} if tool_calls else {})},
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": _usage(messages, completion, cached_tokens),
+        })
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+
+    async def send(choices: list, **extra) -> None:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": choices,
+            **extra,
+        }
+        await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    await send([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+    if tool_calls:
+        await send([{
+            "index": 0,
+            "delta": {"tool_calls": [{"index": i, **call} for i, call in enumerate(openai_tool_calls)]},
+            "finish_reason": None,
+        }])
+    else:
+        for token in reply.split(" "):
+            await asyncio.sleep(request.app["token_delay_s"])
+            await send([{"index": 0, "delta": {"content": token + " "}, "finish_reason": None}])
+    await send([{"index": 0, "delta": {}, "finish_reason": "tool_calls" if tool_calls else "stop"}])
+    if (body.get("stream_options") or {}).get("include_usage"):
+        await send([], usage=_usage(messages, completion, cached_tokens))
+    await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+
+def create_fake_openai_app(
+    latency_s: float = 0.3,
+    token_delay_s: float = 0.01,
+    model_latency_s: dict[str, float] | None = None,
+    fail_models: tuple[str, ...] = (),
+    error_rate: float = 0.0,
+    slow_rate: float = 0.0,
+    slow_latency_s: float = 5.0,
+    prefix_cache: bool = True,
+) -> web.Application:
+    app = web.Application()
+    app["latency_s"] = latency_s
+    app["token_delay_s"] = token_delay_s
+    app["model_latency_s"] = dict(model_latency_s or {})
+    app["fail_models"] = frozenset(fail_models)
+    app["faults"] = {"error_rate": error_rate, "slow_rate": slow_rate, "slow_latency_s": slow_latency_s}
+    app["stats"] = {"requests": 0, "errors": 0}
+    app["prefix_cache"] = OrderedDict() if prefix_cache else None
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_server_process(
+    port: int,
+    latency_s: float = 0.3,
+    token_delay_s: float = 0.01,
+    timeout_s: float = 30.0,
+    model_latency_s: dict[str, float] | None = None,
+    fail_models: tuple[str, ...] = (),
+    faults: dict | None = None,
+) -> subprocess.Popen:
+    """Запускает заглушку отдельным процессом и ждёт, пока порт начнёт принимать соединения."""
+    command = [sys.executable, "-m", "benchmarks.fake_openai_server",
+               "--port", str(port), "--latency", str(latency_s), "--token-delay", str(token_delay_s)]
+    if model_latency_s:
+        command += ["--model-latency", *(f"{model}={latency}" for model, latency in model_latency_s.items())]
+    if fail_models:
+        command += ["--fail-models", *fail_models]
+    for name, value in (faults or {}).items():
+        # {"error_rate": 0.1} -> --error-rate 0.1
+        command += [f"--{name.removesuffix('_s').replace('_', '-')}", str(value)]
+    process = subprocess.Popen(command)
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Заглушка API не запустилась")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency", type=float, default=0.3, help="задержка до первого токена, с")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="пауза между токенами при стриминге, с")
+    parser.add_argument("--model-latency", nargs="*", default=[], metavar="MODEL=SECONDS",
+                        help="задержка по моделям вместо --latency")
+    parser.add_argument("--fail-models", nargs="*", default=[], help="модели, отвечающие ошибкой 500")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля запросов с ответом 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="доля запросов с задержкой --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="задержка медленных запросов, с")
+    parser.add_argument("--no-prefix-cache", action="store_true", help="не имитировать кэш промптов провайдера")
+    args = parser.parse_args()
+    model_latency_s = {}
+    for item in args.model_latency:
+        model, _, latency = item.rpartition("=")
+        model_latency_s[model] = float(latency)
+    web.run_app(
+        create_fake_openai_app(
+            args.latency, args.token_delay, model_latency_s, tuple(args.fail_models),
+            args.error_rate, args.slow_rate, args.slow_latency, not args.no_prefix_cache,
+        ),
+        host=args.host,
+        port=args.port,
+        print=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Нагрузочный генератор: N симулированных кандидатов одновременно.
+
+Каждый кандидат проходит интервью через InterviewEngine, воспроизводя ответы
+из записанных логов `interview_log_*.json` (поле `turns[].user_message`) или из
+сценария (текстовый файл, один ответ на строку). Уровни конкурентности
+перебираются по возрастанию; для каждого печатаются пропускная способность
+(ходов/с), p50/p90/p99 латентности хода, ошибки из trace-событий узлов и
+исключения. Точка деградации — первый уровень, на котором p90 хода превышает
+p90 самого низкого уровня в `--degrade-factor` раз.
+
+Бэкенд:
+- `--backend fake` (по умолчанию) — локальная заглушка API
+  (benchmarks/fake_openai_server.py), поднимается автоматически;
+- `--backend real` — API из конфигурации (`LLM_BASE_URL`, `VSEGPT_API_KEY`),
+  `--base-url` переопределяет адрес. Тратит реальные токены.
+
+Запуск:
+    python -m benchmarks.load_generator --concurrency 1 5 10 25 50 --logs logs/
+    python -m benchmarks.load_generator --script answers.txt --backend real --concurrency 1 2 4
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import statistics
+import time
+from collections import Counter
+
+from benchmarks.common import PROFILE, disable_caches
+from benchmarks.fake_openai_server import free_port, start_fake_server_process
+from config import config
+from logger import InterviewLogger
+from metrics import percentile
+
+
+DEFAULT_SCRIPT = [
+    "Я использую list comprehension, когда нужно преобразовать список.",
+    "GIL мешает параллельно выполнять байткод в потоках, поэтому для CPU беру multiprocessing.",
+    "Декоратор — функция, которая принимает функцию и возвращает обёртку.",
+    "Не помню точно, наверное через словарь.",
+    "Контекстный менеджер реализует __enter__ и __exit__.",
+]
+
+
+def load_scripts(log_paths: list[str], script_path: str | None) -> list[list[str]]:
+    """Наборы ответов кандидатов: по одному на лог интервью или один из сценария."""
+    if script_path:
+        with open(script_path, encoding="utf-8") as f:
+            return [[line.strip() for line in f if line.strip()]]
+
+    files = []
+    for path in log_paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "interview_log_*.json")))
+        else:
+            files.append(path)
+    scripts = []
+    for path in sorted(files):
+        with open(path, encoding="utf-8") as f:
+            answers = [turn["user_message"] for turn in json.load(f).get("turns", []) if turn.get("user_message")]
+        if answers:
+            scripts.append(answers)
+    return scripts or [DEFAULT_SCRIPT]
+
+
+async def _candidate(engine, answers: list[str], max_turns: int | None, stats: dict) -> None:
+    logger = InterviewLogger(output_filename=f"load_{id(answers)}_{time.time_ns()}.json")
+    state = engine.start_interview(dict(PROFILE))
+    try:
+        await engine.abootstrap_first_question(state, logger)
+        for answer in answers[:max_turns]:
+            start = time.perf_counter()
+            await engine.aprocess_user_input(state, answer, logger)
+            stats["latencies_ms"].append((time.perf_counter() - start) * 1000)
+            if state["is_finished"]:
+                break
+    except Exception as e:
+        stats["exceptions"][type(e).__name__] += 1
+    finally:
+        for event in logger.trace_events:
+            if event["phase"] == "error":
+                stats["node_errors"][event["node"]] += 1
+
+
+async def run_level(engine, scripts: list[list[str]], concurrency: int, max_turns: int | None) -> dict:
+    stats = {"latencies_ms": [], "exceptions": Counter(), "node_errors": Counter()}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _candidate(engine, scripts[i % len(scripts)], max_turns, stats) for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    latencies = stats["latencies_ms"]
+    row = {
+        "concurrency": concurrency,
+        "turns": len(latencies),
+        "elapsed_s": round(elapsed, 2),
+        "turns_per_s": round(len(latencies) / elapsed, 2),
+        "node_errors": dict(stats["node_errors"]),
+        "exceptions": dict(stats["exceptions"]),
+    }
+    for q in (50, 90, 99):
+        row[f"p{q}_ms"] = round(percentile(latencies, q)) if latencies else None
+    row["mean_ms"] = round(statistics.mean(latencies)) if latencies else None
+    return row
+
+
+def degradation_point(rows: list[dict], factor: float) -> int | None:
+    """Первый уровень конкурентности, где p90 хода выросла в factor раз относительно самого низкого."""
+    baseline = rows[0]["p90_ms"] if rows else None
+    if not baseline:
+        return None
+    for row in rows[1:]:
+        if row["p90_ms"] is None or row["p90_ms"] > baseline * factor or row["exceptions"]:
+            return row["concurrency"]
+    return None
+
+
+def _print_row(row: dict) -> None:
+    errors = sum(row["node_errors"].values()) + sum(row["exceptions"].values())
+    print(f"{row['concurrency']:>11} {row['turns']:>6} {row['turns_per_s']:>8} "
+          f"{row['p50_ms'] or '-':>7} {row['p90_ms'] or '-':>7} {row['p99_ms'] or '-':>7} {errors:>6}",
+          flush=True)
+
+
+async def _run(args, scripts: list[list[str]]) -> list[dict]:
+    from interview_engine import InterviewEngine
+
+    engine = InterviewEngine()
+    rows = []
+    print(f"{'concurrency':>11} {'turns':>6} {'turns/s':>8} {'p50_ms':>7} {'p90_ms':>7} {'p99_ms':>7} {'errors':>6}")
+    try:
+        for concurrency in sorted(args.concurrency):
+            row = await run_level(engine, scripts, concurrency, args.turns)
+            rows.append(row)
+            _print_row(row)
+    finally:
+        await engine.aclose()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--logs", nargs="*", default=[], help="логи interview_log_*.json или каталоги с ними")
+    parser.add_argument("--script", help="сценарий ответов: один ответ на строку")
+    parser.add_argument("--turns", type=int, help="ограничить число ходов кандидата")
+    parser.add_argument("--backend", choices=("fake", "real"), default="fake")
+    parser.add_argument("--base-url", help="адрес API для --backend real")
+    parser.add_argument("--latency", type=float, default=0.3, help="задержка заглушки, с")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="пауза между токенами заглушки, с")
+    parser.add_argument("--degrade-factor", type=float, default=1.5)
+    parser.add_argument("--output", help="сохранить результат в JSON")
+    args = parser.parse_args()
+
+    scripts = load_scripts(args.logs, args.script)
+    disable_caches()
+
+    server = None
+    if args.backend == "fake":
+        port = free_port()
+        server = start_fake_server_process(port, args.latency, args.token_delay)
+        config.llm_base_url = f"http://127.0.0.1:{port}/v1"
+        config.vsegpt_api_key = "fake"
+        config.tavily_api_key = None
+    elif args.base_url:
+        config.llm_base_url = args.base_url
+
+    print(f"Кандидатов в сценариях: {len(scripts)}, бэкенд: {args.backend} ({config.llm_base_url})")
+    try:
+        rows = asyncio.run(_run(args, scripts))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    point = degradation_point(rows, args.degrade_factor)
+    if point is None:
+        print(f"\nДеградации (p90 > x{args.degrade_factor} от уровня {rows[0]['concurrency']}) не обнаружено")
+    else:
+        print(f"\nТочка деградации: {point} одновременных кандидатов "
+              f"(p90 > x{args.degrade_factor} от уровня {rows[0]['concurrency']} или исключения)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"backend": args.backend, "base_url": config.llm_base_url,
+                 "degradation_concurrency": point, "levels": rows},
+                f, ensure_ascii=False, indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Локальный нагрузочный тест server.py: p50/p99 латентности хода.
+
+Поднимает сервер в этом же процессе на фейковой модели и гоняет заданное
+число одновременных сессий через HTTP.
+
+Запуск:
+    python -m benchmarks.load_test_server --sessions 100 --turns 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.common import PROFILE, disable_caches
+from benchmarks.fake_llm import FakeChatModel
+from interview_engine import InterviewEngine
+from metrics import percentile
+from server import create_app
+
+
+async def _candidate(client: aiohttp.ClientSession, base_url: str, turns: int, latencies: list[float]) -> None:
+    async with client.post(f"{base_url}/sessions", json={"profile": PROFILE}) as resp:
+        resp.raise_for_status()
+        session_id = (await resp.json())["session_id"]
+
+    for i in range(turns):
+        start = time.perf_counter()
+        async with client.post(f"{base_url}/sessions/{session_id}/turns", json={"text": f"Ответ #{i}"}) as resp:
+            resp.raise_for_status()
+            await resp.json()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    async with client.delete(f"{base_url}/sessions/{session_id}") as resp:
+        resp.raise_for_status()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2, help="задержка одного вызова модели, с")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    disable_caches()
+
+    app = create_app(InterviewEngine(llm=FakeChatModel(latency_s=args.latency)))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    latencies: list[float] = []
+    base_url = f"http://127.0.0.1:{args.port}"
+    connector = aiohttp.TCPConnector(limit=args.sessions)
+    start = time.perf_counter()
+    try:
+        async with aiohttp.ClientSession(connector=connector) as client:
+            await asyncio.gather(*(_candidate(client, base_url, args.turns, latencies) for _ in range(args.sessions)))
+    finally:
+        await runner.cleanup()
+    elapsed = time.perf_counter() - start
+
+    print(f"sessions={args.sessions} turns={len(latencies)} elapsed_s={elapsed:.2f} "
+          f"turns_per_s={len(latencies) / elapsed:.1f}")
+    print(f"turn latency ms: p50={percentile(latencies, 50):.0f} p99={percentile(latencies, 99):.0f} "
+          f"mean={statistics.mean(latencies):.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,10 +5,203 @@ load_dotenv()
 
 
 class Config:
+    # Модель по умолчанию: для агентов без своей модели в model_profiles и для цены неизвестных моделей
     model_name: str = 'google/gemini-3-flash-pre-thinking'
+    llm_temperature: float = 0.2
+    llm_timeout_s: float | None = None
+
+    # Профили моделей по агентам: model, temperature, max_tokens, timeout (с) одного запроса, max_retries,
+    # deadline (с) — дедлайн всех попыток узла, hedge_percentile — дубль запроса после этого перцентиля
+    # задержек модели (resilience.py), fallback_model — запасная модель, если основная ответила ошибкой.
+    # Незаданные поля берутся из model_name, llm_temperature, llm_timeout_s, llm_max_retries;
+    # max_tokens и deadline по умолчанию не ограничены, hedging выключен
+    # Observer и summarizer на критическом пути хода и в фоне: быстрая дешёвая модель с короткими ответами
+    model_profiles: dict = {
+        "planner": {"max_tokens": 2000, "timeout": 60, "deadline": 90},
+        "observer": {
+            "model": 'google/gemini-2.5-flash-lite',
+            "temperature": 0.0,
+            "max_tokens": 400,
+            "timeout": 20,
+            "deadline": 30,
+            # Observer на критическом пути: при ошибке сразу запасная модель, без повторов основной,
+            # на медленный ответ — дубль запроса
+            "max_retries": 0,
+            "hedge_percentile": 90,
+            "fallback_model": 'google/gemini-3-flash-pre-thinking',
+        },
+        # Interviewer стримит ответ, hedging для него не применяется
+        "interviewer": {"max_tokens": 600, "timeout": 30, "deadline": 45},
+        "manager": {"max_tokens": 4000, "timeout": 120, "deadline": 180},
+        "summarizer": {
+            "model": 'google/gemini-2.5-flash-lite',
+            "temperature": 0.0,
+            "max_tokens": 800,
+            "timeout": 30,
+            "deadline": 60,
+            "fallback_model": 'google/gemini-3-flash-pre-thinking',
+        },
+    }
 
     tavily_api_key: str = os.getenv('TAVILY_API_KEY')
     vsegpt_api_key: str = os.getenv('VSEGPT_API_KEY')
+    # OpenAI-совместимый API модели (для офлайн-бенчмарков — локальная заглушка)
+    llm_base_url: str = os.getenv('LLM_BASE_URL', 'https://api.vsegpt.ru/v1')
+
+    # Показывать вопрос интервьюера по мере генерации токенов
+    stream_responses: bool = True
+
+    # Pipeline-режим: interviewer стартует параллельно с observer,
+    # опираясь на оценку наблюдателя с предыдущего хода
+    pipeline_observer: bool = False
+
+    # Кэш планов интервью по нормализованному профилю кандидата
+    plan_cache_enabled: bool = True
+    plan_cache_max_entries: int = 256
+    plan_cache_ttl_s: int = 24 * 3600
+    # Каталог дискового слоя кэша; None — только память
+    plan_cache_dir: str | None = os.getenv('PLAN_CACHE_DIR')
+
+    # Кэш ответов LLM (SQLite): точное совпадение модели, параметров и сообщений
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = os.getenv('LLM_CACHE_PATH', './logs/llm_cache.sqlite')
+    llm_cache_max_entries: int = 10_000
+    # Включение кэша по агентам
+    llm_cache_agents: dict = {
+        "planner": True,
+        "observer": True,
+        "interviewer": True,
+        "manager": True,
+        "summarizer": True,
+    }
+
+    # Чекпоинты графа (история сессий) в SQLite, по ним сессию можно продолжить после падения;
+    # пустое значение — чекпоинты только в памяти процесса
+    checkpoint_db_path: str | None = os.getenv('CHECKPOINT_DB', './logs/checkpoints.sqlite')
+    # "exit" — один чекпоинт в конце хода (при падении теряется только текущий ход);
+    # "sync"/"async" — чекпоинт после каждого узла, прерванный ход доигрывается при восстановлении
+    checkpoint_durability: str = 'exit'
+
+    # Фоновое обновление rolling summary мыслей observer после каждого хода
+    rolling_summary_enabled: bool = True
+
+    # Бюджеты контекста узлов в токенах (tiktoken) вместе с системным промптом роли
+    tokenizer_encoding: str = 'o200k_base'
+    context_token_budgets: dict = {
+        "observer": 3000,
+        "interviewer": 4000,
+        "manager": 6000,
+        "summarizer": 6000,
+    }
+    # Выше этого объёма мысли observer сворачиваются через LLM, ниже — просто склеиваются
+    summary_threshold_tokens: int = 1000
+
+    # Локальная классификация ответа кандидата (intent.py): просьба о завершении сразу идёт в manager,
+    # пустые ответы, «не знаю» и ответы без содержания оцениваются без вызова observer
+    intent_fast_path_enabled: bool = True
+    # Дополнительные шаблоны (регулярные выражения) по намерениям: {"stop": [...], "dont_know": [...]}
+    intent_extra_patterns: dict = {}
+    # dont_know и off_topic — только для ответа не длиннее стольких слов, целиком покрытого шаблонами
+    intent_trivial_max_words: int = 6
+    # Необязательная локальная модель (joblib-файл sklearn-пайплайна с predict_proba)
+    intent_model_path: str | None = os.getenv('INTENT_MODEL')
+    intent_model_min_confidence: float = 0.9
+
+    # Ответ observer: "provider" — structured output провайдера (JSON schema), "tool" — схема через
+    # вызов инструмента (для моделей без response_format), None — свободный текст с разбором по ключевым словам
+    observer_structured_output: str | None = 'provider'
+
+    # Устойчивость вызовов моделей (resilience.py): повторы временных ошибок с экспоненциальной паузой
+    # и джиттером, hedging, circuit breaker на модель. Выключено — только повторы клиента OpenAI
+    resilience_enabled: bool = True
+    llm_max_retries: int = 2
+    llm_retry_backoff_s: float = 0.5
+    llm_retry_backoff_max_s: float = 8.0
+    # Hedging: окно последних задержек модели и минимум замеров, после которого он включается
+    hedge_window: int = 200
+    hedge_min_samples: int = 20
+    # Circuit breaker: столько временных ошибок подряд открывают его на circuit_recovery_s
+    circuit_failure_threshold: int = 5
+    circuit_recovery_s: float = 30.0
+
+    # Общий на процесс rate limiter (rate_limiter.py): лимиты провайдера в минуту на один ключ для всех сессий.
+    # Пустой лимит или отсутствующее поле — без ограничения
+    rate_limit_enabled: bool = True
+    rate_limits: dict = {
+        "llm": {"requests_per_min": 600, "tokens_per_min": 2_000_000},
+        "tavily": {"requests_per_min": 100},
+    }
+    # Приоритеты очереди (меньше — важнее): вопрос интервьюера кандидат ждёт прямо сейчас,
+    # оценка observer и план — на критическом пути хода, остальное — фоновая работа
+    rate_limit_priorities: dict = {
+        "interviewer": 0,
+        "planner": 1,
+        "observer": 1,
+        "summarizer": 2,
+        "manager": 2,
+        "search": 2,
+    }
+    # Доля каждой корзины, доступная только высшему приоритету (interviewer)
+    rate_limit_reserve_share: float = 0.1
+    # Оценка длины ответа для лимита токенов, если у модели не задан max_tokens
+    rate_limit_default_output_tokens: int = 1000
+
+    # Черновик финального фидбэка в фоне каждые feedback_draft_every_turns ходов:
+    # на "стоп" manager только уточняет его наблюдениями последних ходов
+    feedback_draft_enabled: bool = False
+    feedback_draft_every_turns: int = 3
+
+    # Потоковая запись логов (log_writer.py): fsync не чаще раза в интервал,
+    # ротация runtime_traces.jsonl по размеру и возрасту, сжатие ротированных файлов zstd
+    log_fsync_interval_s: float = 1.0
+    log_rotate_max_bytes: int = 50 * 1024 * 1024
+    log_rotate_interval_s: int = 24 * 3600
+    log_compress_rotated: bool = True
+    # Сколько последних trace-событий сессии держать в памяти
+    log_recent_trace_events: int = 1000
+
+    # Цены для учёта стоимости вызовов, USD за 1M токенов (cached_input — чтение из кэша провайдера).
+    # Модель без цены считается по цене model_name
+    model_prices: dict = {
+        'google/gemini-3-flash-pre-thinking': {"input": 0.50, "cached_input": 0.05, "output": 3.00},
+        'google/gemini-2.5-flash-lite': {"input": 0.10, "cached_input": 0.01, "output": 0.40},
+    }
+    # Цена одного кредита Tavily (basic-поиск — 1 кредит, advanced — 2)
+    tavily_credit_price_usd: float = 0.008
+
+    # Фоновый поиск ресурсов по пробелам в знаниях (search_prefetch.py): темы берутся из
+    # оценок observer по ходу интервью, manager получает готовые результаты без вызова инструмента
+    search_prefetch_enabled: bool = True
+    search_prefetch_max_topics: int = 5
+    search_prefetch_concurrency: int = 4
+    search_prefetch_max_results: int = 3
+    # Сколько manager ждёт ещё не завершённые поиски
+    search_prefetch_wait_s: float = 5.0
+    # Кэш результатов поиска, общий для всех сессий процесса
+    search_cache_ttl_s: int = 24 * 3600
+    search_cache_max_entries: int = 1000
+
+    # Профилирование узлов (profiling.py): "cprofile" или "sampling"; пусто — выключено
+    profile_mode: str | None = os.getenv('PROFILE_NODES') or None
+    profile_dir: str = os.getenv('PROFILE_DIR', './logs/profiles')
+    profile_sample_interval_ms: float = 5.0
+
+    # Пакетная переоценка логов интервью (reevaluate.py): сколько узлов с вызовом LLM выполняется одновременно
+    reevaluate_concurrency: int = 8
+
+    # Размер общего пула HTTP-соединений к LLM на процесс
+    llm_max_connections: int = 100
+
+    # Серверный режим (server.py)
+    server_host: str = '0.0.0.0'
+    server_port: int = 8080
+    server_max_sessions: int = 500
+    server_max_concurrent_turns: int = 200
+    # Сессия без ходов дольше стольких секунд выгружается из памяти (лог сохраняется,
+    # продолжить её можно по session_id из чекпоинта); None — не выгружать
+    server_session_idle_ttl_s: int | None = 30 * 60
+    # Как часто искать простаивающие сессии
+    server_session_sweep_interval_s: int = 60
 
 
 config = Config()
@@ -0,0 +1,129 @@
+"""Сборка контекста узлов в пределах бюджета токенов.
+
+Токены считаются через tiktoken. Если словарь кодировки недоступен (например,
+нет сети при первом запуске), используется грубая оценка по длине текста.
+"""
+import logging
+from functools import lru_cache
+
+from langchain_core.messages import BaseMessage
+
+from config import config
+from metrics import current_metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Грубая оценка для запасного варианта: символов на токен (для кириллицы меньше, чем для латиницы)
+_APPROX_CHARS_PER_TOKEN = 3
+# Служебные токены на одно сообщение чата
+_MESSAGE_OVERHEAD_TOKENS = 4
+TRUNCATION_MARKER = "\n[... обрезано для экономии контекста ...]"
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(config.tokenizer_encoding)
+    except Exception:
+        logger.warning("Кодировка tiktoken '%s' недоступна, токены считаются приблизительно", config.tokenizer_encoding)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return -(-len(text) // _APPROX_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    return count_tokens(str(message.content)) + _MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Обрезает текст до max_tokens (с пометкой об обрезке)."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens - count_tokens(TRUNCATION_MARKER))
+    encoding = _encoding()
+    if encoding is None:
+        return text[:keep * _APPROX_CHARS_PER_TOKEN] + TRUNCATION_MARKER
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:keep]) + TRUNCATION_MARKER
+
+
+class ContextBuilder:
+    """Заполняет промпт узла по приоритетам, пока не кончится бюджет токенов.
+
+    Части добавляются в порядке убывания важности: то, что добавлено раньше,
+    получает бюджет первым. Использованные токены пишутся в метрики узла.
+    """
+
+    def __init__(self, node: str, reserved_text: str = ""):
+        self.node = node
+        self.budget = config.context_token_budgets[node]
+        # reserved_text — то, что уйдёт в модель помимо собранного контекста (системный промпт роли)
+        self.used = count_tokens(reserved_text)
+        self._record(self.used)
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.budget - self.used)
+
+    def _record(self, tokens: int) -> None:
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.add("context_tokens", tokens)
+            metrics.set_once("context_budget", self.budget)
+
+    def add_text(self, text: str, max_share: float = 1.0) -> str:
+        """Добавляет текст, обрезая его до остатка бюджета (и до доли max_share от всего бюджета)."""
+        limit = min(self.remaining, int(self.budget * max_share))
+        fitted = truncate_to_tokens(text, limit)
+        tokens = count_tokens(fitted)
+        self.used += tokens
+        self._record(tokens)
+        return fitted
+
+    def add_messages(self, messages: list[BaseMessage], keep_last: int = 2) -> list[BaseMessage]:
+        """Берёт сообщения с конца, пока хватает бюджета.
+
+        Последние keep_last сообщений (последний вопрос и ответ) попадают всегда;
+        если они не влезают, остаток бюджета делится между ними поровну, и короткое
+        сообщение отдаёт неиспользованную долю длинному.
+        """
+        forced = messages[-keep_last:] if keep_last else []
+        older = messages[:len(messages) - len(forced)]
+
+        available = self.remaining
+        caps: dict[int, int] = {}
+        by_size = sorted(range(len(forced)), key=lambda i: count_message_tokens(forced[i]))
+        for position, index in enumerate(by_size):
+            share = available // (len(by_size) - position)
+            caps[index] = min(count_message_tokens(forced[index]), share)
+            available -= caps[index]
+
+        selected: list[BaseMessage] = []
+        for index, message in enumerate(forced):
+            if count_message_tokens(message) > caps[index]:
+                content = truncate_to_tokens(str(message.content), max(0, caps[index] - _MESSAGE_OVERHEAD_TOKENS))
+                message = message.model_copy(update={"content": content})
+            selected.append(message)
+        tokens = sum(count_message_tokens(message) for message in selected)
+        self.used += tokens
+        self._record(tokens)
+
+        history: list[BaseMessage] = []
+        for message in reversed(older):
+            tokens = count_message_tokens(message)
+            if tokens > self.remaining:
+                break
+            history.append(message)
+            self.used += tokens
+            self._record(tokens)
+        history.reverse()
+        return history + selected
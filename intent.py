@@ -0,0 +1,197 @@
+"""Локальная классификация ответа кандидата без вызова LLM.
+
+Все шаблоны собраны в одно скомпилированное регулярное выражение с именованными
+группами (по группе на намерение), поэтому ответ проверяется за один проход, а
+не циклом по спискам ключевых слов. Если шаблоны ничего не нашли, можно
+спросить небольшую локальную модель (Config.intent_model_path).
+
+Намерения:
+- stop — просьба завершить интервью (в любом месте ответа);
+- empty — пустой ответ (нет ни одной буквы или цифры);
+- dont_know — ответ из одного «не знаю» и т.п.;
+- off_topic — ответ без содержания (приветствие, благодарность);
+- answer — содержательный ответ, его оценивает observer.
+
+dont_know и off_topic — только если шаблоны покрывают ответ целиком (кроме
+пунктуации и слов-паразитов) и он не длиннее Config.intent_trivial_max_words
+слов: «Ок, сложность O(n log n)» и «не знаю точно, но думаю, что GIL...»
+остаются ответами.
+"""
+import logging
+import re
+from enum import Enum
+
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+
+class Intent(str, Enum):
+    STOP = "stop"
+    EMPTY = "empty"
+    DONT_KNOW = "dont_know"
+    OFF_TOPIC = "off_topic"
+    ANSWER = "answer"
+
+
+# Намерения, при которых оценка observer не нужна
+TRIVIAL_INTENTS = (Intent.EMPTY, Intent.DONT_KNOW, Intent.OFF_TOPIC)
+
+DEFAULT_PATTERNS: dict[Intent, list[str]] = {
+    Intent.STOP: [
+        r"стоп(?!-)",
+        r"фидб[эе]к\w*",
+        r"хватит",
+        r"заверши(?:ть|м)?",
+        r"закончи(?:ть|м)?",
+        r"заверша(?:ем|й)",
+        r"заканчива(?:ем|й)",
+        r"хочу завершить",
+    ],
+    Intent.DONT_KNOW: [
+        r"не знаю",
+        r"не помню",
+        r"без понятия",
+        r"понятия не имею",
+        r"затрудняюсь(?: ответить)?",
+        r"не сталкивался",
+        r"не работал с этим",
+        r"пропуст(?:и|им|ить)",
+        r"idk",
+        r"don'?t know",
+    ],
+    Intent.OFF_TOPIC: [
+        r"привет\w*",
+        r"здравствуй\w*",
+        r"добрый (?:день|вечер)",
+        r"спасибо",
+        r"как дела",
+        r"ок(?:ей)?",
+        r"угу",
+        r"ага",
+        r"hi",
+        r"hello",
+    ],
+}
+
+# При нескольких совпадениях побеждает более раннее в этом списке
+_PRIORITY = (Intent.STOP, Intent.DONT_KNOW, Intent.OFF_TOPIC)
+_WORD_RE = re.compile(r"\w+")
+# Слова, которые не делают ответ содержательным: «ну, не знаю», «эм, привет»
+FILLER_WORDS = frozenset({
+    "ну", "эм", "эээ", "хм", "ммм", "э", "а", "и", "вот", "так", "честно", "говоря", "если", "увы",
+    "к", "сожалению", "извините", "простите", "пожалуйста", "пока", "наверное", "вообще", "уж", "же",
+})
+
+
+class IntentClassifier:
+    """Шаблоны намерений в одном регулярном выражении плюс необязательная локальная модель.
+
+    model — объект с методом predict(text) -> (intent, confidence); его ответ
+    принимается, если уверенность не ниже model_min_confidence.
+    """
+
+    def __init__(
+        self,
+        patterns: dict[Intent, list[str]] | None = None,
+        model=None,
+        model_min_confidence: float = 0.9,
+        trivial_max_words: int = 6,
+    ):
+        self._patterns = {intent: list(items) for intent, items in (patterns or DEFAULT_PATTERNS).items()}
+        self.model = model
+        self.model_min_confidence = model_min_confidence
+        self.trivial_max_words = trivial_max_words
+        self._compile()
+
+    def _compile(self) -> None:
+        groups = [
+            rf"(?P<{intent.value}>{'|'.join(f'(?:{p})' for p in self._patterns[intent])})"
+            for intent in _PRIORITY
+            if self._patterns.get(intent)
+        ]
+        self._matcher = re.compile(rf"(?<!\w)(?:{'|'.join(groups)})(?!\w)", re.IGNORECASE)
+
+    def add_patterns(self, intent: Intent | str, patterns: list[str]) -> None:
+        intent = Intent(intent)
+        if intent not in _PRIORITY:
+            raise ValueError(f"Шаблоны задаются только для {[i.value for i in _PRIORITY]}")
+        self._patterns.setdefault(intent, []).extend(patterns)
+        self._compile()
+
+    def classify(self, text: str | None) -> Intent:
+        text = (text or "").strip()
+        words = _WORD_RE.findall(text)
+        if not words:
+            return Intent.EMPTY
+
+        found = {Intent(match.lastgroup) for match in self._matcher.finditer(text)}
+        if Intent.STOP in found:
+            return Intent.STOP
+        if found and len(words) <= self.trivial_max_words and self._covers(text):
+            for intent in (Intent.DONT_KNOW, Intent.OFF_TOPIC):
+                if intent in found:
+                    return intent
+
+        if self.model is not None:
+            try:
+                label, confidence = self.model.predict(text)
+                if confidence >= self.model_min_confidence:
+                    return Intent(label)
+            except Exception:
+                logger.exception("Ошибка локальной модели намерений")
+        return Intent.ANSWER
+
+    def _covers(self, text: str) -> bool:
+        """Шаблоны покрывают весь ответ: вне совпадений только пунктуация и слова-паразиты."""
+        rest = self._matcher.sub(" ", text)
+        return all(word.lower() in FILLER_WORDS for word in _WORD_RE.findall(rest))
+
+
+class SklearnIntentModel:
+    """Обёртка над сохранённым (joblib) sklearn-пайплайном с predict_proba, метки — значения Intent."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    @classmethod
+    def load(cls, path: str) -> "SklearnIntentModel":
+        import joblib
+
+        return cls(joblib.load(path))
+
+    def predict(self, text: str) -> tuple[str, float]:
+        probabilities = self.pipeline.predict_proba([text])[0]
+        best = probabilities.argmax()
+        return str(self.pipeline.classes_[best]), float(probabilities[best])
+
+
+_classifier: IntentClassifier | None = None
+
+
+def get_classifier() -> IntentClassifier:
+    """Классификатор процесса по настройкам Config (создаётся при первом обращении)."""
+    global _classifier
+    if _classifier is None:
+        model = None
+        if config.intent_model_path:
+            try:
+                model = SklearnIntentModel.load(config.intent_model_path)
+            except ImportError:
+                logger.warning("joblib/scikit-learn не установлены, модель намерений %s не загружена",
+                               config.intent_model_path)
+            except Exception:
+                logger.exception("Не удалось загрузить модель намерений %s", config.intent_model_path)
+        _classifier = IntentClassifier(
+            model=model,
+            model_min_confidence=config.intent_model_min_confidence,
+            trivial_max_words=config.intent_trivial_max_words,
+        )
+        for intent, patterns in config.intent_extra_patterns.items():
+            _classifier.add_patterns(intent, patterns)
+    return _classifier
+
+
+def classify(text: str | None) -> Intent:
+    return get_classifier().classify(text)
@@ -1,229 +1,844 @@
-from langchain_openai import ChatOpenAI
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import var_child_runnable_config
+from langgraph.config import get_config, get_stream_writer
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import StateGraph, END, START
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain.agents import create_agent
-from langchain_tavily import TavilySearch
-from langchain_tavily._utilities import TavilySearchAPIWrapper
-from pydantic import SecretStr
-import time
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
+from functools import cached_property
+import asyncio
+import inspect
+import os
+import threading
+import uuid
 
 from state import AgentState
 from logger import InterviewLogger
-from prompts import planner_prompt, observer_prompt, interviewer_prompt, manager_prompt
+from metrics import collect_node_metrics, NodeMetricsCallbackHandler
+from profiling import profile_node
+from plan_cache import PlanCache, profile_key
+from llm_cache import SQLiteLLMCache
+from prompts import planner_prompt, interviewer_prompt, manager_prompt
 from routing import route_before_observer, route_after_observer
-from nodes import planner_node, observer_node, interviewer_node, manager_node
+from nodes import planner_node, intent_node, observer_node, interviewer_node, manager_node, draft_feedback
+from nodes.planner_node import PLAN_ERROR, PLAN_NOT_GENERATED
+from nodes.observer_node import ObserverVerdict, observer_system_prompt
+from summarizer import fold_observer_thoughts
+from search_prefetch import SearchCache, SearchPrefetcher, build_query, extract_gap_topics, normalize_query
 
 from config import config
 
 
+# Поля state, которые живут в чекпоинте графа и не копируются в state сессии
+_CHECKPOINT_ONLY_KEYS = ("messages", "internal_thoughts")
+# Поля state сессии, которые ведёт только движок и не передаёт в граф
+_SESSION_ONLY_KEYS = ("unfolded_observer_thoughts", "knowledge_gaps")
+# Ленивые атрибуты движка, которые warm_up создаёт заранее
+_WARM_UP_ATTRIBUTES = (
+    "planner_agent", "observer_agent", "interviewer_agent", "manager_agent", "summarizer_agent",
+    "search_prefetcher", "_workflow",
+)
+# Агенты, чей ответ стримится пользователю: дубль запроса (hedging) или повтор после первых токенов напечатали бы ответ дважды
+_STREAMED_AGENTS = ("interviewer",)
+# Событие custom-стрима pipeline-режима: наблюдатель не завершил интервью, вопрос интервьюера можно показывать
+_QUESTION_CONFIRMED = "question_confirmed"
+# Поля state сессии, которые меняются вне графа и отправляются вместе с ответом кандидата
+_TURN_INPUT_KEYS = (
+    "turn_count", "observer_summary", "observer_summary_thoughts", "feedback_draft", "feedback_draft_thoughts",
+)
+
+
 class InterviewEngine:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model=config.model_name,
-            openai_api_key=config.vsegpt_api_key,
-            base_url="https://api.vsegpt.ru/v1",
-            temperature=0.2
-        )
+    """Движок интервью.
+
+    Тяжёлые зависимости (langchain_openai, langchain_tavily, create_agent) и
+    агенты создаются при первом обращении, поэтому конструктор дешёвый: CLI
+    может создать движок и прогреть его в фоне (warm_up), пока кандидат
+    заполняет профиль.
+    """
+
+    def __init__(self, llm: BaseChatModel | None = None, pipeline_observer: bool | None = None):
+        # llm можно подменить (например, фейковой моделью в бенчмарках): тогда она общая для всех агентов,
+        # профили моделей из Config.model_profiles не применяются
+        self._use_model_profiles = llm is None
+        if llm is not None:
+            self.llm = llm
+
+        self.llm_cache = SQLiteLLMCache(
+            config.llm_cache_path,
+            max_entries=config.llm_cache_max_entries,
+        ) if config.llm_cache_enabled else None
+
+        self.pipeline_observer = config.pipeline_observer if pipeline_observer is None else pipeline_observer
+
+        self.plan_cache = PlanCache(
+            max_entries=config.plan_cache_max_entries,
+            ttl_s=config.plan_cache_ttl_s,
+            disk_dir=config.plan_cache_dir,
+        ) if config.plan_cache_enabled else None
 
-        if config.tavily_api_key:
-            tavily_tool = TavilySearch(
-                api_wrapper=TavilySearchAPIWrapper(tavily_api_key=SecretStr(config.tavily_api_key)),
-                max_results=5,
-                search_depth="basic",
-            )
-            manager_tools = [tavily_tool]
+        self.logger = InterviewLogger()
+        self._metrics_handler = NodeMetricsCallbackHandler()
+
+        # Граф компилируется при первом ходе: AsyncSqliteSaver создаётся внутри event loop
+        self._checkpointer: BaseCheckpointSaver | None = None
+        self.graph = None
+
+        # Отдельный event loop (в фоновом потоке) для синхронных обёрток: клиенты ChatOpenAI
+        # привязываются к циклу, поэтому asyncio.run() на каждый ход использовать нельзя
+        self._sync_loop: asyncio.AbstractEventLoop | None = None
+
+        # Фоновые обновления rolling summary по session_id
+        self._summary_tasks: dict[str, asyncio.Task] = {}
+        # Фоновые черновики финального фидбэка по session_id
+        self._draft_tasks: dict[str, asyncio.Task] = {}
+        # Фоновые поиски ресурсов (ссылки держим, чтобы задачи не собрал GC)
+        self._prefetch_tasks: set[asyncio.Task] = set()
+
+    @cached_property
+    def _http_async_client(self):
+        import httpx
+
+        # Один пул соединений на все модели, агенты и сессии процесса
+        return httpx.AsyncClient(limits=httpx.Limits(max_connections=config.llm_max_connections))
+
+    def _chat_model(self, model: str, profile: dict, cache=None) -> BaseChatModel:
+        from langchain_openai import ChatOpenAI
+
+        if config.resilience_enabled:
+            # Повторы делает ResilienceMiddleware (tenacity), встроенные повторы клиента отключены
+            extra = {"max_retries": 0}
+        elif profile.get("max_retries") is not None:
+            extra = {"max_retries": profile["max_retries"]}
         else:
-            manager_tools = None
-
-        self.planner_agent = create_agent(
-            model=self.llm,
-            tools=None,
-            system_prompt=planner_prompt
+            extra = {}
+        return ChatOpenAI(
+            model=model,
+            openai_api_key=config.vsegpt_api_key,
+            base_url=config.llm_base_url,
+            temperature=profile.get("temperature", config.llm_temperature),
+            max_tokens=profile.get("max_tokens"),
+            timeout=profile.get("timeout", config.llm_timeout_s),
+            # usage_metadata (токены) и в потоковых ответах
+            stream_usage=True,
+            http_async_client=self._http_async_client,
+            cache=cache,
+            **extra,
         )
 
-        self.observer_agent = create_agent(
-            model=self.llm,
-            tools=None,
-            system_prompt=observer_prompt
+    @cached_property
+    def llm(self) -> BaseChatModel:
+        """Модель по умолчанию (Config.model_name); агенты берут модели из Config.model_profiles."""
+        return self._chat_model(config.model_name, {})
+
+    @cached_property
+    def _tavily_tool(self):
+        if not config.tavily_api_key:
+            return None
+        from langchain_tavily import TavilySearch
+        from langchain_tavily._utilities import TavilySearchAPIWrapper
+        from pydantic import SecretStr
+
+        return TavilySearch(
+            api_wrapper=TavilySearchAPIWrapper(tavily_api_key=SecretStr(config.tavily_api_key)),
+            max_results=5,
+            search_depth="basic",
         )
 
-        self.interviewer_agent = create_agent(
-            model=self.llm,
-            tools=None,
-            system_prompt=interviewer_prompt
+    @cached_property
+    def search_prefetcher(self) -> SearchPrefetcher | None:
+        if self._tavily_tool is None or not config.search_prefetch_enabled:
+            return None
+        return SearchPrefetcher(
+            self._tavily_tool,
+            SearchCache(max_entries=config.search_cache_max_entries, ttl_s=config.search_cache_ttl_s),
+            concurrency=config.search_prefetch_concurrency,
+            callbacks=[self._metrics_handler],
         )
 
-        self.manager_agent = create_agent(
-            model=self.llm,
-            tools=manager_tools,
-            system_prompt=manager_prompt,
+    @cached_property
+    def planner_agent(self):
+        return self._create_agent("planner", system_prompt=planner_prompt)
+
+    @cached_property
+    def observer_agent(self):
+        return self._create_agent(
+            "observer",
+            system_prompt=observer_system_prompt(),
+            response_format=self._observer_response_format(),
         )
 
-        self.logger = InterviewLogger()
+    @cached_property
+    def interviewer_agent(self):
+        return self._create_agent("interviewer", system_prompt=interviewer_prompt)
 
-        self.graph = self._build_graph()
+    @cached_property
+    def manager_agent(self):
+        # С фоновым поиском manager получает готовые ресурсы и инструмент ему не нужен
+        use_tool = self._tavily_tool is not None and self.search_prefetcher is None
+        return self._create_agent(
+            "manager", system_prompt=manager_prompt, tools=[self._tavily_tool] if use_tool else None,
+        )
 
-    def _build_graph(self) -> StateGraph:
-        workflow = StateGraph(AgentState)
+    @cached_property
+    def summarizer_agent(self):
+        # Суммаризация мыслей Observer: промпт целиком в сообщениях, см. summarizer.py
+        return self._create_agent("summarizer")
+
+    @cached_property
+    def _resilience(self):
+        from resilience import ModelResilience
+
+        return ModelResilience()
+
+    @cached_property
+    def _workflow(self) -> StateGraph:
+        return self._build_graph()
+
+    def _create_agent(self, name: str, **kwargs):
+        from langchain.agents import create_agent
+        from langchain.agents.middleware import ModelFallbackMiddleware
+        from rate_limiter import RateLimitMiddleware
+
+        profile = self._model_profile(name)
+        middleware = []
+        if profile.get("fallback_model"):
+            middleware.append(ModelFallbackMiddleware(self._llm_for(name, profile["fallback_model"])))
+        if config.resilience_enabled:
+            # После fallback: каждая модель (основная и запасная) проходит повторы и свой circuit breaker
+            middleware.append(self._resilience.middleware(name, profile, streamed=name in _STREAMED_AGENTS))
+        # Последним: каждый запрос к модели (повтор, дубль hedging, запасная модель) ждёт общий лимитер процесса
+        middleware.append(RateLimitMiddleware(name))
+        return create_agent(model=self._llm_for(name), name=name, middleware=middleware, **kwargs)
+
+    def warm_up(self) -> None:
+        """Создаёт модель, агентов и граф заранее (например, в фоновом потоке до первого хода)."""
+        for name in _WARM_UP_ATTRIBUTES:
+            getattr(self, name)
 
-        def wrap_node(node_name: str, fn):
-            def _wrapper(state: AgentState) -> dict:
-                start = time.perf_counter()
-                self.logger.add_trace_event(
-                    node=node_name,
-                    phase="start",
-                    turn_count=state.get("turn_count"),
-                    input_messages=len(state.get("messages", [])),
-                    input_internal_thoughts=len(state.get("internal_thoughts", [])),
-                )
+    @staticmethod
+    def _observer_response_format():
+        from langchain.agents.structured_output import ProviderStrategy, ToolStrategy
+
+        mode = config.observer_structured_output
+        if mode == "provider":
+            return ProviderStrategy(ObserverVerdict)
+        if mode == "tool":
+            return ToolStrategy(ObserverVerdict)
+        if mode:
+            raise ValueError(f"Неизвестный режим observer_structured_output: {mode!r}")
+        return None
+
+    def _model_profile(self, agent_name: str) -> dict:
+        return config.model_profiles.get(agent_name, {}) if self._use_model_profiles else {}
+
+    def _llm_for(self, agent_name: str, model: str | None = None) -> BaseChatModel:
+        """Модель агента по его профилю (пул соединений общий) с кэшем ответов, если он включён для агента.
+
+        model — другая модель с теми же параметрами профиля (запасная).
+        """
+        use_cache = self.llm_cache is not None and config.llm_cache_agents.get(agent_name, False)
+        cache = self.llm_cache if use_cache else False
+        if not self._use_model_profiles:
+            return self.llm.model_copy(update={"cache": cache})
+        profile = self._model_profile(agent_name)
+        if model is not None:
+            # Запасная модель — последняя попытка: для неё повторы клиента по умолчанию
+            profile = {**profile, "max_retries": None}
+        return self._chat_model(model or profile.get("model", config.model_name), profile, cache)
+
+    def _wrap_node(self, node_name: str, fn):
+        """Оборачивает узел: trace-события start/end/error, сбор метрик и (по настройке) профиль узла."""
+        async def _wrapper(state: AgentState, config: RunnableConfig) -> dict:
+            logger = self._logger_from(config)
+            logger.add_trace_event(
+                node=node_name,
+                phase="start",
+                turn_count=state.get("turn_count"),
+                input_messages=len(state.get("messages", [])),
+                input_internal_thoughts=len(state.get("internal_thoughts", [])),
+            )
+            with collect_node_metrics() as metrics, profile_node(
+                node_name, state.get("session_id"), state.get("turn_count")
+            ):
                 try:
-                    out = fn(state)
-                    duration_ms = int((time.perf_counter() - start) * 1000)
-                    self.logger.add_trace_event(
+                    out = await fn(state)
+                except asyncio.CancelledError:
+                    # Спекулятивный вызов (pipeline-режим) оказался не нужен
+                    logger.add_trace_event(
                         node=node_name,
-                        phase="end",
+                        phase="cancelled",
                         turn_count=state.get("turn_count"),
-                        duration_ms=duration_ms,
-                        output_messages=len(out.get("messages", [])) if isinstance(out, dict) else None,
-                        output_internal_thoughts=len(out.get("internal_thoughts", [])) if isinstance(out, dict) else None,
+                        duration_ms=metrics.elapsed_ms(),
+                        **metrics.values,
                     )
-                    return out
+                    raise
                 except Exception as e:
-                    duration_ms = int((time.perf_counter() - start) * 1000)
-                    self.logger.add_trace_event(
+                    logger.add_trace_event(
                         node=node_name,
                         phase="error",
                         turn_count=state.get("turn_count"),
-                        duration_ms=duration_ms,
+                        duration_ms=metrics.elapsed_ms(),
                         error=str(e),
+                        **metrics.values,
                     )
                     raise
+                logger.add_trace_event(
+                    node=node_name,
+                    phase="end",
+                    turn_count=state.get("turn_count"),
+                    duration_ms=metrics.elapsed_ms(),
+                    output_messages=len(out.get("messages", [])) if isinstance(out, dict) else None,
+                    output_internal_thoughts=len(out.get("internal_thoughts", [])) if isinstance(out, dict) else None,
+                    **metrics.values,
+                )
+                return out
+
+        return _wrapper
+
+    async def _run_background_node(self, node_name: str, fn, state: dict, logger: InterviewLogger) -> dict:
+        """Узел вне графа (фоновая задача): trace-события и метрики как у узлов графа.
+
+        Вызывается в отдельной asyncio-задаче: конфиг запуска ставится в её контекст,
+        чтобы вызовы агентов получили колбэки метрик (токены, стоимость).
+        """
+        graph_config = self._graph_config(logger)
+        var_child_runnable_config.set(graph_config)
+        return await self._wrap_node(node_name, fn)(state, graph_config)
+
+    async def arun_node(self, node_name: str, state: dict, logger: InterviewLogger | None = None) -> dict:
+        """Один узел графа ("intent", "observer", "manager") по готовому state, без графа и чекпоинта.
+
+        Нужен пакетной переоценке логов (reevaluate.py): trace-события, метрики и
+        лимиты вызовов — как у узлов графа.
+        """
+        nodes = {
+            "intent": intent_node,
+            "observer": lambda s: observer_node(s, self.observer_agent),
+            "manager": lambda s: manager_node(s, self.manager_agent, self.summarizer_agent, self.search_prefetcher),
+        }
+        # Отдельная задача: конфиг запуска не должен остаться в контексте вызывающего
+        return await asyncio.create_task(
+            self._run_background_node(node_name, nodes[node_name], state, logger or self.logger)
+        )
+
+    async def _pipelined_turn(self, state: AgentState) -> dict:
+        """Observer и interviewer параллельно.
+
+        Интервьюер стартует сразу и опирается на оценку наблюдателя с прошлого хода
+        (она уже в state). Если наблюдатель решил завершать интервью, спекулятивный
+        вопрос отменяется/отбрасывается, и дальше по маршруту идёт manager.
+        Токены вопроса до оценки наблюдателя клиенту не уходят (см. _arun_graph).
+        """
+        config = get_config()
+        observer = asyncio.create_task(self._observer(state, config))
+        interviewer = asyncio.create_task(self._interviewer(state, config))
+        try:
+            observer_out = await observer
+        except BaseException:
+            interviewer.cancel()
+            raise
+
+        if observer_out.get("is_finished"):
+            interviewer.cancel()
+            try:
+                await interviewer
+            except asyncio.CancelledError:
+                pass
+            return observer_out
+
+        get_stream_writer()({_QUESTION_CONFIRMED: True})
+        interviewer_out = await interviewer
+        return {
+            **observer_out,
+            **interviewer_out,
+            "internal_thoughts": observer_out.get("internal_thoughts", []) + interviewer_out.get("internal_thoughts", []),
+        }
+
+    def _build_graph(self) -> StateGraph:
+        workflow = StateGraph(AgentState)
 
-            return _wrapper
+        self._observer = self._wrap_node("observer", lambda s: observer_node(s, self.observer_agent))
+        self._interviewer = self._wrap_node("interviewer", lambda s: interviewer_node(s, self.interviewer_agent))
 
-        workflow.add_node("planner", wrap_node("planner", lambda s: planner_node(s, self.planner_agent)))
-        workflow.add_node("observer", wrap_node("observer", lambda s: observer_node(s, self.observer_agent)))
-        workflow.add_node("interviewer", wrap_node("interviewer", lambda s: interviewer_node(s, self.interviewer_agent)))
-        workflow.add_node("manager", wrap_node("manager", lambda s: manager_node(s, self.manager_agent, self.observer_agent)))
+        workflow.add_node("intent", self._wrap_node("intent", intent_node))
+        workflow.add_node("planner", self._wrap_node("planner", lambda s: planner_node(s, self.planner_agent)))
+        workflow.add_node("manager", self._wrap_node("manager", lambda s: manager_node(s, self.manager_agent, self.summarizer_agent, self.search_prefetcher)))
 
+        if self.pipeline_observer:
+            # Pipeline-режим: observer и interviewer внутри одного узла "turn"
+            turn_node = "turn"
+            workflow.add_node("turn", self._wrap_node("turn", self._pipelined_turn))
+            after_turn = {
+                "interviewer": END,
+                "manager": "manager",
+            }
+        else:
+            turn_node = "observer"
+            workflow.add_node("observer", self._observer)
+            workflow.add_node("interviewer", self._interviewer)
+            after_turn = {
+                "interviewer": "interviewer",
+                "manager": "manager"
+            }
+            # Interviewer всегда ведет к концу (ждем ответа пользователя)
+            workflow.add_edge("interviewer", END)
+
+        # Ответ кандидата сначала классифицируется локально (intent.py)
+        workflow.add_edge(START, "intent")
         workflow.add_conditional_edges(
-            START,
+            "intent",
             route_before_observer,
             {
-                "observer": "observer",
+                "observer": turn_node,
                 "planner": "planner",
+                "manager": "manager",
             }
         )
 
-        workflow.add_edge("planner", "observer")
+        workflow.add_edge("planner", turn_node)
 
         workflow.add_conditional_edges(
-            "observer",
+            turn_node,
             route_after_observer,
-            {
-                "interviewer": "interviewer",
-                "manager": "manager"
-            }
+            after_turn,
         )
 
-        # Interviewer всегда ведет к концу (ждем ответа пользователя)
-        workflow.add_edge("interviewer", END)
-
         # Manager завершает интервью
         workflow.add_edge("manager", END)
 
-        return workflow.compile()
+        return workflow
+
+    def _make_checkpointer(self) -> BaseCheckpointSaver:
+        if not config.checkpoint_db_path:
+            return InMemorySaver()
+        dir_name = os.path.dirname(config.checkpoint_db_path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        # Соединение открывается и таблицы создаются при первом обращении
+        return AsyncSqliteSaver(aiosqlite.connect(config.checkpoint_db_path))
+
+    def _compiled_graph(self):
+        """Граф с чекпоинтером: история сессии хранится по thread_id = session_id."""
+        if self.graph is None:
+            # Агенты создаются до первого узла, а не внутри него (иначе это попадёт в латентность узла)
+            self.warm_up()
+            self._checkpointer = self._make_checkpointer()
+            self.graph = self._workflow.compile(checkpointer=self._checkpointer)
+        return self.graph
+
+    async def aclose(self) -> None:
+        """Закрывает соединение с базой чекпоинтов."""
+        conn = getattr(self._checkpointer, "conn", None)
+        if conn is not None:
+            await conn.close()
+
+    def close(self) -> None:
+        """Синхронная обёртка над aclose."""
+        if self._checkpointer is not None:
+            self._run_sync(self.aclose())
 
     @staticmethod
-    def start_interview(candidate_profile: dict) -> dict:
+    def start_interview(candidate_profile: dict, session_id: str | None = None) -> dict:
+        """Лёгкое состояние сессии. История (messages, internal_thoughts) хранится в чекпоинте графа."""
         initial_state = {
-            "messages": [],
-            "internal_thoughts": [],
+            "session_id": session_id or uuid.uuid4().hex,
             "candidate_profile": candidate_profile,
             "observer_instructions": "",
             "current_agent_response": "",
             "last_agent_visible_message": "",
             "is_finished": False,
-            "turn_count": 0
+            "turn_count": 0,
+            "observer_summary": "",
+            "observer_summary_thoughts": 0,
+            # Мысли observer, ещё не свёрнутые в rolling summary
+            "unfolded_observer_thoughts": [],
+            # Темы пробелов в знаниях, по которым уже запущен поиск ресурсов
+            "knowledge_gaps": [],
+            "feedback_draft": "",
+            "feedback_draft_thoughts": 0,
         }
 
         return initial_state
 
-    def bootstrap_first_question(self, state: dict) -> dict:
+    def _run_sync(self, coro):
+        if self._sync_loop is None:
+            self._sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=self._sync_loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._sync_loop).result()
+
+    def _logger_from(self, config: RunnableConfig | None) -> InterviewLogger:
+        """Логгер сессии из конфига запуска графа (по умолчанию — логгер движка)."""
+        configurable = (config or {}).get("configurable", {})
+        return configurable.get("interview_logger") or self.logger
+
+    def _graph_config(self, logger: InterviewLogger | None, session_id: str | None = None) -> RunnableConfig:
+        configurable = {"interview_logger": logger or self.logger}
+        if session_id:
+            configurable["thread_id"] = session_id
+        return {
+            "configurable": configurable,
+            "callbacks": [self._metrics_handler],
+        }
+
+    async def _arun_graph(
+        self, graph_input: dict | None, session_id: str, logger: InterviewLogger | None, on_token=None
+    ) -> tuple[dict, list[str]]:
+        """Прогоняет граф по чекпоинту сессии (graph_input=None — продолжить прерванный ход).
+
+        Возвращает изменённые узлами поля state (кроме истории) и новые мысли агентов.
+        С on_token токены вопроса интервьюера отдаются по мере генерации. В
+        pipeline-режиме они копятся, пока наблюдатель не подтвердит, что интервью
+        продолжается: иначе клиент увидел бы вопрос, а сразу за ним финальный фидбэк.
+        """
+        graph_config = self._graph_config(logger, session_id)
+        stream_mode = ["updates", "messages", "custom"] if on_token is not None else ["updates"]
+
+        updates: dict = {}
+        new_thoughts: list[str] = []
+        hold_tokens = self.pipeline_observer
+        held_tokens: list[str] = []
+
+        async def emit(text: str) -> None:
+            result = on_token(text)
+            if inspect.isawaitable(result):
+                await result
+
+        # subgraphs=True нужен, чтобы получить токены из графов агентов внутри узлов
+        async for namespace, mode, data in self._compiled_graph().astream(
+            graph_input,
+            config=graph_config,
+            stream_mode=stream_mode,
+            subgraphs=True,
+            durability=config.checkpoint_durability,
+        ):
+            if mode == "updates":
+                # Обновления внутри графов агентов не нужны
+                if namespace:
+                    continue
+                for node_update in data.values():
+                    if not isinstance(node_update, dict):
+                        continue
+                    new_thoughts.extend(node_update.get("internal_thoughts", []))
+                    updates.update({k: v for k, v in node_update.items() if k not in _CHECKPOINT_ONLY_KEYS})
+                continue
+            if mode == "custom":
+                if isinstance(data, dict) and data.get(_QUESTION_CONFIRMED):
+                    hold_tokens = False
+                    for text in held_tokens:
+                        await emit(text)
+                    held_tokens.clear()
+                continue
+            chunk, metadata = data
+            if (
+                metadata.get("lc_agent_name") == "interviewer"
+                and isinstance(chunk, AIMessageChunk)
+                and isinstance(chunk.content, str)
+                and chunk.content
+            ):
+                if hold_tokens:
+                    held_tokens.append(chunk.content)
+                else:
+                    await emit(chunk.content)
+        # Токены отменённого спекулятивного вопроса (held_tokens) отбрасываются
+        return updates, new_thoughts
+
+    @staticmethod
+    def _collect_observer_thoughts(state: dict, new_thoughts: list[str]) -> None:
+        state["unfolded_observer_thoughts"] = state.get("unfolded_observer_thoughts", []) + [
+            t for t in new_thoughts if "[Observer]" in t
+        ]
+
+    def _schedule_summary_update(self, state: dict, logger: InterviewLogger) -> None:
+        """Запускает в фоне свёртку новых мыслей observer в rolling summary сессии."""
+        if not config.rolling_summary_enabled or state.get("is_finished"):
+            return
+        pending = list(state.get("unfolded_observer_thoughts", []))
+        if not pending:
+            return
+
+        async def _fold(s: dict) -> dict:
+            summary = await fold_observer_thoughts(s.get("observer_summary", ""), pending, self.summarizer_agent)
+            return {"observer_summary": summary}
+
+        async def _update() -> None:
+            try:
+                out = await self._run_background_node("summarizer", _fold, state, logger)
+            except Exception:
+                # Ошибка уже в трейсах; мысли свернутся на следующем ходе или в manager
+                return
+            state["observer_summary"] = out["observer_summary"]
+            state["observer_summary_thoughts"] = state.get("observer_summary_thoughts", 0) + len(pending)
+            state["unfolded_observer_thoughts"] = state["unfolded_observer_thoughts"][len(pending):]
+
+        self._summary_tasks[state["session_id"]] = asyncio.create_task(_update())
+
+    def _schedule_search_prefetch(self, state: dict, new_thoughts: list[str], logger: InterviewLogger) -> None:
+        """Запускает в фоне поиск ресурсов по новым темам пробелов из оценок observer."""
+        if self.search_prefetcher is None or state.get("is_finished"):
+            return
+        known = state.get("knowledge_gaps", [])
+        known_keys = {normalize_query(topic) for topic in known}
+        observer_thoughts = [t for t in new_thoughts if "[Observer]" in t]
+        new_topics = [
+            topic for topic in extract_gap_topics(observer_thoughts)
+            if normalize_query(topic) not in known_keys
+        ][:max(0, config.search_prefetch_max_topics - len(known))]
+        if not new_topics:
+            return
+        state["knowledge_gaps"] = known + new_topics
+        role = state.get("candidate_profile", {}).get("role")
+        queries = [build_query(topic, role) for topic in new_topics]
+
+        async def _prefetch(s: dict) -> dict:
+            # Счётчики кэша учитывают только обращения manager
+            tasks = self.search_prefetcher.prefetch(queries)
+            if tasks:
+                await asyncio.wait(tasks)
+            return {}
+
+        task = asyncio.create_task(self._run_background_node("search_prefetch", _prefetch, state, logger))
+        self._prefetch_tasks.add(task)
+        task.add_done_callback(self._prefetch_tasks.discard)
+
+    def _schedule_feedback_draft(self, state: dict, logger: InterviewLogger) -> None:
+        """Раз в feedback_draft_every_turns ходов обновляет в фоне черновик финального фидбэка.
+
+        Ход кандидата черновика не ждёт: готовый черновик уходит в граф со следующим ходом.
+        """
+        if not config.feedback_draft_enabled or state.get("is_finished"):
+            return
+        if state.get("turn_count", 0) % config.feedback_draft_every_turns:
+            return
+        session_id = state["session_id"]
+        running = self._draft_tasks.get(session_id)
+        if running is not None and not running.done():
+            return
+        summary_task = self._summary_tasks.get(session_id)
+
+        async def _draft(s: dict) -> dict:
+            if summary_task is not None:
+                # Черновик строится по свежему rolling summary
+                await asyncio.wait([summary_task])
+            unfolded = list(s.get("unfolded_observer_thoughts", []))
+            covered = s.get("observer_summary_thoughts", 0) + len(unfolded)
+            feedback = await draft_feedback(
+                s.get("candidate_profile", {}),
+                "\n".join([s.get("observer_summary", ""), *unfolded]).strip(),
+                s.get("knowledge_gaps", []),
+                self.manager_agent,
+                self.search_prefetcher,
+            )
+            return {"feedback_draft": feedback, "feedback_draft_thoughts": covered}
+
+        async def _update() -> None:
+            try:
+                out = await self._run_background_node("feedback_draft", _draft, state, logger)
+            except Exception:
+                # Ошибка уже в трейсах; manager соберёт фидбэк с нуля или по прошлому черновику
+                return
+            finally:
+                self._draft_tasks.pop(session_id, None)
+            if out["feedback_draft"] and not state.get("is_finished"):
+                state.update(out)
+
+        self._draft_tasks[session_id] = asyncio.create_task(_update())
+
+    def release_session(self, session_id: str) -> None:
+        """Отменяет фоновые задачи сессии (rolling summary, черновик фидбэка): сессия закрыта или выгружена."""
+        for tasks in (self._summary_tasks, self._draft_tasks):
+            task = tasks.pop(session_id, None)
+            if task is not None:
+                task.cancel()
+
+    async def _await_summary_update(self, state: dict) -> None:
+        task = self._summary_tasks.pop(state.get("session_id"), None)
+        if task is not None:
+            await task
+
+    def _apply_cached_plan(self, state: dict, logger: InterviewLogger) -> bool:
+        """Подставляет план из кэша, чтобы граф не вызывал planner. Возвращает True при попадании."""
+        if self.plan_cache is None or state.get("interview_plan"):
+            return False
+        plan = self.plan_cache.get(state.get("candidate_profile", {}))
+        logger.add_trace_event(
+            node="plan_cache",
+            phase="hit" if plan else "miss",
+            turn_count=state.get("turn_count"),
+            **self.plan_cache.stats(),
+        )
+        if not plan:
+            return False
+        state["interview_plan"] = plan
+        return True
+
+    async def awarm_plan_cache(
+        self, profiles: list[dict], concurrency: int = 4, logger: InterviewLogger | None = None
+    ) -> int:
+        """Заранее строит планы для профилей, которых ещё нет в кэше. Возвращает число новых планов.
+
+        Вызовы planner попадают в trace-события и расход logger (по умолчанию — лог движка).
+        """
+        if self.plan_cache is None:
+            return 0
+        logger = logger or self.logger
+        semaphore = asyncio.Semaphore(concurrency)
+        run_planner = lambda s: planner_node(s, self.planner_agent)
+
+        async def _warm(profile: dict) -> bool:
+            if self.plan_cache.peek(profile) is not None:
+                return False
+            state = {"messages": [], "candidate_profile": profile}
+            async with semaphore:
+                # Отдельная задача: конфиг запуска не должен остаться в контексте вызывающего
+                out = await asyncio.create_task(self._run_background_node("planner", run_planner, state, logger))
+            plan = out.get("interview_plan")
+            if not plan or plan in (PLAN_ERROR, PLAN_NOT_GENERATED):
+                return False
+            self.plan_cache.put(profile, plan)
+            return True
+
+        # Профили с одинаковым ключом строят план один раз
+        unique_profiles = {profile_key(profile): profile for profile in profiles}
+        results = await asyncio.gather(*(_warm(profile) for profile in unique_profiles.values()))
+        return sum(results)
+
+    def bootstrap_first_question(self, state: dict, logger: InterviewLogger | None = None, on_token=None) -> dict:
+        """Синхронная обёртка над abootstrap_first_question."""
+        return self._run_sync(self.abootstrap_first_question(state, logger, on_token))
+
+    async def abootstrap_first_question(
+        self, state: dict, logger: InterviewLogger | None = None, on_token=None
+    ) -> dict:
         """Генерирует первый вопрос интервью (инициализация) и НЕ логирует этот шаг."""
-        output = self.graph.invoke(state)
+        session_logger = logger or self.logger
+        if session_logger.session_id is None:
+            session_logger.set_session_id(state["session_id"])
+        plan_from_cache = self._apply_cached_plan(state, session_logger)
+
+        # Первый запуск создаёт чекпоинт сессии: передаём начальное состояние целиком
+        graph_input = {k: v for k, v in state.items() if k not in _SESSION_ONLY_KEYS}
+        graph_input["messages"] = []
+        graph_input["internal_thoughts"] = (
+            [f"[Planner]: (план из кэша) {state['interview_plan']}\n"] if plan_from_cache else []
+        )
+        output, new_thoughts = await self._arun_graph(graph_input, state["session_id"], logger, on_token)
 
-        if "messages" in output:
-            state["messages"] = output["messages"]
-        if "internal_thoughts" in output:
-            state["internal_thoughts"] = output["internal_thoughts"]
+        if self.plan_cache is not None and not plan_from_cache:
+            plan = output.get("interview_plan")
+            if plan and plan not in (PLAN_ERROR, PLAN_NOT_GENERATED):
+                self.plan_cache.put(state.get("candidate_profile", {}), plan)
 
+        state.update(output)
         agent_response = output.get("current_agent_response", "")
         state["current_agent_response"] = agent_response
         state["last_agent_visible_message"] = agent_response
-
         state["is_finished"] = output.get("is_finished", False)
-        for key, value in output.items():
-            if key not in ["messages", "internal_thoughts", "topics_covered", "current_agent_response", "is_finished"]:
-                state[key] = value
+        self._collect_observer_thoughts(state, new_thoughts)
 
         return state
 
-    def process_user_input(self, state: dict, user_input: str) -> dict:
-        old_thoughts = state.get("internal_thoughts", [])
-        old_thoughts_len = len(old_thoughts)
+    def process_user_input(
+        self, state: dict, user_input: str, logger: InterviewLogger | None = None, on_token=None
+    ) -> dict:
+        """Синхронная обёртка над aprocess_user_input."""
+        return self._run_sync(self.aprocess_user_input(state, user_input, logger, on_token))
+
+    async def aprocess_user_input(
+        self, state: dict, user_input: str, logger: InterviewLogger | None = None, on_token=None
+    ) -> dict:
+        """Обрабатывает ответ кандидата.
+
+        В граф уходит только новое сообщение: история сессии берётся из чекпоинта.
+        logger задаётся, когда один движок обслуживает несколько сессий.
+        on_token(text) (обычная или async-функция) получает токены следующего вопроса по мере генерации.
+        """
+        logger = logger or self.logger
+        # Rolling summary с прошлого хода обычно давно готов (пока кандидат печатал ответ)
+        await self._await_summary_update(state)
 
         agent_visible_message = state.get("last_agent_visible_message") or state.get("current_agent_response", "")
 
         if user_input:
-            state["messages"].append(HumanMessage(content=user_input))
             state["turn_count"] = state.get("turn_count", 0) + 1
 
-        # Запускаем граф
-        output = self.graph.invoke(state)
-
-        # Получаем ответ агента (может быть из output или уже в state)
-        agent_response = output.get("current_agent_response", state.get("current_agent_response", ""))
+        graph_input = {key: state.get(key) for key in _TURN_INPUT_KEYS}
+        graph_input["messages"] = [HumanMessage(content=user_input)] if user_input else []
 
-        # Получаем новые мысли только из этого прохода графа (дельта)
-        all_thoughts = output.get("internal_thoughts", old_thoughts)
-        new_thoughts = all_thoughts[old_thoughts_len:] if len(all_thoughts) >= old_thoughts_len else all_thoughts
+        # Запускаем граф
+        output, new_thoughts = await self._arun_graph(graph_input, state["session_id"], logger, on_token)
 
         # Логируем все сгенерированные тексты всех агентов (в порядке появления).
         # Каждая мысль должна заканчиваться переводом строки.
-        thoughts_to_log = "".join(new_thoughts) if new_thoughts else ""
-
-        self.logger.add_turn(
+        logger.add_turn(
             agent_msg=agent_visible_message if agent_visible_message else "(вопрос отсутствует)",
             user_msg=user_input,
-            thoughts=thoughts_to_log,
+            thoughts="".join(new_thoughts),
         )
 
-        is_finished = output.get("is_finished", False)
-        state["is_finished"] = is_finished
-
-        # Обновляем состояние из результата графа (он уже мерджит списки по reducer'ам)
-        if "messages" in output:
-            state["messages"] = output["messages"]
-        if "internal_thoughts" in output:
-            state["internal_thoughts"] = output["internal_thoughts"]
-        state["current_agent_response"] = agent_response
+        # Обновляем состояние сессии полями, которые изменили узлы
+        state.update(output)
+        state["is_finished"] = output.get("is_finished", False)
 
         # Следующий agent_visible_message — это следующий вопрос интервьюера (если интервью не завершено).
-        if not is_finished:
-            state["last_agent_visible_message"] = agent_response
+        if not state["is_finished"]:
+            state["last_agent_visible_message"] = state.get("current_agent_response", "")
 
-        # Обновляем остальные поля из output
-        for key, value in output.items():
-            if key not in ["messages", "internal_thoughts", "topics_covered", "current_agent_response", "is_finished"]:
-                state[key] = value
+        self._collect_observer_thoughts(state, new_thoughts)
+        self._schedule_summary_update(state, logger)
+        self._schedule_search_prefetch(state, new_thoughts, logger)
+        self._schedule_feedback_draft(state, logger)
 
         return state
 
-    def finish_interview(self, state: dict) -> str:
+    def resume_session(self, session_id: str, logger: InterviewLogger | None = None) -> dict | None:
+        """Синхронная обёртка над aresume_session."""
+        return self._run_sync(self.aresume_session(session_id, logger))
+
+    async def aresume_session(self, session_id: str, logger: InterviewLogger | None = None) -> dict | None:
+        """Восстанавливает state сессии из чекпоинта (например, после падения процесса).
+
+        Если процесс упал посреди хода, ход доигрывается с последнего сохранённого узла.
+        Возвращает None, если сессии нет в базе чекпоинтов.
+        """
+        session_logger = logger or self.logger
+        if session_logger.session_id is None:
+            session_logger.set_session_id(session_id)
+        graph = self._compiled_graph()
+        graph_config = self._graph_config(logger, session_id)
+        snapshot = await graph.aget_state(graph_config)
+        if not snapshot.values:
+            return None
+        if snapshot.next:
+            await self._arun_graph(None, session_id, logger)
+            snapshot = await graph.aget_state(graph_config)
+
+        values = snapshot.values
+        state = {k: v for k, v in values.items() if k not in _CHECKPOINT_ONLY_KEYS}
+        state["session_id"] = session_id
+        if not state.get("is_finished"):
+            state["last_agent_visible_message"] = state.get("current_agent_response", "")
+        observer_thoughts = [t for t in values.get("internal_thoughts", []) if "[Observer]" in t]
+        state["unfolded_observer_thoughts"] = observer_thoughts[state.get("observer_summary_thoughts", 0):]
+        # Недостающие результаты поиска manager дозапросит сам
+        state["knowledge_gaps"] = extract_gap_topics(observer_thoughts, config.search_prefetch_max_topics)
+        # Нумерация ходов в логе продолжается с места остановки
+        session_logger.turn_counter = state.get("turn_count", 0) + 1
+        return state
+
+    def finish_interview(self, state: dict, logger: InterviewLogger | None = None) -> str:
+        logger = logger or self.logger
         feedback = state.get("current_agent_response", "")
-        self.logger.set_final_feedback(feedback)
-        self.logger.save_to_file()
-        self.logger.save_traces_to_file()
+        if self.llm_cache is not None:
+            logger.add_trace_event(node="llm_cache", phase="stats", **self.llm_cache.stats())
+        if self.search_prefetcher is not None:
+            logger.add_trace_event(node="search_cache", phase="stats", **self.search_prefetcher.cache.stats())
+        logger.add_trace_event(node="usage", phase="session", **logger.session_usage())
+        logger.set_interview_context(state.get("candidate_profile", {}), state.get("interview_plan", ""))
+        logger.set_final_feedback(feedback)
+        logger.save_to_file()
         return feedback
-
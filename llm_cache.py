@@ -0,0 +1,162 @@
+"""Персистентный кэш ответов LLM (SQLite), общий для всех агентов.
+
+Подключается к чат-модели через стандартный механизм LangChain (`cache=`),
+поэтому ключ — точное совпадение строки параметров модели (модель,
+температура и т.д.) и сериализованных сообщений. Размер ограничен числом
+записей, при переполнении вытесняются давно не читавшиеся (LRU).
+
+В асинхронных вызовах запросы к SQLite идут в пуле потоков, чтобы не
+блокировать event loop; счётчики и метрики узла обновляются в самом цикле.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from langchain_core._api import suppress_langchain_beta_warning
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from metrics import current_metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Промах, чья генерация упала, не доходит до update: время его начала забывается через столько секунд
+_MISS_MAX_AGE_S = 600.0
+
+
+class SQLiteLLMCache(BaseCache):
+    def __init__(self, path: str, max_entries: int = 10_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+        # Время начала генерации для промахов: по нему считается, сколько стоил ответ
+        self._miss_started: dict[str, float] = {}
+        self._miss_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                generation_ms REAL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "llm_cache_hits": self.hits,
+            "llm_cache_misses": self.misses,
+            "llm_cache_hit_rate": round(self.hits / total, 3) if total else None,
+            "llm_cache_saved_ms": int(self.saved_ms),
+        }
+
+    def _read(self, key: str) -> tuple[str, float | None] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, generation_ms FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        return row
+
+    def _write(self, key: str, return_val: RETURN_VAL_TYPE, generation_ms: float | None) -> None:
+        value = dumps(return_val)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, generation_ms, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, generation_ms, now, now),
+            )
+            # Вытесняем самые давно читавшиеся записи сверх лимита
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def _start_miss(self, key: str) -> None:
+        now = time.perf_counter()
+        with self._miss_lock:
+            stale = [k for k, started in self._miss_started.items() if now - started > _MISS_MAX_AGE_S]
+            for k in stale:
+                del self._miss_started[k]
+            self._miss_started[key] = now
+
+    def _finish_miss(self, key: str) -> float | None:
+        with self._miss_lock:
+            started = self._miss_started.pop(key, None)
+        return (time.perf_counter() - started) * 1000 if started is not None else None
+
+    def _on_lookup(self, key: str, row: tuple[str, float | None] | None) -> RETURN_VAL_TYPE | None:
+        metrics = current_metrics()
+        if row is None:
+            self.misses += 1
+            self._start_miss(key)
+            if metrics is not None:
+                metrics.add("llm_cache_misses", 1)
+            return None
+
+        try:
+            with suppress_langchain_beta_warning():
+                generations = loads(row[0])
+        except Exception:
+            logger.exception("Повреждённая запись в кэше LLM, игнорирую")
+            return None
+        saved_ms = row[1] or 0.0
+        self.hits += 1
+        self.saved_ms += saved_ms
+        if metrics is not None:
+            metrics.add("llm_cache_hits", 1)
+            metrics.add("llm_cache_saved_ms", int(saved_ms))
+        return generations
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        key = self._key(prompt, llm_string)
+        return self._on_lookup(key, self._read(key))
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        self._write(key, return_val, self._finish_miss(key))
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    async def alookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        key = self._key(prompt, llm_string)
+        row = await asyncio.to_thread(self._read, key)
+        # Метрики пишутся здесь, в контексте текущего узла
+        return self._on_lookup(key, row)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        await asyncio.to_thread(self._write, key, return_val, self._finish_miss(key))
+
+    async def aclear(self, **kwargs: Any) -> None:
+        await asyncio.to_thread(self.clear, **kwargs)
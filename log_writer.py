@@ -0,0 +1,231 @@
+"""Фоновая запись логов в JSONL: только дозапись, батчевый fsync, ротация.
+
+Записи ставятся в очередь и пишутся отдельным потоком, поэтому event loop не
+ждёт диск. После каждой пачки файл сбрасывается в ОС (падение процесса не
+теряет записанное), fsync выполняется не чаще раза в `fsync_interval_s`.
+Файлы с ротацией закрываются по размеру или возрасту и при включённом сжатии
+упаковываются в zstd (`runtime_traces.20250101-120000.jsonl.zst`).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько записей писать за один проход, прежде чем сбросить файлы
+_BATCH_SIZE = 512
+
+
+class JsonlLogWriter:
+    def __init__(
+        self,
+        *,
+        fsync_interval_s: float = 1.0,
+        rotate_max_bytes: int = 50 * 1024 * 1024,
+        rotate_interval_s: float = 24 * 3600,
+        compress_rotated: bool = True,
+    ):
+        self.fsync_interval_s = fsync_interval_s
+        self.rotate_max_bytes = rotate_max_bytes
+        self.rotate_interval_s = rotate_interval_s
+        self.compress_rotated = compress_rotated
+
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        # Открытые файлы: путь -> (файл, время первой записи в файле); пишет только фоновый поток
+        self._files: dict[str, tuple] = {}
+        self._dirty: set[str] = set()
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="jsonl-log-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, path: str, record: dict, rotate: bool = False) -> None:
+        """Ставит запись в очередь на дозапись в path (rotate — файл с ротацией)."""
+        if self._closed:
+            logger.warning("Запись в закрытый лог %s пропущена", path)
+            return
+        self._queue.put(("append", path, record, rotate))
+
+    def close_file(self, path: str) -> None:
+        """Закрывает файл после записи всего, что уже стоит в очереди."""
+        self._queue.put(("close", path, None, False))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Ждёт, пока всё поставленное в очередь будет записано и сброшено на диск (fsync)."""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", None, done, False))
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(("stop", None, None, False))
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                items = [self._queue.get(timeout=self.fsync_interval_s)]
+            except queue.Empty:
+                items = []
+            while items and len(items) < _BATCH_SIZE:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            waiters = []
+            try:
+                for kind, path, payload, rotate in items:
+                    try:
+                        if kind == "append":
+                            self._write(path, payload, rotate)
+                        elif kind == "close":
+                            self._close(path)
+                        elif kind == "flush":
+                            waiters.append(payload)
+                        elif kind == "stop":
+                            stop = True
+                    except Exception:
+                        logger.exception("\n[Ошибка]: Не удалось записать лог %s", path)
+
+                self._sync(force=bool(waiters) or stop)
+                if stop:
+                    for path in list(self._files):
+                        self._close_quietly(path)
+            except Exception:
+                # Поток писателя не должен умирать: иначе flush() и close() ждали бы его вечно
+                logger.exception("\n[Ошибка]: Не удалось сбросить логи на диск")
+            finally:
+                for done in waiters:
+                    done.set()
+            if stop:
+                return
+
+    def _open(self, path: str):
+        entry = self._files.get(path)
+        if entry is None:
+            dir_name = os.path.dirname(path)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+            f = open(path, mode="a", encoding="utf-8")
+            # Возраст для ротации — от первой записи файла, а не от открытия: после перезапуска
+            # процесса существующий файл не получает новое окно
+            entry = (f, self._started_at(path) if f.tell() > 0 else time.time())
+            self._files[path] = entry
+        return entry
+
+    @staticmethod
+    def _started_at(path: str) -> float:
+        """Время первой записи файла: поле ts первой строки (trace-события), иначе mtime файла."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                first = json.loads(f.readline())
+            return datetime.fromisoformat(first["ts"]).timestamp()
+        except Exception:
+            return os.path.getmtime(path)
+
+    def _write(self, path: str, record: dict, rotate: bool) -> None:
+        f, opened_at = self._open(path)
+        if rotate and f.tell() > 0 and (
+            f.tell() >= self.rotate_max_bytes or time.time() - opened_at >= self.rotate_interval_s
+        ):
+            self._rotate(path)
+            f, _ = self._open(path)
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._dirty.add(path)
+
+    def _sync(self, force: bool) -> None:
+        if not self._dirty:
+            return
+        do_fsync = force or time.monotonic() - self._last_fsync >= self.fsync_interval_s
+        for path in list(self._dirty):
+            entry = self._files.get(path)
+            if entry is None:
+                self._dirty.discard(path)
+                continue
+            f, _ = entry
+            try:
+                f.flush()
+                if do_fsync:
+                    os.fsync(f.fileno())
+            except OSError:
+                logger.exception("\n[Ошибка]: Не удалось сбросить лог %s", path)
+        if do_fsync:
+            self._dirty.clear()
+            self._last_fsync = time.monotonic()
+
+    def _close(self, path: str) -> None:
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        f, _ = entry
+        try:
+            f.flush()
+            if path in self._dirty:
+                os.fsync(f.fileno())
+        finally:
+            self._dirty.discard(path)
+            f.close()
+
+    def _close_quietly(self, path: str) -> None:
+        try:
+            self._close(path)
+        except Exception:
+            logger.exception("\n[Ошибка]: Не удалось закрыть лог %s", path)
+
+    def _rotate(self, path: str) -> None:
+        self._close(path)
+        stem, ext = os.path.splitext(path)
+        rotated = f"{stem}.{datetime.now().strftime('%Y%m%d-%H%M%S')}{ext}"
+        suffix = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + ".zst"):
+            rotated = f"{stem}.{datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}{ext}"
+            suffix += 1
+        os.replace(path, rotated)
+        logger.info("[Система]: Лог %s ротирован в %s", path, rotated)
+        if self.compress_rotated:
+            self._compress(rotated)
+
+    @staticmethod
+    def _compress(path: str) -> None:
+        try:
+            import zstandard
+        except ImportError:
+            logger.warning("zstandard не установлен, ротированный лог %s оставлен без сжатия", path)
+            return
+        with open(path, "rb") as src, open(path + ".zst", "wb") as dst:
+            zstandard.ZstdCompressor().copy_stream(src, dst)
+        os.remove(path)
+
+
+_writer: JsonlLogWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> JsonlLogWriter:
+    """Общий на процесс писатель логов (создаётся при первом обращении)."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = JsonlLogWriter(
+                fsync_interval_s=config.log_fsync_interval_s,
+                rotate_max_bytes=config.log_rotate_max_bytes,
+                rotate_interval_s=config.log_rotate_interval_s,
+                compress_rotated=config.log_compress_rotated,
+            )
+            # Дописываем очередь при обычном завершении процесса
+            atexit.register(_writer.close)
+        return _writer
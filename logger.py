@@ -1,35 +1,70 @@
 import json
 import os
 import logging
+from collections import deque
 from datetime import datetime
 
+from config import config
+from log_writer import get_log_writer
+from metrics import USAGE_FIELDS
+
 LOGS_DIR = "./logs/"
 MAX_SCENARIOS = 10
+# Общий для всех сессий append-only файл трейсов (с ротацией)
+TRACES_FILENAME = "runtime_traces.jsonl"
 
 
 logger = logging.getLogger(__name__)
 
 
+def session_log_filename(session_id: str) -> str:
+    """Лог по ID сессии: продолженная сессия дописывает тот же лог, а не начинает новый."""
+    return f"interview_log_{session_id}.json"
+
+
 class InterviewLogger:
+    """Лог сессии. Ходы и trace-события сразу дописываются на диск фоновым писателем.
+
+    Ходы копятся в файле `<лог>.turns.jsonl`, из которого save_to_file собирает
+    итоговый JSON; при падении процесса этот файл остаётся на диске. Trace-события
+    всех сессий пишутся в общий `runtime_traces.jsonl` с полем session_id, в памяти
+    остаются только последние `Config.log_recent_trace_events`.
+    """
+
     def __init__(
         self,
         *,
         participant_name: str = "Черненко Иван Денисович",
         output_filename: str | None = None,
+        session_id: str | None = None,
     ):
         self.log_data = {
             "participant_name": participant_name,
-            "turns": [],
-            "final_feedback": ""
+            "final_feedback": "",
+            # Профиль и план нужны для повторной оценки лога (reevaluate.py)
+            "candidate_profile": {},
+            "interview_plan": "",
         }
-        self.trace_events: list[dict] = []
+        self.session_id = session_id
+        self.trace_events: deque[dict] = deque(maxlen=config.log_recent_trace_events)
         self.turn_counter = 1
         self.output_filename = output_filename or self._pick_default_output_filename()
+        self._turns_path: str | None = None
+        self._writer = get_log_writer()
+        # Расход токенов и денег: с прошлого хода и по всей сессии
+        self._turn_usage: dict[str, int | float] = {}
+        self._session_usage: dict[str, int | float] = {}
 
     @staticmethod
     def _pick_default_output_filename() -> str:
         return f"interview_log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
 
+    @staticmethod
+    def _log_path(filename: str) -> str:
+        if os.path.dirname(filename):
+            return filename
+        return os.path.join(LOGS_DIR, filename)
+
     def add_turn(
         self, 
         agent_msg: str, 
@@ -40,10 +75,14 @@ class InterviewLogger:
             "turn_id": self.turn_counter,
             "agent_visible_message": agent_msg,
             "user_message": user_msg,
-            "internal_thoughts": thoughts
+            "internal_thoughts": thoughts,
+            "usage": self._close_turn_usage(),
         }
-            
-        self.log_data["turns"].append(turn_entry)
+        self.add_trace_event(node="usage", phase="turn", turn_count=self.turn_counter, **turn_entry["usage"])
+
+        if self._turns_path is None:
+            self._turns_path = os.path.splitext(self._log_path(self.output_filename))[0] + ".turns.jsonl"
+        self._writer.append(self._turns_path, turn_entry)
         self.turn_counter += 1
 
     def set_final_feedback(self, feedback: str):
@@ -52,9 +91,34 @@ class InterviewLogger:
     def set_participant_name(self, participant_name: str):
         self.log_data["participant_name"] = participant_name
 
+    def set_interview_context(self, candidate_profile: dict, interview_plan: str):
+        self.log_data["candidate_profile"] = candidate_profile
+        self.log_data["interview_plan"] = interview_plan
+
     def set_output_filename(self, output_filename: str):
         self.output_filename = output_filename
 
+    def set_session_id(self, session_id: str):
+        self.session_id = session_id
+
+    @staticmethod
+    def _rounded(usage: dict) -> dict:
+        return {name: round(value, 6) if isinstance(value, float) else value for name, value in usage.items()}
+
+    def _close_turn_usage(self) -> dict:
+        """Расход с прошлого хода (включая фоновые вызовы между ходами); переносится в итог сессии."""
+        usage = self._turn_usage
+        self._turn_usage = {}
+        for name, value in usage.items():
+            self._session_usage[name] = self._session_usage.get(name, 0) + value
+        return self._rounded(usage)
+
+    def session_usage(self) -> dict:
+        totals = dict(self._session_usage)
+        for name, value in self._turn_usage.items():
+            totals[name] = totals.get(name, 0) + value
+        return self._rounded(totals)
+
     def add_trace_event(
         self,
         *,
@@ -62,60 +126,71 @@ class InterviewLogger:
         phase: str,
         turn_count: int | None = None,
         duration_ms: int | None = None,
+        ttft_ms: int | None = None,
         input_messages: int | None = None,
         output_messages: int | None = None,
         input_internal_thoughts: int | None = None,
         output_internal_thoughts: int | None = None,
         error: str | None = None,
+        **extra,
     ):
-        self.trace_events.append(
-            {
-                "ts": datetime.now().isoformat(),
-                "node": node,
-                "phase": phase,
-                "turn_count": turn_count,
-                "duration_ms": duration_ms,
-                "input_messages": input_messages,
-                "output_messages": output_messages,
-                "input_internal_thoughts": input_internal_thoughts,
-                "output_internal_thoughts": output_internal_thoughts,
-                "error": error,
-            }
-        )
+        event = {
+            "ts": datetime.now().isoformat(),
+            "session_id": self.session_id,
+            "node": node,
+            "phase": phase,
+            "turn_count": turn_count,
+            "duration_ms": duration_ms,
+            "ttft_ms": ttft_ms,
+            "input_messages": input_messages,
+            "output_messages": output_messages,
+            "input_internal_thoughts": input_internal_thoughts,
+            "output_internal_thoughts": output_internal_thoughts,
+            "error": error,
+            **extra,
+        }
+        if phase in ("end", "error", "cancelled"):
+            for name in USAGE_FIELDS:
+                if name in extra:
+                    self._turn_usage[name] = self._turn_usage.get(name, 0) + extra[name]
+        self.trace_events.append(event)
+        self._writer.append(os.path.join(LOGS_DIR, TRACES_FILENAME), event, rotate=True)
+
+    def _read_turns(self) -> list[dict]:
+        if self._turns_path is None or not os.path.exists(self._turns_path):
+            return []
+        turns = []
+        with open(self._turns_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    turns.append(json.loads(line))
+        return turns
 
     def save_to_file(self, filename: str | None = None):
+        """Собирает итоговый JSON сессии из уже записанных ходов."""
         try:
-            os.makedirs(LOGS_DIR, exist_ok=True)
             if not filename:
-                filename = f"interview_log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
-
-            if os.path.dirname(filename):
-                file_path = filename
-            else:
-                file_path = os.path.join(LOGS_DIR, filename)
-
-            #     filename = f"interview_log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
-            # file_path = os.path.join(LOGS_DIR, filename)
+                filename = self.output_filename
+            file_path = self._log_path(filename)
 
             dir_name = os.path.dirname(file_path)
             if dir_name:
                 os.makedirs(dir_name, exist_ok=True)
+
+            # Дожидаемся записи ходов (и trace-событий) из очереди
+            self._writer.flush()
+            log_data = {
+                "participant_name": self.log_data["participant_name"],
+                "candidate_profile": self.log_data["candidate_profile"],
+                "interview_plan": self.log_data["interview_plan"],
+                "turns": self._read_turns(),
+                "final_feedback": self.log_data["final_feedback"],
+                "usage": self.session_usage(),
+            }
             with open(file=file_path, mode='w', encoding='utf-8') as f:
-                json.dump(self.log_data, f, ensure_ascii=False, indent=2)
+                json.dump(log_data, f, ensure_ascii=False, indent=2)
+            if self._turns_path is not None:
+                self._writer.close_file(self._turns_path)
             logger.info("\n[Система]: Лог сохранен в %s", filename)
         except Exception as e:
             logger.exception("\n[Ошибка]: Не удалось сохранить лог")
-
-    def save_traces_to_file(self, filename: str | None = None):
-        try:
-            os.makedirs(LOGS_DIR, exist_ok=True)
-            if not filename:
-                filename = "runtime_traces.jsonl"
-            file_path = os.path.join(LOGS_DIR, filename)
-            with open(file=file_path, mode='w', encoding='utf-8') as f:
-                for event in self.trace_events:
-                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
-            logger.info("\n[Система]: Runtime-трейсы сохранены в %s", filename)
-        except Exception as e:
-            logger.exception("\n[Ошибка]: Не удалось сохранить runtime-трейсы")
-
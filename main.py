@@ -1,7 +1,11 @@
-from langchain_core.messages import HumanMessage
+from concurrent.futures import Future
+import argparse
 import logging
 import sys
-from interview_engine import InterviewEngine
+import threading
+from intent import Intent, classify
+from config import config
+from profiling import PROFILE_MODES
 
 
 logging.basicConfig(
@@ -36,6 +40,30 @@ def _print_interviewer(message: str) -> None:
     print(f"\nИнтервьюер: {message}\n")
 
 
+class _InterviewerStreamPrinter:
+    """Печатает вопрос интервьюера по токенам по мере генерации."""
+
+    def __init__(self):
+        self.started = False
+
+    def __call__(self, token: str) -> None:
+        if not self.started:
+            print("\nИнтервьюер: ", end="")
+            self.started = True
+        print(token, end="", flush=True)
+
+    def show(self, message: str) -> None:
+        """Завершает строку после стрима или печатает ответ целиком, если токенов не было."""
+        if self.started:
+            print("\n")
+        elif message:
+            _print_interviewer(message)
+
+
+def _make_stream_printer() -> _InterviewerStreamPrinter | None:
+    return _InterviewerStreamPrinter() if config.stream_responses else None
+
+
 def get_candidate_profile() -> dict:
     _print_header()
     print("\nПрофиль кандидата (можно просто нажимать Enter):\n")
@@ -53,6 +81,31 @@ def get_candidate_profile() -> dict:
     }
 
 
+def _start_engine_loading() -> Future:
+    """Импорт движка и создание агентов в фоновом потоке, пока кандидат заполняет профиль."""
+    future = Future()
+
+    def _load() -> None:
+        try:
+            # Тяжёлые импорты (langchain, langgraph, langchain_openai) — только здесь
+            from interview_engine import InterviewEngine
+
+            engine = InterviewEngine()
+            engine.warm_up()
+            future.set_result(engine)
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=_load, name="engine-loader", daemon=True).start()
+    return future
+
+
+def _wait_engine(loading: Future):
+    if not loading.done():
+        _print_system("Инициализация агентов...")
+    return loading.result()
+
+
 # Здесь костыль через остановку ключевым словом, ничего другого не придумал)
 def get_multiline_input(prompt: str = "Вы: ") -> str:
     print(f"Введите ответ (завершите ввод строкой '--stop--')\n{prompt}")
@@ -69,20 +122,47 @@ def get_multiline_input(prompt: str = "Вы: ") -> str:
     return '\n'.join(lines)
 
 
-def run_interview():
-    try:
-        profile = get_candidate_profile()
+def _use_session_log(engine, session_id: str) -> None:
+    """Лог CLI называется по ID сессии (как в server.py): после --resume ходы дописываются в тот же лог."""
+    from logger import session_log_filename
 
-        _print_system("Инициализация агентов...")
-        engine = InterviewEngine()
+    engine.logger.set_output_filename(session_log_filename(session_id))
 
-        _print_system("Интервью готово к началу.")
-        state = engine.start_interview(profile)
-        state = engine.bootstrap_first_question(state)
 
-        agent_response = state.get("current_agent_response", "")
-        if agent_response:
-            _print_interviewer(agent_response)
+def run_interview(resume_session_id: str | None = None):
+    engine = None
+    loading = _start_engine_loading()
+    try:
+        if resume_session_id:
+            _print_header()
+            engine = _wait_engine(loading)
+            # До восстановления: прерванный ход доигрывается и пишется в лог сессии
+            _use_session_log(engine, resume_session_id)
+            state = engine.resume_session(resume_session_id)
+            if state is None:
+                _print_system(f"Сессия {resume_session_id} не найдена.")
+                return
+            if state.get("is_finished"):
+                _print_system("Это интервью уже завершено.")
+                return
+            _print_system(f"Продолжаем интервью с хода {state.get('turn_count', 0) + 1}.")
+            _print_interviewer(state.get("current_agent_response", ""))
+        else:
+            profile = get_candidate_profile()
+            engine = _wait_engine(loading)
+
+            _print_system("Интервью готово к началу.")
+            state = engine.start_interview(profile)
+            _use_session_log(engine, state["session_id"])
+            _print_system(f"ID сессии: {state['session_id']} (продолжить: python main.py --resume <ID>)")
+            printer = _make_stream_printer()
+            state = engine.bootstrap_first_question(state, on_token=printer)
+
+            agent_response = state.get("current_agent_response", "")
+            if printer:
+                printer.show(agent_response)
+            elif agent_response:
+                _print_interviewer(agent_response)
 
         while True:
             try:
@@ -92,13 +172,7 @@ def run_interview():
                     _print_system("Введите ответ.")
                     continue
 
-                stop_keywords = [
-                    "стоп", "фидбэк", "хватит", "заверши", "закончи", 
-                    "стоп игра", "давай фидбэк", "хочу завершить", 
-                    "завершить интервью", "закончить интервью", "стоп интервью"
-                ]
-                user_input_lower = user_input.lower()
-                if any(keyword in user_input_lower for keyword in stop_keywords):
+                if classify(user_input) is Intent.STOP:
                     _print_system("Завершаю интервью...\n")
                     state = engine.process_user_input(state, user_input)
                     if state.get("is_finished"):
@@ -112,7 +186,8 @@ def run_interview():
                     break
                 
                 # Обрабатываем ввод пользователя
-                state = engine.process_user_input(state, user_input)
+                printer = _make_stream_printer()
+                state = engine.process_user_input(state, user_input, on_token=printer)
                 
                 # Проверяем, завершено ли интервью
                 if state.get("is_finished"):
@@ -128,7 +203,9 @@ def run_interview():
                 
                 # Выводим ответ интервьюера и ждем следующего ввода пользователя
                 agent_response = state.get("current_agent_response", "")
-                if agent_response:
+                if printer and (printer.started or agent_response):
+                    printer.show(agent_response)
+                elif agent_response:
                     _print_interviewer(agent_response)
                 else:
                     # если нет ответа, все равно ждем следующего ввода
@@ -151,7 +228,16 @@ def run_interview():
     except Exception as e:
         logger.exception("\n[Критическая ошибка]")
         logger.info("[Система]: Не удалось запустить систему интервью.")
+    finally:
+        if engine is not None:
+            engine.close()
 
 
 if __name__ == "__main__":
-    run_interview()
+    parser = argparse.ArgumentParser(description="Multi-Agent Interview Coach")
+    parser.add_argument("--resume", metavar="SESSION_ID", help="продолжить прерванное интервью")
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="профилировать узлы графа (файлы в logs/profiles)")
+    args = parser.parse_args()
+    if args.profile:
+        config.profile_mode = args.profile
+    run_interview(args.resume)
@@ -0,0 +1,151 @@
+"""Метрики текущего запуска узла графа.
+
+wrap_node открывает сбор метрик на время выполнения узла, а всё, что происходит
+внутри (вызовы LLM, кэши, инструменты), пишет в него через ContextVar. Собранные
+значения попадают в trace-событие "end" этого узла.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from config import config
+
+
+# Поля метрик с расходом токенов и денег: суммируются по ходу и по сессии.
+# observer_calls_avoided — ответы, оценённые локально без вызова observer (intent.py)
+USAGE_FIELDS = (
+    "llm_calls", "prompt_tokens", "completion_tokens", "cached_tokens", "tool_calls", "cost_usd",
+    "observer_calls_avoided",
+)
+
+
+def llm_cost_usd(model: str | None, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float | None:
+    """Стоимость вызова по Config.model_prices (None, если цена модели неизвестна)."""
+    prices = config.model_prices.get(model) or config.model_prices.get(config.model_name)
+    if prices is None:
+        return None
+    return (
+        (prompt_tokens - cached_tokens) * prices["input"]
+        + cached_tokens * prices.get("cached_input", prices["input"])
+        + completion_tokens * prices["output"]
+    ) / 1_000_000
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class NodeMetrics:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.values: dict[str, Any] = {}
+
+    def elapsed_ms(self) -> int:
+        return int((time.perf_counter() - self.started_at) * 1000)
+
+    def set_once(self, name: str, value: Any) -> None:
+        self.values.setdefault(name, value)
+
+    def add(self, name: str, value: int | float) -> None:
+        self.values[name] = self.values.get(name, 0) + value
+
+
+_current_metrics: ContextVar[NodeMetrics | None] = ContextVar("node_metrics", default=None)
+
+
+@contextmanager
+def collect_node_metrics() -> Iterator[NodeMetrics]:
+    metrics = NodeMetrics()
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+def current_metrics() -> NodeMetrics | None:
+    return _current_metrics.get()
+
+
+class NodeMetricsCallbackHandler(BaseCallbackHandler):
+    """Снимает метрики вызовов LLM в метрики текущего узла."""
+
+    # Обработчик должен выполняться в контексте вызова, иначе ContextVar не виден
+    run_inline = True
+
+    def __init__(self):
+        # Старт незавершённых вызовов модели по run_id
+        self._llm_started: dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: list, *, run_id: UUID, **kwargs: Any) -> None:
+        if current_metrics() is not None:
+            self._llm_started[run_id] = time.perf_counter()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._add_llm_time(run_id)
+        metrics = current_metrics()
+        # Отмена — не ошибка модели: проигравший дубль запроса (hedging), ненужный спекулятивный вызов
+        if metrics is not None and not isinstance(error, asyncio.CancelledError):
+            # Ошибка модели; если ответ всё же есть, его дал повтор или запасная модель (поле model)
+            metrics.add("llm_errors", 1)
+
+    def _add_llm_time(self, run_id: UUID) -> None:
+        started = self._llm_started.pop(run_id, None)
+        metrics = current_metrics()
+        if started is not None and metrics is not None:
+            # Время внутри вызовов модели: остальное в duration_ms — накладные расходы узла
+            metrics.add("llm_ms", int((time.perf_counter() - started) * 1000))
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        metrics = current_metrics()
+        if metrics is not None and token:
+            # Время до первого токена считается от старта узла, как и duration_ms
+            metrics.set_once("ttft_ms", metrics.elapsed_ms())
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._add_llm_time(run_id)
+        metrics = current_metrics()
+        if metrics is None:
+            return
+        llm_output = response.llm_output or {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                # Ответ из кэша LangChain помечает нулевой стоимостью: за него не платим
+                if not usage or usage.get("total_cost") == 0:
+                    continue
+                prompt_tokens = usage.get("input_tokens", 0)
+                completion_tokens = usage.get("output_tokens", 0)
+                cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+                metrics.add("llm_calls", 1)
+                metrics.add("prompt_tokens", prompt_tokens)
+                metrics.add("completion_tokens", completion_tokens)
+                metrics.add("cached_tokens", cached_tokens)
+                model = message.response_metadata.get("model_name") or llm_output.get("model_name")
+                if model:
+                    metrics.set_once("model", model)
+                cost = llm_cost_usd(model, prompt_tokens, cached_tokens, completion_tokens)
+                if cost is not None:
+                    metrics.add("cost_usd", cost)
+
+    def on_tool_start(
+        self, serialized: dict[str, Any], input_str: str, *, inputs: dict | None = None, **kwargs: Any
+    ) -> None:
+        metrics = current_metrics()
+        if metrics is None:
+            return
+        metrics.add("tool_calls", 1)
+        if (serialized or {}).get("name", kwargs.get("name")) == "tavily_search":
+            # Tavily тарифицирует поиск в кредитах: basic — 1, advanced — 2
+            credits = 2 if (inputs or {}).get("search_depth") == "advanced" else 1
+            metrics.add("cost_usd", credits * config.tavily_credit_price_usd)
@@ -1,13 +1,16 @@
 """Узлы графа интервью."""
 from .planner_node import planner_node
+from .intent_node import intent_node
 from .observer_node import observer_node
 from .interviewer_node import interviewer_node
-from .manager_node import manager_node
+from .manager_node import manager_node, draft_feedback
 
 __all__ = [
     "planner_node",
+    "intent_node",
     "observer_node",
     "interviewer_node",
     "manager_node",
+    "draft_feedback",
 ]
 
@@ -0,0 +1,43 @@
+from langchain_core.messages import HumanMessage
+import logging
+from state import AgentState
+from intent import Intent, TRIVIAL_INTENTS, classify
+from metrics import current_metrics
+from nodes.observer_node import FINISH_REQUESTED_THOUGHT
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+
+async def intent_node(state: AgentState) -> dict:
+    """Локально классифицирует новый ответ кандидата до observer (без вызова LLM).
+
+    Просьба о завершении сразу ведёт в manager, тривиальные ответы observer
+    оценивает по шаблону (см. observer_node).
+    """
+    messages = state.get('messages', [])
+    if not messages or not isinstance(messages[-1], HumanMessage):
+        return {"turn_intent": ""}
+
+    intent = classify(messages[-1].content)
+    logger.debug("Turn intent: %s", intent.value)
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.set_once("intent", intent.value)
+
+    if intent is Intent.STOP:
+        if metrics is not None:
+            metrics.add("observer_calls_avoided", 1)
+        return {
+            "turn_intent": intent.value,
+            "internal_thoughts": [FINISH_REQUESTED_THOUGHT],
+            "is_finished": True,
+        }
+
+    if intent in TRIVIAL_INTENTS and config.intent_fast_path_enabled:
+        if metrics is not None:
+            metrics.add("observer_calls_avoided", 1)
+        return {"turn_intent": intent.value}
+
+    return {"turn_intent": Intent.ANSWER.value}
@@ -1,12 +1,15 @@
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import AIMessage
 import logging
 from state import AgentState
+from context_builder import ContextBuilder
+from prompt_assembly import assemble_messages, session_context
+from prompts import interviewer_prompt
 
 
 logger = logging.getLogger(__name__)
 
 
-def interviewer_node(state: AgentState, interviewer_agent) -> dict:
+async def interviewer_node(state: AgentState, interviewer_agent) -> dict:
     messages = state.get('messages', [])
     internal_thoughts = state.get('internal_thoughts', [])
     profile = state.get('candidate_profile', {})
@@ -20,29 +23,26 @@ def interviewer_node(state: AgentState, interviewer_agent) -> dict:
                 last_observer_thought = thought
                 break
 
-    context_prompt = f"""ПРОФИЛЬ КАНДИДАТА:
-    - Позиция: {profile.get('role', 'Не указано')}
-    - Уровень: {profile.get('grade', 'Не указано')}
-    - Опыт: {profile.get('exp', 'Не указано')}
+    # План и оценка наблюдателя важнее старой истории диалога, поэтому получают бюджет первыми
+    builder = ContextBuilder("interviewer", reserved_text=interviewer_prompt)
+    interview_plan = builder.add_text(interview_plan, max_share=0.3)
+    last_observer_thought = builder.add_text(last_observer_thought, max_share=0.15)
 
-    Текущий уровень сложности вопросов (1-5): {difficulty_level}
-    
-    План проведения интервью:
-    {interview_plan}
-    
-    Мысли наблюдателя интервью:
-    {last_observer_thought}"""
-    
-    try:
-        agent_messages = [
-            SystemMessage(content=context_prompt)
-        ]
+    # Сложность и мысль наблюдателя меняются каждый ход: они идут после профиля, плана и истории,
+    # чтобы префикс запроса совпадал с прошлым ходом (кэш промптов провайдера)
+    turn_context = (
+        f"Текущий уровень сложности вопросов (1-5): {difficulty_level}\n\n"
+        f"Мысли наблюдателя интервью:\n{last_observer_thought}"
+    )
 
-        if messages:
-            recent_messages = messages[-6:] if len(messages) > 6 else messages
-            agent_messages.extend(recent_messages)
+    try:
+        # Последний вопрос и ответ попадают всегда, более старые — пока хватает бюджета
+        history = builder.add_messages(messages) if messages else []
+        agent_messages = assemble_messages(
+            session_context(profile, interview_plan, include_name=False), turn_context, history,
+        )
 
-        agent_result = interviewer_agent.invoke({"messages": agent_messages})
+        agent_result = await interviewer_agent.ainvoke({"messages": agent_messages})
 
         agent_messages_result = agent_result.get("messages", [])
         response_content = ""
@@ -1,82 +1,144 @@
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import AIMessage
 import logging
 from state import AgentState
 from summarizer import summarize_observer_thoughts
+from context_builder import ContextBuilder
+from prompt_assembly import assemble_messages, session_context
+from prompts import manager_prompt
+from search_prefetch import build_query, extract_gap_topics, format_resources
+from nodes.observer_node import FINISH_REQUESTED_THOUGHT
+from config import config
 
 
 logger = logging.getLogger(__name__)
 
-def manager_node(state: AgentState, manager_agent, observer_agent) -> dict:
-    """Менеджер, формирующий финальный фидбэк по итогам интервью."""
-    messages = state.get('messages', [])
+# Заголовок ответа manager, если фидбэк не удалось сгенерировать
+FEEDBACK_ERROR_HEADER = "=== ФИНАЛЬНЫЙ ФИДБЭК ==="
+
+FEEDBACK_INSTRUCTION = """Сформируй финальный фидбэк по итогам технического интервью на основе предоставленной информации.
+
+            Если в Knowledge Gaps есть темы, подбери 3-5 актуальных источников (документация/статьи/книги/курсы) для улучшения знаний.
+            Если в контексте есть найденные ресурсы, выбери из них; иначе, если доступен веб-поиск, используй инструмент `tavily_search`.
+            Верни рекомендации в структурированном виде: название + ссылка + почему полезно.
+            """
+
+REFINE_INSTRUCTION = """Перед тобой черновик финального фидбэка, составленный по ходу интервью, и наблюдения по последним ответам кандидата.
+            Обнови черновик с учётом новых наблюдений: поправь вердикт, навыки, пробелы и roadmap, если они изменились.
+            Если в контексте есть найденные ресурсы, которых нет в черновике, добавь их в рекомендации.
+            Верни финальный фидбэк целиком в той же структуре.
+            """
+
+
+async def _prefetched_resources(topics: list[str], profile: dict, search_prefetcher) -> str:
+    if search_prefetcher is None or not topics:
+        return ""
+    queries = [build_query(topic, profile.get('role')) for topic in topics]
+    found = await search_prefetcher.fetch(queries, timeout=config.search_prefetch_wait_s)
+    logger.debug("Manager prefetched resources: %s of %s topics", len(found), len(topics))
+    return format_resources(topics, queries, found)
+
+
+async def _generate_feedback(manager_agent, profile: dict, context_prompt: str, instruction: str) -> str:
+    # Профиль — общий префикс черновиков и финального фидбэка сессии (кэш промптов провайдера)
+    agent_messages = assemble_messages(session_context(profile), context_prompt, instruction=instruction)
+
+    # Вызываем агента через его граф
+    agent_result = await manager_agent.ainvoke({"messages": agent_messages})
+
+    # Ищем последнее сообщение от агента
+    for msg in reversed(agent_result.get("messages", [])):
+        if isinstance(msg, AIMessage):
+            return msg.content
+    return ""
+
+
+async def draft_feedback(
+    profile: dict, observer_thoughts: str, gap_topics: list[str], manager_agent, search_prefetcher=None
+) -> str:
+    """Черновик финального фидбэка по наблюдениям на текущий момент (строится в фоне по ходу интервью)."""
+    builder = ContextBuilder("manager", reserved_text=manager_prompt)
+    observer_thoughts = builder.add_text(observer_thoughts)
+    resources = builder.add_text(await _prefetched_resources(gap_topics, profile, search_prefetcher))
+
+    context_prompt = f"""Анализ ответов кандидата на текущий момент, проведенный наблюдателем:
+    {observer_thoughts}"""
+    if resources:
+        context_prompt += f"""
+
+    Найденные ресурсы по темам из Knowledge Gaps:
+    {resources}"""
+
+    return await _generate_feedback(manager_agent, profile, context_prompt, FEEDBACK_INSTRUCTION)
+
+
+async def _refine_draft(state: AgentState, new_thoughts: list[str], manager_agent, search_prefetcher) -> str:
+    """Уточняет черновик фидбэка наблюдениями, появившимися после него."""
+    profile = state.get('candidate_profile', {})
+    builder = ContextBuilder("manager", reserved_text=manager_prompt)
+    new_observations = builder.add_text("\n".join(new_thoughts), max_share=0.3)
+    draft = builder.add_text(state['feedback_draft'])
+    observer_thoughts_list = [t for t in state.get('internal_thoughts', []) if "[Observer]" in t]
+    topics = extract_gap_topics(observer_thoughts_list, config.search_prefetch_max_topics)
+    resources = builder.add_text(await _prefetched_resources(topics, profile, search_prefetcher))
+
+    context_prompt = f"""Черновик финального фидбэка:
+    {draft}
+
+    Новые наблюдения по последним ответам кандидата:
+    {new_observations}"""
+    if resources:
+        context_prompt += f"""
+
+    Найденные ресурсы по темам из Knowledge Gaps:
+    {resources}"""
+
+    return await _generate_feedback(manager_agent, profile, context_prompt, REFINE_INSTRUCTION)
+
+
+async def manager_node(state: AgentState, manager_agent, summarizer_agent, search_prefetcher=None) -> dict:
+    """Менеджер, формирующий финальный фидбэк по итогам интервью.
+
+    С search_prefetcher ресурсы по пробелам в знаниях уже найдены в фоне по ходу
+    интервью и передаются в контексте, без вызова инструмента поиска.
+    Если по ходу интервью собран черновик фидбэка (feedback_draft), он только
+    уточняется наблюдениями последних ходов.
+    """
     internal_thoughts = state.get('internal_thoughts', [])
     logger.debug("Manager internal thoughts count: %s", len(internal_thoughts))
-    profile = state.get('candidate_profile', {})
-    
+
     # Все мысли Observer
     observer_thoughts_list = [
         thought for thought in internal_thoughts
         if "[Observer]" in thought
     ]
-    
-    # Суммаризируем мысли observer для экономии контекста
-    observer_thoughts = summarize_observer_thoughts(observer_thoughts_list, observer_agent)
-    
-    # Дополнительная проверка: если суммаризация все еще слишком длинная, обрезаем
-    # Ограничиваем до 8000 символов для безопасности (оставляем место для промпта и ответа)
-    if len(observer_thoughts) > 8000:
-        logger.warning(f"Observer thoughts still too long ({len(observer_thoughts)} chars), truncating to 8000")
-        observer_thoughts = observer_thoughts[:8000] + "\n\n[... анализ обрезан для экономии контекста ...]"
-    
-    # Формируем контекст для агента
-    context_prompt = f"""Профиль кандидата:
-    - Имя: {profile.get('name', 'Не указано')}
-    - Позиция: {profile.get('role', 'Не указано')}
-    - Заявленный уровень: {profile.get('grade', 'Не указано')}
-    - Опыт: {profile.get('exp', 'Не указано')}
-    
-    Суммаризированный анализ всех ответов кандидата, проведенный наблюдателем:
-    {observer_thoughts}"""
-    
-    logger.debug(f"Manager context length: {len(context_prompt)} characters")
-    
+
     try:
-        agent_messages = [
-            SystemMessage(content=context_prompt),
-            HumanMessage(content="""Сформируй финальный фидбэк по итогам технического интервью на основе предоставленной информации.
+        draft_thoughts = state.get('feedback_draft_thoughts', 0)
+        if state.get('feedback_draft') and draft_thoughts:
+            new_thoughts = [t for t in observer_thoughts_list[draft_thoughts:] if t != FINISH_REQUESTED_THOUGHT]
+            if new_thoughts:
+                feedback = await _refine_draft(state, new_thoughts, manager_agent, search_prefetcher)
+                manager_thought = (f"[Manager]: Финальный фидбэк уточнён по черновику "
+                                   f"({len(new_thoughts)} новых наблюдений).\n")
+            else:
+                feedback = state['feedback_draft']
+                manager_thought = "[Manager]: Финальный фидбэк взят из черновика: новых наблюдений нет.\n"
+        else:
+            feedback = await _cold_feedback(state, observer_thoughts_list, manager_agent, summarizer_agent, search_prefetcher)
+            manager_thought = "[Manager]: Финальный фидбэк сформирован на основе суммаризированных наблюдений и профиля кандидата.\n"
 
-            Если в Knowledge Gaps есть темы, подбери 3-5 актуальных источников (документация/статьи/книги/курсы) для улучшения знаний.
-            Если доступен веб-поиск, используй инструмент `tavily_search`.
-            Верни рекомендации в структурированном виде: название + ссылка + почему полезно.
-            """)
-        ]
-
-        # Вызываем агента через его граф
-        agent_result = manager_agent.invoke({"messages": agent_messages})
-
-        # Извлекаем ответ агента
-        agent_messages_result = agent_result.get("messages", [])
-        feedback = ""
-        
-        if agent_messages_result:
-            # Ищем последнее сообщение от агента
-            for msg in reversed(agent_messages_result):
-                if isinstance(msg, AIMessage):
-                    feedback = msg.content
-                    break
-        
         if not feedback:
             feedback = "Не удалось сгенерировать фидбэк."
-        
+
         logger.debug(f"Manager feedback generated: {len(feedback)} characters")
-        
+
         return {
             "is_finished": True,
             "current_agent_response": feedback,
-            "internal_thoughts": ["[Manager]: Финальный фидбэк сформирован на основе суммаризированных наблюдений и профиля кандидата.\n"],
+            "internal_thoughts": [manager_thought],
         }
     except Exception as e:
-        error_feedback = f"""=== ФИНАЛЬНЫЙ ФИДБЭК ===
+        error_feedback = f"""{FEEDBACK_ERROR_HEADER}
         Произошла техническая ошибка при генерации фидбэка: {e}
         """
         logger.exception(f"Manager error {e}")
@@ -86,3 +148,38 @@ def manager_node(state: AgentState, manager_agent, observer_agent) -> dict:
             "internal_thoughts": [f"[Manager]: {error_feedback}\n"],
         }
 
+
+async def _cold_feedback(
+    state: AgentState, observer_thoughts_list: list[str], manager_agent, summarizer_agent, search_prefetcher
+) -> str:
+    """Фидбэк без черновика: резюме всех наблюдений и полная генерация."""
+    profile = state.get('candidate_profile', {})
+
+    folded_count = state.get('observer_summary_thoughts', 0)
+    if folded_count:
+        # Rolling summary уже собран в фоне по ходу интервью:
+        # дописываем только мысли, появившиеся после последней свёртки
+        observer_thoughts = "\n".join([state.get('observer_summary', ''), *observer_thoughts_list[folded_count:]])
+    else:
+        # Суммаризируем мысли observer для экономии контекста
+        observer_thoughts = await summarize_observer_thoughts(observer_thoughts_list, summarizer_agent)
+
+    # Если анализ все еще не влезает в бюджет manager, обрезаем
+    # (оставляем место для промпта и ответа)
+    builder = ContextBuilder("manager", reserved_text=manager_prompt)
+    observer_thoughts = builder.add_text(observer_thoughts)
+    topics = extract_gap_topics(observer_thoughts_list, config.search_prefetch_max_topics)
+    resources = builder.add_text(await _prefetched_resources(topics, profile, search_prefetcher))
+
+    # Формируем контекст для агента
+    context_prompt = f"""Суммаризированный анализ всех ответов кандидата, проведенный наблюдателем:
+    {observer_thoughts}"""
+    if resources:
+        context_prompt += f"""
+
+    Найденные ресурсы по темам из Knowledge Gaps:
+    {resources}"""
+
+    logger.debug(f"Manager context length: {len(context_prompt)} characters")
+
+    return await _generate_feedback(manager_agent, profile, context_prompt, FEEDBACK_INSTRUCTION)
@@ -1,12 +1,104 @@
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import AIMessage
 import logging
+from typing import Literal
+from pydantic import BaseModel, Field
 from state import AgentState
+from context_builder import ContextBuilder
+from prompt_assembly import assemble_messages, session_context
+from prompts import observer_prompt, observer_verdict_prompt
+from intent import Intent
+from config import config
 
 
 logger = logging.getLogger(__name__)
 
+# Мысль при явной просьбе кандидата завершить интервью (оценки ответа в ней нет)
+FINISH_REQUESTED_THOUGHT = "[Observer]: Кандидат запросил завершение интервью. Требуется финальный фидбэк.\n"
+# Мысль, если вызов LLM упал: ответ остался без оценки
+ANALYSIS_ERROR_THOUGHT = "[Observer]: Ошибка анализа\n"
 
-def observer_node(state: AgentState, observer_agent) -> dict:
+# Оценки тривиальных ответов без вызова LLM (намерение определяет intent_node):
+# мысль, инструкция интервьюеру, изменение сложности
+FAST_PATH_ASSESSMENTS = {
+    Intent.EMPTY.value: (
+        "[Observer]: Кандидат не дал ответа. Рекомендация: повторить вопрос проще или дать наводку.\n",
+        "Кандидат ничего не ответил. Переформулируй текущий вопрос проще или дай наводку.",
+        0,
+    ),
+    Intent.DONT_KNOW.value: (
+        "[Observer]: Неправильно: кандидат не знает ответа на вопрос. Рекомендация: перейти к следующей теме плана.\n",
+        "Кандидат не знает ответа. Не настаивай, переходи к следующей теме плана с вопросом попроще.",
+        -1,
+    ),
+    Intent.OFF_TOPIC.value: (
+        "[Observer]: Ответ не по существу вопроса. Рекомендация: вернуть кандидата к текущему вопросу.\n",
+        "Кандидат ответил не по существу. Вежливо верни его к текущему вопросу.",
+        0,
+    ),
+}
+
+
+class ObserverVerdict(BaseModel):
+    """Структурированная оценка ответа кандидата (Config.observer_structured_output)."""
+
+    score: int = Field(ge=0, le=10, description="Оценка ответа от 0 до 10")
+    correctness: Literal["correct", "partial", "incorrect"] = Field(
+        description="Правильность ответа: correct, partial или incorrect"
+    )
+    gaps: list[str] = Field(default_factory=list, description="Темы пробелов в знаниях, 2-5 слов на тему")
+    next_action: Literal["clarify", "next_topic", "harder", "easier"] = Field(
+        description="Что делать интервьюеру: уточнить, следующая тема, усложнить, упростить"
+    )
+    finished: bool = Field(
+        description="Кандидат ответил на последний вопрос плана или попросил завершить интервью"
+    )
+    comment: str = Field(default="", description="Ключевые ошибки или сильные стороны, не более 2 предложений")
+
+
+# Изменение сложности по оценке с поправкой на next_action (harder/easier), не больше шага за ход
+_CORRECTNESS_DIFFICULTY = {"correct": 1, "partial": 0, "incorrect": -1}
+_CORRECTNESS_TEXT = {"correct": "Правильно", "partial": "Частично правильно", "incorrect": "Неправильно"}
+_NEXT_ACTIONS = {
+    "clarify": ("уточнить текущий вопрос", "Попроси кандидата уточнить и раскрыть ответ на текущий вопрос."),
+    "next_topic": ("перейти к следующей теме плана", "Переходи к следующей теме плана интервью."),
+    "harder": ("усложнить вопросы", "Кандидат уверенно отвечает: задай вопрос сложнее."),
+    "easier": ("упростить вопросы", "Кандидат затрудняется: задай вопрос проще."),
+}
+
+
+def observer_system_prompt() -> str:
+    """Системный промпт observer для текущего режима вывода."""
+    return observer_verdict_prompt if config.observer_structured_output else observer_prompt
+
+
+def _apply_verdict(verdict: ObserverVerdict, current_difficulty: int) -> dict:
+    """Обновление state по структурированной оценке: сложность и завершение — прямо из полей."""
+    delta = _CORRECTNESS_DIFFICULTY[verdict.correctness]
+    if verdict.next_action == "harder":
+        delta += 1
+    elif verdict.next_action == "easier":
+        delta -= 1
+    recommendation, instructions = _NEXT_ACTIONS[verdict.next_action]
+
+    # Компактная мысль для interviewer и manager; строка "Пробелы:" нужна search_prefetch
+    thought = f"[Observer]: {_CORRECTNESS_TEXT[verdict.correctness]} ({verdict.score}/10)."
+    if verdict.comment:
+        thought += f" {verdict.comment.strip()}"
+    thought += f" Рекомендация: {recommendation}."
+    gaps = [gap.strip() for gap in verdict.gaps if gap.strip()]
+    if gaps:
+        thought += f" Пробелы: {'; '.join(gaps)}"
+
+    return {
+        "internal_thoughts": [thought.replace('\n', ' ') + "\n"],
+        "observer_verdict": verdict.model_dump(),
+        "observer_instructions": instructions,
+        "is_finished": verdict.finished,
+        "difficulty_level": min(5, max(1, current_difficulty + max(-1, min(1, delta)))),
+    }
+
+
+async def observer_node(state: AgentState, observer_agent) -> dict:
     if not state.get('messages'):
         return {
             "internal_thoughts": ["[Observer]: Начало интервью. Инициализация анализа.\n"],
@@ -22,44 +114,50 @@ def observer_node(state: AgentState, observer_agent) -> dict:
         question = "Представьтесь."
     last_user_msg = state['messages'][-1].content
     
-    # Проверка на стоп
-    stop_keywords = [
-        "стоп", "фидбэк", "хватит", "заверши", "закончи",
-        "стоп игра", "давай фидбэк", "хочу завершить",
-        "завершить интервью", "закончить интервью", "стоп интервью"
-    ]
-    if any(keyword in last_user_msg.lower() for keyword in stop_keywords):
+    current_difficulty = state.get('difficulty_level', 2)
+
+    # Пустой ответ, «не знаю», ответ без содержания: оценка по шаблону без LLM
+    fast_path = FAST_PATH_ASSESSMENTS.get(state.get('turn_intent', ''))
+    if fast_path is not None:
+        thought, instructions, difficulty_delta = fast_path
         return {
-            "internal_thoughts": ["[Observer]: Кандидат запросил завершение интервью. Требуется финальный фидбэк.\n"],
-            "is_finished": True
+            "internal_thoughts": [thought],
+            "observer_instructions": instructions,
+            "difficulty_level": min(5, max(1, current_difficulty + difficulty_delta)),
         }
-    
+
     profile = state.get('candidate_profile', {})
-    current_difficulty = state.get('difficulty_level', 2)
     interview_plan = state.get('interview_plan', "Плана нет")
 
-    context_prompt = f"""Профиль кандидата:
-    - Имя: {profile.get('name', 'Не указано')} 
-    - Позиция: {profile.get('role', 'Не указано')} 
-    - Заявленный уровень: {profile.get('grade', 'Не указано')} 
-    - Опыт: {profile.get('exp', 'Не указано')} 
-    
-    План интервью: 
-    {interview_plan} 
-    
-    Вопрос на который должен был ответить кандидат: 
-    "{question}" 
-    Ответ кандидата: 
-    "{last_user_msg}" """
+    # Длинный ответ (например, код) обрезается в последнюю очередь, но не раздувает промпт
+    builder = ContextBuilder("observer", reserved_text=observer_system_prompt())
+    interview_plan = builder.add_text(interview_plan, max_share=0.3)
+    question = builder.add_text(question, max_share=0.2)
+    last_user_msg = builder.add_text(last_user_msg)
+
+    # Профиль и план — общий для всех ходов префикс (кэш промптов провайдера), вопрос и ответ — после него
+    turn_context = (
+        f'Вопрос, на который должен был ответить кандидат:\n"{question}"\n'
+        f'Ответ кандидата:\n"{last_user_msg}"'
+    )
 
     try:
-        messages = [
-            SystemMessage(content=context_prompt),
-            HumanMessage(content="Проанализируй ответ кандидата и дай свою оценку.")
-        ]
+        messages = assemble_messages(
+            session_context(profile, interview_plan),
+            turn_context,
+            instruction="Проанализируй ответ кандидата и дай свою оценку.",
+        )
+
+        agent_result = await observer_agent.ainvoke({"messages": messages})
 
-        agent_result = observer_agent.invoke({"messages": messages})
+        verdict = agent_result.get("structured_response")
+        if isinstance(verdict, dict):
+            verdict = ObserverVerdict.model_validate(verdict)
+        if verdict is not None:
+            logger.debug("Observer verdict: %s", verdict)
+            return _apply_verdict(verdict, current_difficulty)
 
+        # Режим свободного текста (Config.observer_structured_output = None)
         agent_messages = agent_result.get("messages", [])
         analysis = ""
         if agent_messages:
@@ -83,17 +181,17 @@ def observer_node(state: AgentState, observer_agent) -> dict:
             next_difficulty = current_difficulty
         
         logger.debug(f"Observer response generated: {len(analysis)} characters")
+        analysis_line = analysis.replace('\n', ' ')
         
         return {
-            "internal_thoughts": [f"[Observer]: {analysis.replace('\n', ' ')}\n"],
+            "internal_thoughts": [f"[Observer]: {analysis_line}\n"],
             "is_finished": is_finished,
             "difficulty_level": next_difficulty
         }
     except Exception as e:
-        error_msg = "[Observer]: Ошибка анализа\n"
         logger.exception(f"Observer error: {e}")
         return {
-            "internal_thoughts": [error_msg],
+            "internal_thoughts": [ANALYSIS_ERROR_THOUGHT],
             "observer_instructions": "Продолжи интервью с текущим уровнем сложности.",
             "difficulty_level": current_difficulty
         }
@@ -1,38 +1,33 @@
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import AIMessage
 import logging
 from state import AgentState
+from prompt_assembly import assemble_messages, session_context
 
 
 logger = logging.getLogger(__name__)
 
+PLAN_NOT_GENERATED = "Не удалось сгенерировать план интервью."
+PLAN_ERROR = "[Planner]: Ошибка планирования"
 
-def planner_node(state: AgentState, planner_agent) -> dict:
+
+async def planner_node(state: AgentState, planner_agent) -> dict:
     if not state.get('messages'):
         last_user_msg = "кандидат ещё ничего не писал"
     else:
         last_user_msg = state['messages'][-1].content
     profile = state.get('candidate_profile', {})
 
-    context_prompt = f"""Профиль кандидата:
-    - Имя: {profile.get('name', 'Не указано')}
-    - Позиция: {profile.get('role', 'Не указано')}
-    - Заявленный уровень: {profile.get('grade', 'Не указано')}
-    - Опыт: {profile.get('exp', 'Не указано')}
-
-    Самый первый ответ кандидата:
-    "{last_user_msg}"
-    """
-
     try:
-        # Создаем сообщения для агента
-        messages = [
-            SystemMessage(content=context_prompt),
-            HumanMessage(content="Составь план интервью на основе предоставленной информации о кандидате."
-                                 "На забывай контролировать размер плана интервью, не увеличивай его излишне.")
-        ]
+        # Создаем сообщения для агента; без имени кандидата: план кэшируется по профилю (plan_cache.profile_key)
+        messages = assemble_messages(
+            session_context(profile, include_name=False),
+            f'Самый первый ответ кандидата:\n"{last_user_msg}"',
+            instruction="Составь план интервью на основе предоставленной информации о кандидате."
+                        "На забывай контролировать размер плана интервью, не увеличивай его излишне.",
+        )
 
         # Вызываем агента через его граф
-        agent_result = planner_agent.invoke({"messages": messages})
+        agent_result = await planner_agent.ainvoke({"messages": messages})
         # Извлекаем ответ агента
         # Агент возвращает граф с сообщениями, нужно найти последний ответ
         agent_messages = agent_result.get("messages", [])
@@ -45,21 +40,21 @@ def planner_node(state: AgentState, planner_agent) -> dict:
                     break
 
         if not plan:
-            plan = "Не удалось сгенерировать план интервью."
+            plan = PLAN_NOT_GENERATED
 
         logger.debug(f"Planner response generated: {len(plan)} characters")
 
         # Преобразуем план в строку (убираем переносы строк для компактности)
         plan_str = plan.replace('\n', ' ').strip()
 
-        plan_thought = plan.strip()
+        plan_thought = plan.strip().replace('\n', ' ')
 
         return {
             "interview_plan": plan_str,
-            "internal_thoughts": [f"[Planner]: {plan_thought.replace('\n', ' ')}\n"],
+            "internal_thoughts": [f"[Planner]: {plan_thought}\n"],
         }
     except Exception as e:
-        error_msg = "[Planner]: Ошибка планирования"
+        error_msg = PLAN_ERROR
         logger.exception(f"Planner error: {e}")
         return {
             "interview_plan": error_msg,
@@ -0,0 +1,183 @@
+"""Кэш планов интервью по нормализованному профилю кандидата.
+
+Ключ — (роль, грейд, корзина опыта), поэтому кандидаты с одинаковым профилем
+получают готовый план без вызова planner. Память — LRU с TTL, опционально
+поверх неё лежит дисковый слой (по JSON-файлу на ключ).
+
+Прогрев кэша списком профилей (JSON-массив объектов профиля) пишет планы в
+дисковый слой, поэтому нужен PLAN_CACHE_DIR:
+    PLAN_CACHE_DIR=./logs/plan_cache python plan_cache.py profiles.json
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+_GRADE_ALIASES = {
+    "intern": ("intern", "стаж", "trainee"),
+    "junior": ("junior", "джун"),
+    "middle": ("middle", "мидл", "миддл"),
+    "senior": ("senior", "сеньор", "синьор"),
+    "lead": ("lead", "лид", "principal", "architect", "архитект"),
+}
+
+_YEARS_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(год|лет|г\.|year|yr|y\b)", re.IGNORECASE)
+_MONTHS_RE = re.compile(r"(\d+)\s*(мес|month)", re.IGNORECASE)
+
+
+def _normalize_text(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def _normalize_grade(grade) -> str:
+    text = _normalize_text(grade)
+    for canonical, aliases in _GRADE_ALIASES.items():
+        if any(alias in text for alias in aliases):
+            return canonical
+    return text or "unknown"
+
+
+def experience_bucket(exp) -> str:
+    """Грубая корзина опыта по тексту вида "3 года", "полгода", "8 months"."""
+    text = _normalize_text(exp)
+    years = None
+    if match := _YEARS_RE.search(text):
+        years = float(match.group(1).replace(",", "."))
+    elif match := _MONTHS_RE.search(text):
+        years = int(match.group(1)) / 12
+    elif "полгода" in text:
+        years = 0.5
+    elif "нет опыта" in text or "без опыта" in text:
+        years = 0
+
+    if years is None:
+        return "unknown"
+    if years < 1:
+        return "<1"
+    if years < 3:
+        return "1-3"
+    if years < 5:
+        return "3-5"
+    return "5+"
+
+
+def profile_key(profile: dict) -> str:
+    # Имя кандидата в ключ не входит: planner его не получает (nodes/planner_node.py)
+    return "|".join((
+        _normalize_text(profile.get("role")) or "unknown",
+        _normalize_grade(profile.get("grade")),
+        experience_bucket(profile.get("exp")),
+    ))
+
+
+class PlanCache:
+    def __init__(self, max_entries: int = 256, ttl_s: float = 24 * 3600, disk_dir: str | None = None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.disk_dir = disk_dir
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {"plan_cache_hits": self.hits, "plan_cache_misses": self.misses}
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _is_fresh(self, created_at: float) -> bool:
+        return time.time() - created_at < self.ttl_s
+
+    def _remember(self, key: str, created_at: float, plan: str) -> None:
+        self._entries[key] = (created_at, plan)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> tuple[float, str] | None:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.exception("Не удалось прочитать план из дискового кэша")
+            return None
+        if data.get("key") != key:
+            return None
+        return data["created_at"], data["plan"]
+
+    def _write_disk(self, key: str, created_at: float, plan: str) -> None:
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            path = self._disk_path(key)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "created_at": created_at, "plan": plan}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            logger.exception("Не удалось сохранить план в дисковый кэш")
+
+    def peek(self, profile: dict) -> str | None:
+        """Как get, но без учёта в счётчиках попаданий/промахов."""
+        key = profile_key(profile)
+        entry = self._entries.get(key)
+        if entry is None or not self._is_fresh(entry[0]):
+            entry = self._read_disk(key)
+        if entry is None or not self._is_fresh(entry[0]):
+            self._entries.pop(key, None)
+            return None
+        self._remember(key, *entry)
+        return entry[1]
+
+    def get(self, profile: dict) -> str | None:
+        plan = self.peek(profile)
+        if plan is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return plan
+
+    def put(self, profile: dict, plan: str) -> None:
+        key = profile_key(profile)
+        created_at = time.time()
+        self._remember(key, created_at, plan)
+        self._write_disk(key, created_at, plan)
+
+
+async def _warm_from_file(path: str) -> None:
+    from interview_engine import InterviewEngine
+
+    with open(path, encoding="utf-8") as f:
+        profiles = json.load(f)
+    engine = InterviewEngine()
+    warmed = await engine.awarm_plan_cache(profiles)
+    logger.info("[Система]: Прогрето планов: %s из %s профилей", warmed, len(profiles))
+    logger.info("[Система]: Расход: %s", engine.logger.session_usage())
+
+
+if __name__ == "__main__":
+    from config import config
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[logging.StreamHandler(sys.stdout)])
+    if len(sys.argv) != 2:
+        print("Использование: PLAN_CACHE_DIR=<каталог> python plan_cache.py profiles.json")
+        sys.exit(1)
+    # Без дискового слоя прогретые планы пропали бы вместе с процессом
+    if not config.plan_cache_enabled or not config.plan_cache_dir:
+        print("Прогрев сохраняет планы на диск: включите plan_cache_enabled и задайте PLAN_CACHE_DIR")
+        sys.exit(1)
+    asyncio.run(_warm_from_file(sys.argv[1]))
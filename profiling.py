@@ -0,0 +1,154 @@
+"""Профилирование узлов графа (включается Config.profile_mode / PROFILE_NODES).
+
+Режимы:
+- "cprofile" — детерминированный профиль, файл `.prof` (snakeviz, flameprof, tuna);
+- "sampling" — стек потока event loop снимается каждые
+  `Config.profile_sample_interval_ms`, файл `.folded` в формате свёрнутых стеков
+  (flamegraph.pl, speedscope, inferno). Пока задача узла ждёт (сеть, другие
+  задачи), в сэмпл попадает цепочка её await с пометкой `[await]`, так что
+  профиль показывает и CPU, и ожидание. Корневой кадр — имя узла, поэтому
+  файлы разных сессий можно склеить и сравнивать.
+
+Файлы пишутся в `Config.profile_dir` с именем `<session>_turn<NNN>_<узел>`.
+Одновременно работает только один профилировщик: узел, стартовавший, пока
+профилируется другой (параллельная сессия, вложенный узел pipeline-режима),
+выполняется без профиля. Профилировщик видит всё, что происходит в потоке за
+время узла, включая другие задачи event loop, поэтому чище всего профили
+одиночной сессии (CLI).
+"""
+import asyncio
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+# Один профилировщик на процесс: cProfile не вкладывается, а сэмплы смешались бы
+_profile_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _await_chain(task: asyncio.Task) -> tuple[list, list[str]]:
+    """Кадры и подписи цепочки await приостановленной задачи (от внешней корутины к внутренней)."""
+    frames, labels = [], []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        labels.append(_frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames, labels
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик одного потока на sys._current_frames()."""
+
+    def __init__(self, thread_id: int, interval_s: float, root: str, task: asyncio.Task | None = None):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.root = root
+        # Задача узла: когда она приостановлена, сэмплируется её цепочка await
+        self.task = task
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            thread_frames = []
+            while frame is not None:
+                thread_frames.append(frame)
+                frame = frame.f_back
+            thread_frames.reverse()
+
+            stack = [self.root]
+            if self.task is not None and not self.task.done():
+                task_frames, task_labels = _await_chain(self.task)
+                if task_frames and task_frames[0] not in thread_frames:
+                    self.samples[";".join(stack + task_labels + ["[await]"])] += 1
+                    continue
+            stack.extend(_frame_label(f) for f in thread_frames)
+            self.samples[";".join(stack)] += 1
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _profile_path(node: str, session_id: str | None, turn_count: int | None, suffix: str) -> str:
+    os.makedirs(config.profile_dir, exist_ok=True)
+    name = f"{session_id or 'nosession'}_turn{turn_count or 0:03d}_{node}_{int(time.time() * 1000)}{suffix}"
+    return os.path.join(config.profile_dir, name)
+
+
+@contextmanager
+def profile_node(node: str, session_id: str | None, turn_count: int | None) -> Iterator[str | None]:
+    """Профилирует тело блока, если профилирование включено и свободно. Отдаёт путь к файлу профиля."""
+    mode = config.profile_mode
+    if not mode or not _profile_lock.acquire(blocking=False):
+        yield None
+        return
+    try:
+        if mode == "cprofile":
+            path = _profile_path(node, session_id, turn_count, ".prof")
+            profiler = cProfile.Profile()
+            profiler.enable()
+            stop, dump = profiler.disable, profiler.dump_stats
+        elif mode == "sampling":
+            path = _profile_path(node, session_id, turn_count, ".folded")
+            try:
+                task = asyncio.current_task()
+            except RuntimeError:
+                task = None
+            profiler = StackSampler(threading.get_ident(), config.profile_sample_interval_ms / 1000, node, task)
+            profiler.start()
+            stop, dump = profiler.stop, profiler.dump
+        else:
+            logger.warning("Неизвестный режим профилирования %r, ожидается один из %s", mode, PROFILE_MODES)
+            yield None
+            return
+
+        # metrics тянет langchain_core: CLI импортирует этот модуль ради PROFILE_MODES до загрузки движка
+        from metrics import current_metrics
+
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.set_once("profile", path)
+        try:
+            yield path
+        finally:
+            stop()
+            try:
+                dump(path)
+            except Exception:
+                logger.exception("Не удалось сохранить профиль %s", path)
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,69 @@
+"""Сборка сообщений узлов с неизменным префиксом для кэша промптов провайдера.
+
+Провайдеры (OpenAI, Gemini и прокси к ним) кэшируют начало запроса: если
+префикс побайтно совпадает с недавним запросом, его токены не обрабатываются
+заново — быстрее первый токен и дешевле вход (cached_input в
+Config.model_prices). Кэш обрывается на первом отличающемся байте, поэтому
+сообщения узла собираются в порядке от постоянного к меняющемуся:
+
+1. роль — системный промпт агента из prompts.py (его добавляет create_agent);
+2. статический контекст сессии — профиль кандидата и план интервью;
+3. история диалога (дописывается в конец, старые сообщения не меняются);
+4. контекст хода — вопрос и ответ, сложность, мысль observer и т.п.;
+5. инструкция узлу.
+
+Системным сообщением идёт только статический контекст. Контекст хода и
+инструкция — одно сообщение пользователя в конце: Gemini-совместимые прокси
+собирают все системные сообщения в system instruction, и меняющийся контекст
+снова оказался бы в префиксе, а запрос закончился бы не репликой пользователя.
+
+Сколько токенов провайдер взял из кэша, пишется в метрики узла
+(cached_tokens) и сводится trace_analytics.py.
+"""
+from typing import Iterable
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+
+# Поля профиля кандидата в порядке вывода
+PROFILE_FIELDS = (
+    ("name", "Имя"),
+    ("role", "Позиция"),
+    ("grade", "Заявленный уровень"),
+    ("exp", "Опыт"),
+)
+
+
+def profile_block(profile: dict, include_name: bool = True) -> str:
+    lines = [
+        f"- {label}: {profile.get(key, 'Не указано')}"
+        for key, label in PROFILE_FIELDS
+        if include_name or key != "name"
+    ]
+    return "Профиль кандидата:\n" + "\n".join(lines)
+
+
+def session_context(profile: dict, interview_plan: str | None = None, include_name: bool = True) -> str:
+    """Статический контекст сессии: одинаков на всех ходах, пока не меняются профиль и план."""
+    context = profile_block(profile, include_name)
+    if interview_plan is not None:
+        context += f"\n\nПлан интервью:\n{interview_plan}"
+    return context
+
+
+def assemble_messages(
+    static_context: str,
+    turn_context: str = "",
+    history: Iterable[BaseMessage] = (),
+    instruction: str | None = None,
+) -> list[BaseMessage]:
+    """Сообщения узла: статический контекст, история, затем контекст хода с инструкцией.
+
+    В static_context не должно попадать ничего, что меняется от хода к ходу.
+    """
+    messages: list[BaseMessage] = [SystemMessage(content=static_context)]
+    messages.extend(history)
+    turn = "\n\n".join(part for part in (turn_context, instruction) if part)
+    if turn:
+        messages.append(HumanMessage(content=turn))
+    return messages
@@ -0,0 +1,215 @@
+"""Общий на процесс rate limiter с приоритетами (Config.rate_limits).
+
+Лимиты провайдера (запросы и токены в минуту) общие для всех сессий на одном
+ключе, поэтому лимитер один на процесс (get_rate_limiter). Корзины
+пополняются непрерывно, ёмкость — минутный лимит.
+
+Очередь строго по приоритету (Config.rate_limit_priorities, меньше — важнее),
+внутри приоритета — по порядку прихода: пока ждёт вызов interviewer, фоновые
+вызовы не получают ёмкость. Кроме того, всем, кроме высшего приоритета, недоступна
+доля Config.rate_limit_reserve_share каждой корзины: она остаётся под вопрос
+интервьюера, даже если фоновые вызовы пришли раньше.
+
+Токены запроса оцениваются заранее (промпт + max_tokens модели) и уточняются по
+usage ответа. Время в очереди пишется в метрики узла: rate_limit_wait_ms.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import AIMessage
+
+from config import config
+from context_builder import count_message_tokens, count_tokens
+from metrics import current_metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Приоритет вызовов, которых нет в Config.rate_limit_priorities (фоновая работа)
+BACKGROUND_PRIORITY = 2
+
+
+class _Bucket:
+    """Токен-корзина: ёмкость — лимит в минуту, пополнение непрерывное."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate_per_s = per_minute / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate_per_s)
+        self.updated = now
+
+    def delay(self, amount: float, reserve: float) -> float:
+        """Сколько ждать, пока в корзине будет amount сверх reserve (0 — можно брать сейчас)."""
+        missing = amount + reserve - self.level
+        return max(0.0, missing / self.rate_per_s)
+
+
+class _Waiter:
+    def __init__(self, priority: int, seq: int, loop: asyncio.AbstractEventLoop):
+        self.priority = priority
+        self.seq = seq
+        self.wake = loop.create_future()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class PriorityRateLimiter:
+    """Корзины запросов и токенов в минуту с очередью по приоритету (один event loop)."""
+
+    def __init__(
+        self,
+        requests_per_min: float | None = None,
+        tokens_per_min: float | None = None,
+        reserve_share: float = 0.0,
+    ):
+        self._requests = _Bucket(requests_per_min) if requests_per_min else None
+        self._tokens = _Bucket(tokens_per_min) if tokens_per_min else None
+        self.reserve_share = reserve_share
+        self._queue: list[_Waiter] = []
+        self._seq = itertools.count()
+
+    def _delay(self, priority: int, tokens: int) -> float:
+        now = time.monotonic()
+        delay = 0.0
+        for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+            if bucket is None:
+                continue
+            bucket.refill(now)
+            # Запрос больше всей ёмкости иначе ждал бы вечно
+            amount = min(amount, bucket.capacity)
+            reserve = bucket.capacity * self.reserve_share if priority > 0 else 0.0
+            delay = max(delay, bucket.delay(amount, reserve))
+        return delay
+
+    def _take(self, tokens: int) -> None:
+        if self._requests is not None:
+            self._requests.level -= 1
+        if self._tokens is not None:
+            self._tokens.level -= min(tokens, self._tokens.capacity)
+
+    def adjust_tokens(self, delta: int) -> None:
+        """Поправка оценки по факту: delta > 0 — потрачено больше оценки, < 0 — меньше."""
+        if self._tokens is not None and delta:
+            self._tokens.refill(time.monotonic())
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level - delta)
+
+    def _wake_head(self) -> None:
+        if self._queue and not self._queue[0].wake.done():
+            self._queue[0].wake.set_result(None)
+
+    async def acquire(self, priority: int = BACKGROUND_PRIORITY, tokens: int = 0) -> float:
+        """Ждёт ёмкость под один запрос и tokens токенов. Возвращает время ожидания, с."""
+        started = time.monotonic()
+        if not self._queue and self._delay(priority, tokens) == 0:
+            self._take(tokens)
+            return 0.0
+
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop())
+        heapq.heappush(self._queue, waiter)
+        try:
+            while True:
+                if self._queue[0] is not waiter:
+                    # Впереди более важные или более ранние вызовы: ждём, пока станем первыми
+                    await waiter.wake
+                    waiter.wake = asyncio.get_running_loop().create_future()
+                    continue
+                delay = self._delay(priority, tokens)
+                if delay == 0:
+                    break
+                await asyncio.sleep(delay)
+            heapq.heappop(self._queue)
+            self._take(tokens)
+        except BaseException:
+            # Отмена (дедлайн, ненужный спекулятивный вызов): освобождаем место в очереди
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+            raise
+        finally:
+            self._wake_head()
+        return time.monotonic() - started
+
+
+_limiters: dict[str, PriorityRateLimiter] = {}
+
+
+def get_rate_limiter(name: str) -> PriorityRateLimiter | None:
+    """Лимитер процесса по имени из Config.rate_limits ("llm", "tavily"); None — лимита нет."""
+    if name not in _limiters:
+        limits = config.rate_limits.get(name) if config.rate_limit_enabled else None
+        if not limits:
+            return None
+        _limiters[name] = PriorityRateLimiter(
+            requests_per_min=limits.get("requests_per_min"),
+            tokens_per_min=limits.get("tokens_per_min"),
+            reserve_share=config.rate_limit_reserve_share,
+        )
+    return _limiters[name]
+
+
+def priority_for(name: str) -> int:
+    return config.rate_limit_priorities.get(name, BACKGROUND_PRIORITY)
+
+
+async def wait_for_slot(limiter_name: str, priority: int, tokens: int = 0) -> None:
+    """Ждёт лимитер и добавляет ожидание в метрики текущего узла."""
+    limiter = get_rate_limiter(limiter_name)
+    if limiter is None:
+        return
+    waited_s = await limiter.acquire(priority, tokens)
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.add("rate_limit_wait_ms", int(waited_s * 1000))
+
+
+def _estimate_tokens(request) -> int:
+    prompt = sum(count_message_tokens(message) for message in request.messages)
+    if request.system_prompt:
+        prompt += count_tokens(request.system_prompt)
+    max_tokens = getattr(request.model, "max_tokens", None) or config.rate_limit_default_output_tokens
+    return prompt + max_tokens
+
+
+def _used_tokens(response) -> int | None:
+    for message in getattr(response, "result", None) or []:
+        if isinstance(message, AIMessage) and message.usage_metadata:
+            return message.usage_metadata.get("total_tokens")
+    return None
+
+
+class RateLimitMiddleware(AgentMiddleware):
+    """Каждый запрос агента к модели (в том числе повтор и дубль hedging) ждёт общий лимитер "llm",
+    поиск Tavily — лимитер "tavily"."""
+
+    def __init__(self, agent_name: str):
+        super().__init__()
+        self.agent_name = agent_name
+        self.priority = priority_for(agent_name)
+
+    async def awrap_model_call(self, request, handler: Callable[[Any], Awaitable[Any]]):
+        limiter = get_rate_limiter("llm")
+        if limiter is None:
+            return await handler(request)
+        estimated = _estimate_tokens(request)
+        await wait_for_slot("llm", self.priority, estimated)
+        response = await handler(request)
+        used = _used_tokens(response)
+        if used is not None:
+            limiter.adjust_tokens(used - estimated)
+        return response
+
+    async def awrap_tool_call(self, request, handler: Callable[[Any], Awaitable[Any]]):
+        # Поиск Tavily самим агентом (manager без фонового поиска) — под общий лимит "tavily"
+        if request.tool_call.get("name") == "tavily_search":
+            await wait_for_slot("tavily", priority_for("search"))
+        return await handler(request)
@@ -0,0 +1,347 @@
+"""Пакетная переоценка записанных интервью (логов InterviewLogger.save_to_file).
+
+После смены промптов или моделей observer заново оценивает все ходы всех логов
+параллельно (не больше --concurrency вызовов узлов одновременно), затем manager
+по новым оценкам заново пишет финальный фидбэк каждого интервью.
+
+Результаты дописываются по одному в JSONL (--output): запись "turn" на каждый
+оценённый ход и запись "interview" с фидбэком. Прерванный запуск продолжается
+с того же файла: готовые ходы и интервью пропускаются. Записи привязаны к
+содержимому лога и к отпечатку конфигурации оценки (промпты и модели), поэтому
+после их изменения пересчитываются. Ходы и фидбэки, на которых узел упал, тоже
+пересчитываются. Рядом пишется отчёт `<output>.report.json`: пропускная
+способность, токены и стоимость.
+
+Запуск:
+    python reevaluate.py                                      # все логи в ./logs/
+    python reevaluate.py logs/interview_log_2025-*.json --concurrency 16
+    python reevaluate.py --output logs/reevaluation_new_prompt.jsonl --json
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from config import config
+from intent import Intent
+from logger import LOGS_DIR, InterviewLogger
+from metrics import USAGE_FIELDS
+from nodes.manager_node import FEEDBACK_ERROR_HEADER
+from nodes.observer_node import ANALYSIS_ERROR_THOUGHT, observer_system_prompt
+from prompts import manager_prompt
+
+
+logger = logging.getLogger(__name__)
+
+LOG_GLOB = "interview_log_*.json"
+DEFAULT_OUTPUT = os.path.join(LOGS_DIR, "reevaluation.jsonl")
+# Агенты, чьи модели и промпты определяют результат переоценки
+_EVALUATION_AGENTS = ("observer", "summarizer", "manager")
+
+
+def log_files(paths: list[str]) -> list[str]:
+    """Итоговые логи интервью по путям (каталоги раскрываются)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, LOG_GLOB)))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            logger.warning("Лог не найден: %s", path)
+    return sorted(set(files))
+
+
+def evaluation_fingerprint() -> str:
+    """Отпечаток промптов и моделей оценки: результаты другой конфигурации не переиспользуются."""
+    data = {
+        "observer_prompt": observer_system_prompt(),
+        "manager_prompt": manager_prompt,
+        "observer_structured_output": config.observer_structured_output,
+        "model_name": config.model_name,
+        "profiles": {name: config.model_profiles.get(name) for name in _EVALUATION_AGENTS},
+    }
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class ResultStore:
+    """Append-only JSONL с результатами; каждая запись сбрасывается на диск сразу."""
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.turns: dict[tuple[str, int], dict] = {}
+        self.interviews: dict[str, dict] = {}
+        self.stale = 0
+        self._load()
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() and not self._ends_with_newline():
+            # Оборванная последняя строка после прерывания: новая запись начнётся с новой строки
+            self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Пропущена повреждённая строка %s:%s", self.path, line_no)
+                    continue
+                if record.get("fingerprint") != self.fingerprint:
+                    self.stale += 1
+                elif record.get("error"):
+                    continue
+                elif record.get("type") == "turn":
+                    self.turns[(record["log_key"], record["turn_id"])] = record
+                elif record.get("type") == "interview":
+                    self.interviews[record["log_key"]] = record
+
+    def append(self, record: dict) -> None:
+        record = {"fingerprint": self.fingerprint, **record}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if record.get("error"):
+            return
+        if record["type"] == "turn":
+            self.turns[(record["log_key"], record["turn_id"])] = record
+        else:
+            self.interviews[record["log_key"]] = record
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Reevaluator:
+    """Переоценка логов одним движком: ходы всех интервью параллельно, manager — по готовности интервью."""
+
+    def __init__(self, engine, store: ResultStore, concurrency: int):
+        self.engine = engine
+        self.store = store
+        # Вызовы узлов с LLM (observer, manager) и интервью в работе (ограничивает память на большом наборе)
+        self._node_slots = asyncio.Semaphore(concurrency)
+        self._interview_slots = asyncio.Semaphore(concurrency)
+        self.stats: dict[str, int] = defaultdict(int)
+        # Расход вызовов этого запуска (без записей, взятых из прошлых запусков)
+        self.usage: dict[str, int | float] = defaultdict(int)
+        self.interview_rows: list[dict] = []
+
+    def _add_usage(self, usage: dict) -> None:
+        for name, value in usage.items():
+            self.usage[name] += value
+
+    async def _run_node(self, node_name: str, state: dict, node_logger: InterviewLogger) -> dict:
+        async with self._node_slots:
+            return await self.engine.arun_node(node_name, state, node_logger)
+
+    async def _assess_turn(self, log_key: str, log: dict, turn: dict, profile: dict) -> dict:
+        # Отдельный логгер на ход: его расход — ровно расход этой оценки
+        turn_logger = InterviewLogger(session_id=f"reeval-{log_key}")
+        state = {
+            "session_id": turn_logger.session_id,
+            "turn_count": turn["turn_id"],
+            "candidate_profile": profile,
+            "interview_plan": log.get("interview_plan") or "Плана нет",
+            "messages": [
+                AIMessage(content=turn.get("agent_visible_message", "")),
+                HumanMessage(content=turn.get("user_message", "")),
+            ],
+        }
+        started = time.perf_counter()
+        # Локальная классификация, как в графе: «стоп» и тривиальные ответы — без вызова LLM
+        out = await self.engine.arun_node("intent", state, turn_logger)
+        state.update(out)
+        if out["turn_intent"] != Intent.STOP.value:
+            out = await self._run_node("observer", state, turn_logger)
+        usage = turn_logger.session_usage()
+        self._add_usage(usage)
+        thought = "".join(out.get("internal_thoughts", []))
+        record = {
+            "type": "turn",
+            "log_key": log_key,
+            "turn_id": turn["turn_id"],
+            "intent": state["turn_intent"],
+            "thought": thought,
+            "verdict": out.get("observer_verdict"),
+            "duration_ms": int((time.perf_counter() - started) * 1000),
+            "usage": usage,
+            "error": thought == ANALYSIS_ERROR_THOUGHT,
+        }
+        self.store.append(record)
+        self.stats["turn_errors" if record["error"] else "turns_assessed"] += 1
+        return record
+
+    async def _final_feedback(self, log_key: str, log: dict, profile: dict, turn_records: list[dict]) -> dict:
+        manager_logger = InterviewLogger(session_id=f"reeval-{log_key}")
+        state = {
+            "session_id": manager_logger.session_id,
+            "turn_count": turn_records[-1]["turn_id"],
+            "candidate_profile": profile,
+            "internal_thoughts": [record["thought"] for record in turn_records],
+        }
+        out = await self._run_node("manager", state, manager_logger)
+        usage = manager_logger.session_usage()
+        self._add_usage(usage)
+        feedback = out.get("current_agent_response", "")
+        scores = [record["verdict"]["score"] for record in turn_records if record.get("verdict")]
+        record = {
+            "type": "interview",
+            "log_key": log_key,
+            "participant_name": log.get("participant_name"),
+            "turns": len(turn_records),
+            "mean_score": round(sum(scores) / len(scores), 2) if scores else None,
+            "final_feedback": feedback,
+            "usage": usage,
+            "error": feedback.startswith(FEEDBACK_ERROR_HEADER),
+        }
+        self.store.append(record)
+        self.stats["interview_errors" if record["error"] else "interviews_evaluated"] += 1
+        return record
+
+    async def reevaluate(self, path: str) -> None:
+        async with self._interview_slots:
+            try:
+                with open(path, "rb") as f:
+                    content = f.read()
+                log = json.loads(content)
+            except (OSError, ValueError):
+                logger.exception("Не удалось прочитать лог %s", path)
+                self.stats["logs_failed"] += 1
+                return
+            turns = [turn for turn in log.get("turns", []) if turn.get("turn_id") is not None]
+            if not turns:
+                logger.warning("В логе %s нет ходов", path)
+                self.stats["logs_empty"] += 1
+                return
+
+            log_key = hashlib.sha1(content).hexdigest()[:16]
+            # Старые логи без профиля: известно только имя участника
+            profile = log.get("candidate_profile") or {"name": log.get("participant_name", "Не указано")}
+
+            done = {turn["turn_id"]: self.store.turns.get((log_key, turn["turn_id"])) for turn in turns}
+            self.stats["turns_resumed"] += sum(1 for record in done.values() if record is not None)
+            pending = [turn for turn in turns if done[turn["turn_id"]] is None]
+            for record in await asyncio.gather(*(self._assess_turn(log_key, log, turn, profile) for turn in pending)):
+                done[record["turn_id"]] = record
+            turn_records = [done[turn["turn_id"]] for turn in turns]
+
+            interview = self.store.interviews.get(log_key)
+            if interview is not None:
+                self.stats["interviews_resumed"] += 1
+            elif any(record["error"] for record in turn_records):
+                # Фидбэк по неполным оценкам не пишем: интервью пересчитается при следующем запуске
+                logger.warning("Лог %s: не все ходы оценены, фидбэк пропущен", path)
+                self.stats["interviews_incomplete"] += 1
+                return
+            else:
+                interview = await self._final_feedback(log_key, log, profile, turn_records)
+
+            self.interview_rows.append({
+                "log": path,
+                "log_key": log_key,
+                "turns": len(turn_records),
+                "mean_score": interview["mean_score"],
+                "error": interview["error"],
+                "cost_usd": round(
+                    sum(record["usage"].get("cost_usd", 0) for record in [*turn_records, interview]), 6
+                ),
+            })
+
+    def report(self, logs: int, wall_s: float) -> dict:
+        turns = self.stats["turns_assessed"] + self.stats["turn_errors"]
+        interviews = self.stats["interviews_evaluated"] + self.stats["interview_errors"]
+        usage = {name: self.usage.get(name, 0) for name in USAGE_FIELDS}
+        usage["cost_usd"] = round(usage["cost_usd"], 6)
+        return {
+            "logs": logs,
+            **{name: self.stats[name] for name in (
+                "turns_assessed", "turns_resumed", "turn_errors",
+                "interviews_evaluated", "interviews_resumed", "interview_errors", "interviews_incomplete",
+                "logs_empty", "logs_failed",
+            )},
+            "stale_records": self.store.stale,
+            "wall_s": round(wall_s, 2),
+            # Пропускная способность и расход — только по вызовам этого запуска
+            "turns_per_s": round(turns / wall_s, 2) if wall_s else None,
+            "interviews_per_min": round(interviews * 60 / wall_s, 2) if wall_s else None,
+            **usage,
+            "cost_per_interview_usd": round(usage["cost_usd"] / interviews, 6) if interviews else None,
+            "interviews": sorted(self.interview_rows, key=lambda row: row["log"]),
+        }
+
+
+async def run(paths: list[str], output: str, concurrency: int) -> dict:
+    from interview_engine import InterviewEngine
+
+    files = log_files(paths)
+    store = ResultStore(output, evaluation_fingerprint())
+    if store.stale:
+        logger.info("[Система]: %s записей от другой конфигурации оценки будут пересчитаны", store.stale)
+    engine = InterviewEngine()
+    # Агенты создаются до первого узла, а не внутри него
+    engine.warm_up()
+    reevaluator = Reevaluator(engine, store, concurrency)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(reevaluator.reevaluate(path) for path in files))
+    finally:
+        store.close()
+        await engine.aclose()
+    return reevaluator.report(len(files), time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[LOGS_DIR], help="логи интервью или каталоги")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSONL с результатами (продолжается при повторном запуске)")
+    parser.add_argument("--concurrency", type=int, default=config.reevaluate_concurrency)
+    parser.add_argument("--json", action="store_true", help="вывести отчёт в JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[logging.StreamHandler(sys.stderr)])
+    # Строка на каждый HTTP-запрос к модели
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if not log_files(args.paths):
+        logger.info("[Система]: Логи интервью не найдены: %s", ", ".join(args.paths))
+        sys.exit(1)
+
+    try:
+        report = asyncio.run(run(args.paths, args.output, args.concurrency))
+    except KeyboardInterrupt:
+        logger.info("\n[Система]: Прервано. Готовые результаты в %s, повторный запуск продолжит с них", args.output)
+        sys.exit(130)
+    report_path = os.path.splitext(args.output)[0] + ".report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+    for name, value in report.items():
+        if name != "interviews":
+            print(f"{name:<24} {value if value is not None else '-'}")
+    print(f"\nРезультаты: {args.output}\nОтчёт: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
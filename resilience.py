@@ -0,0 +1,278 @@
+"""Устойчивость вызовов моделей: дедлайны узлов, повторы, hedging и circuit breaker.
+
+ResilienceMiddleware оборачивает каждый вызов модели внутри агента
+(awrap_model_call) и стоит после ModelFallbackMiddleware, поэтому запасная
+модель проходит через те же механизмы со своим circuit breaker:
+
+- дедлайн узла (`deadline` в профиле Config.model_profiles) считается от старта
+  узла и покрывает все попытки, включая запасную модель;
+- повторы с экспоненциальной паузой и джиттером (tenacity) только для
+  временных ошибок: таймаут, обрыв соединения, 429, 5xx. Число повторов —
+  `max_retries` профиля (для запасной модели — Config.llm_max_retries),
+  встроенные повторы клиента OpenAI отключены;
+- hedging (`hedge_percentile` в профиле): если ответа нет дольше этого
+  перцентиля недавних задержек модели, параллельно отправляется дубль запроса
+  и берётся первый ответ. Только для узлов без стриминга — иначе дубль
+  напечатал бы токены второй раз. По той же причине стримящий узел не
+  повторяет запрос, если часть ответа уже ушла клиенту;
+- circuit breaker на модель: после Config.circuit_failure_threshold ошибок
+  подряд вызовы сразу отклоняются (CircuitOpenError) на
+  Config.circuit_recovery_s, затем один пробный вызов решает, закрыть ли его.
+
+Всё, что произошло, пишется в метрики узла и попадает в его trace-событие:
+llm_retries, llm_hedges, llm_hedge_wins, circuit_rejected, deadline_exceeded.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+import openai
+from langchain.agents.middleware import AgentMiddleware
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from config import config
+from metrics import current_metrics, percentile
+
+
+logger = logging.getLogger(__name__)
+
+# Коды ответа, при которых запрос имеет смысл повторить
+RETRYABLE_STATUS_CODES = (408, 409, 429)
+
+
+class CircuitOpenError(RuntimeError):
+    """Модель отключена circuit breaker: вызов отклонён без запроса к API."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Временная ошибка endpoint: таймаут, обрыв соединения, 429 или 5xx."""
+    if isinstance(error, (openai.APIConnectionError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status in RETRYABLE_STATUS_CODES or status >= 500)
+
+
+def _add_metric(name: str, value: int = 1) -> None:
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.add(name, value)
+
+
+class CircuitBreaker:
+    """Закрыт → (failure_threshold ошибок подряд) → открыт → (recovery_s) → полуоткрыт → пробный вызов."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_s: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_s = recovery_s
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.recovery_s:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            # Один пробный вызов; остальные отклоняются, пока он не завершится
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Circuit breaker %s закрыт", self.name)
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Пробный вызов отменён: ни успех, ни ошибка, следующий вызов станет новым пробным."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        probe_failed = self._probe_in_flight
+        self._probe_in_flight = False
+        if probe_failed or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            logger.warning("Circuit breaker %s открыт на %s с после %s ошибок подряд",
+                           self.name, self.recovery_s, self.failures)
+
+
+class LatencyWindow:
+    """Задержки последних успешных вызовов модели: по ним выбирается момент hedging."""
+
+    def __init__(self, size: int = 200):
+        self._values: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._values.append(seconds)
+
+    def percentile(self, q: float, min_samples: int) -> float | None:
+        if len(self._values) < min_samples:
+            return None
+        return percentile(list(self._values), q)
+
+
+class ModelResilience:
+    """Circuit breaker и окно задержек по моделям; общий на движок (все агенты и сессии)."""
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._latencies: dict[str, LatencyWindow] = {}
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(
+                model, config.circuit_failure_threshold, config.circuit_recovery_s,
+            )
+        return self._breakers[model]
+
+    def latencies(self, model: str) -> LatencyWindow:
+        return self._latencies.setdefault(model, LatencyWindow(config.hedge_window))
+
+    def middleware(self, agent_name: str, profile: dict, streamed: bool = False) -> "ResilienceMiddleware":
+        return ResilienceMiddleware(
+            self,
+            agent_name,
+            deadline_s=profile.get("deadline"),
+            max_retries=profile.get("max_retries", config.llm_max_retries),
+            hedge_percentile=None if streamed else profile.get("hedge_percentile"),
+            primary_model=profile.get("model", config.model_name),
+            streamed=streamed,
+        )
+
+
+class ResilienceMiddleware(AgentMiddleware):
+    """Дедлайн, повторы, hedging и circuit breaker вокруг вызова модели агента."""
+
+    def __init__(
+        self,
+        resilience: ModelResilience,
+        agent_name: str,
+        deadline_s: float | None = None,
+        max_retries: int = 2,
+        hedge_percentile: float | None = None,
+        primary_model: str | None = None,
+        streamed: bool = False,
+    ):
+        super().__init__()
+        self.resilience = resilience
+        self.agent_name = agent_name
+        self.deadline_s = deadline_s
+        self.max_retries = max_retries
+        self.hedge_percentile = hedge_percentile
+        self.primary_model = primary_model
+        self.streamed = streamed
+
+    def _tokens_sent(self) -> bool:
+        """Стримящий узел уже отдал клиенту часть ответа (первый токен записан в метрики узла)."""
+        metrics = current_metrics()
+        return self.streamed and metrics is not None and "ttft_ms" in metrics.values
+
+    def _should_retry(self, error: BaseException) -> bool:
+        # Повтор после частично отправленного ответа показал бы клиенту вопрос второй раз
+        return is_retryable(error) and not self._tokens_sent()
+
+    def _remaining_s(self) -> float | None:
+        if self.deadline_s is None:
+            return None
+        # Дедлайн узла: от его старта, общий для основной и запасной модели
+        metrics = current_metrics()
+        elapsed = time.perf_counter() - metrics.started_at if metrics is not None else 0.0
+        return max(0.0, self.deadline_s - elapsed)
+
+    async def awrap_model_call(self, request, handler: Callable[[Any], Awaitable[Any]]):
+        model = getattr(request.model, "model_name", None) or type(request.model).__name__
+        remaining_s = self._remaining_s()
+        if remaining_s == 0:
+            # Время узла уже вышло на предыдущей модели (и уже учтено): запасную не вызываем
+            raise TimeoutError(f"Дедлайн {self.deadline_s} с узла {self.agent_name} истёк")
+        if self._tokens_sent():
+            # Основная модель оборвалась посреди стрима: запасная напечатала бы ответ заново
+            raise RuntimeError(f"Ответ узла {self.agent_name} оборвался после начала стриминга")
+        breaker = self.resilience.breaker(model)
+        if not breaker.allow():
+            _add_metric("circuit_rejected")
+            raise CircuitOpenError(f"Модель {model} временно отключена после серии ошибок")
+        is_probe = breaker.state != "closed"
+
+        # max_retries профиля — для основной модели; запасная — последняя попытка, у неё повторы по умолчанию
+        max_retries = self.max_retries if self.primary_model in (None, model) else config.llm_max_retries
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(max_retries + 1),
+            wait=wait_random_exponential(multiplier=config.llm_retry_backoff_s, max=config.llm_retry_backoff_max_s),
+            retry=retry_if_exception(self._should_retry),
+            before_sleep=lambda state: _add_metric("llm_retries"),
+            reraise=True,
+        )
+        try:
+            async with asyncio.timeout(remaining_s):
+                async for attempt in retrying:
+                    with attempt:
+                        response = await self._hedged(request, handler, model)
+        except TimeoutError:
+            _add_metric("deadline_exceeded")
+            breaker.record_failure()
+            logger.warning("Дедлайн %s с узла %s истёк (модель %s)", self.deadline_s, self.agent_name, model)
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                breaker.record_failure()
+            elif is_probe:
+                # Ошибка запроса (валидация, схема ответа), а не endpoint: пробный вызов не засчитываем
+                breaker.release_probe()
+            raise
+        except BaseException:
+            # Отмена (спекулятивный interviewer, отключившийся клиент): пробный вызов освобождается без итога
+            if is_probe:
+                breaker.release_probe()
+            raise
+        breaker.record_success()
+        return response
+
+    async def _hedged(self, request, handler, model: str):
+        latencies = self.resilience.latencies(model)
+        hedge_after = None
+        if self.hedge_percentile is not None:
+            hedge_after = latencies.percentile(self.hedge_percentile, config.hedge_min_samples)
+
+        started = time.perf_counter()
+        first = asyncio.ensure_future(handler(request))
+        if hedge_after is None:
+            response = await first
+            latencies.add(time.perf_counter() - started)
+            return response
+
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                # Первый запрос медленнее обычного: дубль, берём того, кто ответит раньше
+                _add_metric("llm_hedges")
+                tasks.add(asyncio.ensure_future(handler(request)))
+            error: BaseException | None = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            _add_metric("llm_hedge_wins")
+                        latencies.add(time.perf_counter() - started)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
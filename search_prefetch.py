@@ -0,0 +1,151 @@
+"""Фоновый поиск ресурсов по пробелам в знаниях кандидата.
+
+Observer отмечает пробелы строкой `Пробелы: тема1; тема2`. После каждого хода
+движок запускает поиск Tavily по новым темам в фоне и параллельно, а manager в
+конце интервью получает уже готовые результаты и не делает блокирующих вызовов
+инструмента. Результаты лежат в кэше с TTL по нормализованному запросу, общем
+для всех сессий процесса; одинаковые запросы разных сессий выполняются один раз.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+# "Пробелы: GIL; asyncio." — до точки с пробелом или конца строки
+_GAPS_RE = re.compile(r"Пробелы\s*:\s*(.+?)(?:\.\s|\.?$)", re.IGNORECASE | re.MULTILINE)
+_NO_GAPS = {"нет", "не выявлено", "не выявлены", "отсутствуют", "-", "—"}
+
+
+def extract_gap_topics(thoughts: list[str], limit: int | None = None) -> list[str]:
+    """Темы пробелов из мыслей observer в порядке появления, без повторов."""
+    topics: dict[str, str] = {}
+    for thought in thoughts:
+        for match in _GAPS_RE.finditer(thought):
+            for part in re.split(r"[;,]", match.group(1)):
+                topic = part.strip(" .\"'«»")
+                key = normalize_query(topic)
+                if key and key not in _NO_GAPS:
+                    topics.setdefault(key, topic)
+    return list(topics.values())[:limit]
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(re.sub(r"[^\w\s+#.-]", " ", query.lower()).split())
+
+
+def build_query(topic: str, role: str | None) -> str:
+    return f"{topic} {role} документация" if role else f"{topic} документация"
+
+
+class SearchCache:
+    """LRU с TTL: нормализованный запрос → список результатов."""
+
+    def __init__(self, max_entries: int = 1000, ttl_s: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {"search_cache_hits": self.hits, "search_cache_misses": self.misses}
+
+    def peek(self, key: str) -> list[dict] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] >= self.ttl_s:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get(self, key: str) -> list[dict] | None:
+        results = self.peek(key)
+        if results is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return results
+
+    def put(self, key: str, results: list[dict]) -> None:
+        self._entries[key] = (time.time(), results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class SearchPrefetcher:
+    """Параллельные поиски через инструмент Tavily с общим кэшем и дедупликацией запросов в полёте."""
+
+    def __init__(self, search_tool, cache: SearchCache, concurrency: int = 4, callbacks: list | None = None):
+        self.search_tool = search_tool
+        self.cache = cache
+        # Колбэки метрик: вызовы инструмента попадают в tool_calls и cost_usd узла
+        self.callbacks = callbacks or []
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def _search(self, key: str, query: str) -> None:
+        try:
+            async with self._semaphore:
+                # Лимит Tavily общий на процесс; поиск — фоновая работа и уступает вызовам на критическом пути
+                from rate_limiter import priority_for, wait_for_slot
+
+                await wait_for_slot("tavily", priority_for("search"))
+                response = await self.search_tool.ainvoke({"query": query}, config={"callbacks": self.callbacks})
+            if not isinstance(response, dict) or "results" not in response:
+                logger.warning("Поиск %r не вернул результатов: %s", query, response)
+                return
+            self.cache.put(key, [
+                {"title": r.get("title", ""), "url": r.get("url", ""), "content": (r.get("content") or "")[:300]}
+                for r in response["results"][:config.search_prefetch_max_results]
+            ])
+        except Exception:
+            logger.exception("Ошибка поиска %r", query)
+        finally:
+            self._inflight.pop(key, None)
+
+    def prefetch(self, queries: list[str]) -> list[asyncio.Task]:
+        """Запускает поиски, которых нет в кэше. Возвращает задачи в полёте по этим запросам."""
+        tasks = []
+        for query in queries:
+            key = normalize_query(query)
+            if self.cache.peek(key) is not None:
+                continue
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._search(key, query))
+                self._inflight[key] = task
+            tasks.append(task)
+        return tasks
+
+    async def fetch(self, queries: list[str], timeout: float | None = None) -> dict[str, list[dict]]:
+        """Результаты по запросам: из кэша, из поисков в полёте или новых (ждём не дольше timeout)."""
+        tasks = self.prefetch(queries)
+        if tasks:
+            # По таймауту поиски не отменяются и догружаются в кэш для следующих сессий
+            await asyncio.wait(tasks, timeout=timeout)
+        results = {}
+        for query in queries:
+            found = self.cache.get(normalize_query(query))
+            if found:
+                results[query] = found
+        return results
+
+
+def format_resources(topics: list[str], queries: list[str], results: dict[str, list[dict]]) -> str:
+    lines = []
+    for topic, query in zip(topics, queries):
+        found = results.get(query)
+        if not found:
+            continue
+        lines.append(f"Тема: {topic}")
+        lines.extend(f"- {r['title']} — {r['url']}: {r['content']}" for r in found)
+    return "\n".join(lines)
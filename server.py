@@ -0,0 +1,338 @@
+"""HTTP-сервер: много интервью на одном общем InterviewEngine.
+
+Все сессии делят один скомпилированный граф, один набор агентов и один пул
+HTTP-соединений к LLM. Состояние и логгер у каждой сессии свои. История
+сессий хранится в чекпоинтах графа, поэтому после перезапуска сервера
+интервью продолжается по тому же session_id. Простаивающие сессии
+(Config.server_session_idle_ttl_s) выгружаются из памяти так же: лог
+сохраняется, следующий ход восстанавливает сессию из чекпоинта.
+
+API:
+    POST   /sessions                 {"profile": {...}} -> {"session_id", "message"}
+    POST   /sessions/{id}/turns      {"text": "..."}    -> {"message", "is_finished"}
+           ?stream=1 — ответ в NDJSON: строки {"token": ...}, затем итоговый объект
+           (или {"error": ...}, если ход не удался)
+    DELETE /sessions/{id}                               -> {"feedback"}
+    GET    /healthz
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+from config import config
+from interview_engine import InterviewEngine
+from logger import InterviewLogger, session_log_filename
+from profiling import PROFILE_MODES
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class InterviewSession:
+    session_id: str
+    state: dict
+    logger: InterviewLogger
+    # Ходы одной сессии выполняются строго последовательно
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Время последнего обращения (time.monotonic) для выгрузки простаивающих сессий
+    last_active: float = field(default_factory=time.monotonic)
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+
+class SessionStore:
+    """Хранилище состояний сессий в памяти процесса."""
+
+    def __init__(self, max_sessions: int, idle_ttl_s: float | None = None):
+        self.max_sessions = max_sessions
+        self.idle_ttl_s = idle_ttl_s
+        self._sessions: dict[str, InterviewSession] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def is_full(self) -> bool:
+        return len(self._sessions) >= self.max_sessions
+
+    def add(self, session: InterviewSession) -> None:
+        self._sessions[session.session_id] = session
+
+    def get(self, session_id: str) -> InterviewSession | None:
+        return self._sessions.get(session_id)
+
+    def pop(self, session_id: str) -> InterviewSession | None:
+        return self._sessions.pop(session_id, None)
+
+    def all(self) -> list[InterviewSession]:
+        return list(self._sessions.values())
+
+    def is_idle(self, session: InterviewSession) -> bool:
+        return self.idle_ttl_s is not None and time.monotonic() - session.last_active > self.idle_ttl_s
+
+    def idle(self) -> list[InterviewSession]:
+        # Сессия с выполняющимся ходом не простаивает
+        return [s for s in self._sessions.values() if not s.lock.locked() and self.is_idle(s)]
+
+
+def _flush_session(session: InterviewSession) -> str:
+    """Сохраняет итоговый лог сессии (трейсы уже записаны потоково). Возвращает финальный фидбэк (если интервью завершено)."""
+    feedback = session.state.get("current_agent_response", "") if session.state.get("is_finished") else ""
+    session.logger.add_trace_event(node="usage", phase="session", **session.logger.session_usage())
+    session.logger.set_interview_context(
+        session.state.get("candidate_profile", {}), session.state.get("interview_plan", "")
+    )
+    session.logger.set_final_feedback(feedback)
+    session.logger.save_to_file()
+    return feedback
+
+
+def _end_session(app: web.Application, session: InterviewSession) -> str:
+    """Убирает сессию из памяти: фоновые задачи движка отменяются, лог сохраняется (файл ходов закрывается)."""
+    app["sessions"].pop(session.session_id)
+    app["engine"].release_session(session.session_id)
+    return _flush_session(session)
+
+
+async def _read_json(request: web.Request) -> dict:
+    try:
+        body = await request.json()
+    except Exception:
+        raise web.HTTPBadRequest(reason="Ожидается JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="Ожидается JSON-объект")
+    return body
+
+
+def _get_session(request: web.Request) -> InterviewSession:
+    session = request.app["sessions"].get(request.match_info["session_id"])
+    if session is None:
+        raise web.HTTPNotFound(reason="Сессия не найдена")
+    return session
+
+
+def _ensure_active(request: web.Request, session: InterviewSession) -> None:
+    """Проверка под lock сессии: пока его ждали, сессию могли закрыть или выгрузить."""
+    if request.app["sessions"].get(session.session_id) is not session:
+        raise web.HTTPNotFound(reason="Сессия не найдена")
+
+
+async def _get_or_resume_session(request: web.Request) -> InterviewSession:
+    """Сессия из памяти, а если её нет (сервер перезапускался) — из чекпоинтов графа."""
+    sessions: SessionStore = request.app["sessions"]
+    session_id = request.match_info["session_id"]
+    session = sessions.get(session_id)
+    if session is not None:
+        return session
+    if request.app["shutting_down"] or sessions.is_full():
+        raise web.HTTPServiceUnavailable(reason="Не удалось восстановить сессию")
+
+    engine: InterviewEngine = request.app["engine"]
+    session_logger = InterviewLogger(output_filename=session_log_filename(session_id), session_id=session_id)
+    async with request.app["turn_slots"]:
+        state = await engine.aresume_session(session_id, session_logger)
+    if state is None or state.get("is_finished"):
+        raise web.HTTPNotFound(reason="Сессия не найдена")
+    session_logger.set_participant_name(state.get("candidate_profile", {}).get("name", "Кандидат"))
+
+    # Пока сессия восстанавливалась, её мог восстановить параллельный запрос
+    session = sessions.get(session_id)
+    if session is None:
+        session = InterviewSession(session_id=session_id, state=state, logger=session_logger)
+        sessions.add(session)
+        logger.info("[Система]: Сессия %s восстановлена с хода %s", session_id, state.get("turn_count", 0))
+    return session
+
+
+async def create_session(request: web.Request) -> web.Response:
+    app = request.app
+    if app["shutting_down"]:
+        raise web.HTTPServiceUnavailable(reason="Сервер останавливается")
+    sessions: SessionStore = app["sessions"]
+    if sessions.is_full():
+        raise web.HTTPServiceUnavailable(reason="Достигнут лимит активных сессий")
+
+    body = await _read_json(request)
+    profile = body.get("profile") or {}
+    if not isinstance(profile, dict):
+        raise web.HTTPBadRequest(reason="profile должен быть JSON-объектом")
+    engine: InterviewEngine = app["engine"]
+
+    session_id = uuid.uuid4().hex
+    session = InterviewSession(
+        session_id=session_id,
+        state=engine.start_interview(profile, session_id),
+        logger=InterviewLogger(
+            participant_name=profile.get("name", "Кандидат"),
+            output_filename=session_log_filename(session_id),
+            session_id=session_id,
+        ),
+    )
+    # Резервируем место до первого вопроса, чтобы лимит нельзя было обойти параллельными запросами
+    sessions.add(session)
+
+    try:
+        async with session.lock, app["turn_slots"]:
+            await engine.abootstrap_first_question(session.state, session.logger)
+    except Exception:
+        sessions.pop(session_id)
+        logger.exception("Не удалось инициализировать сессию %s", session_id)
+        raise web.HTTPInternalServerError(reason="Не удалось начать интервью")
+
+    return web.json_response({
+        "session_id": session_id,
+        "message": session.state.get("current_agent_response", ""),
+    })
+
+
+async def submit_turn(request: web.Request) -> web.Response:
+    session = await _get_or_resume_session(request)
+    body = await _read_json(request)
+    text = str(body.get("text", "")).strip()
+    if not text:
+        raise web.HTTPBadRequest(reason="Пустой ответ")
+
+    engine: InterviewEngine = request.app["engine"]
+    stream = None
+
+    async def send_token(token: str) -> None:
+        await stream.write((json.dumps({"token": token}, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    async with session.lock:
+        _ensure_active(request, session)
+        session.touch()
+        if session.state.get("is_finished"):
+            raise web.HTTPConflict(reason="Интервью уже завершено")
+        if request.query.get("stream") in ("1", "true"):
+            stream = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await stream.prepare(request)
+        try:
+            async with request.app["turn_slots"]:
+                await engine.aprocess_user_input(
+                    session.state, text, session.logger, on_token=send_token if stream else None
+                )
+        except Exception:
+            if stream is None:
+                raise
+            # Статус 200 уже отправлен: клиент узнаёт об ошибке из последней строки потока
+            logger.exception("Ход сессии %s завершился ошибкой", session.session_id)
+            error = {"error": "Не удалось обработать ответ"}
+            await stream.write((json.dumps(error, ensure_ascii=False) + "\n").encode("utf-8"))
+            await stream.write_eof()
+            return stream
+        finally:
+            session.touch()
+
+        is_finished = bool(session.state.get("is_finished"))
+        if is_finished:
+            _end_session(request.app, session)
+
+    result = {
+        "message": session.state.get("current_agent_response", ""),
+        "is_finished": is_finished,
+    }
+    if stream is None:
+        return web.json_response(result)
+    await stream.write((json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8"))
+    await stream.write_eof()
+    return stream
+
+
+async def close_session(request: web.Request) -> web.Response:
+    session = _get_session(request)
+    async with session.lock:
+        _ensure_active(request, session)
+        feedback = _end_session(request.app, session)
+    return web.json_response({"feedback": feedback})
+
+
+async def healthz(request: web.Request) -> web.Response:
+    return web.json_response({
+        "status": "stopping" if request.app["shutting_down"] else "ok",
+        "sessions": len(request.app["sessions"]),
+    })
+
+
+async def _evict_idle_sessions(app: web.Application) -> None:
+    """Периодически выгружает сессии без ходов дольше Config.server_session_idle_ttl_s."""
+    sessions: SessionStore = app["sessions"]
+    while True:
+        await asyncio.sleep(config.server_session_sweep_interval_s)
+        for session in sessions.idle():
+            async with session.lock:
+                # Пока ждали lock, сессию могли закрыть или по ней пришёл ход
+                if sessions.get(session.session_id) is not session or not sessions.is_idle(session):
+                    continue
+                _end_session(app, session)
+            logger.info("[Система]: Сессия %s выгружена после простоя", session.session_id)
+
+
+async def _on_startup(app: web.Application) -> None:
+    if app["sessions"].idle_ttl_s is not None:
+        app["idle_sweeper"] = asyncio.create_task(_evict_idle_sessions(app))
+
+
+async def _on_shutdown(app: web.Application) -> None:
+    """Дожидается текущих ходов и сбрасывает логи всех открытых сессий."""
+    app["shutting_down"] = True
+    sweeper = app.get("idle_sweeper")
+    if sweeper is not None:
+        sweeper.cancel()
+    sessions: SessionStore = app["sessions"]
+    logger.info("[Система]: Остановка сервера, сохраняю %s сессий", len(sessions))
+    for session in sessions.all():
+        async with session.lock:
+            if sessions.get(session.session_id) is session:
+                _end_session(app, session)
+
+
+async def _on_cleanup(app: web.Application) -> None:
+    await app["engine"].aclose()
+
+
+def create_app(engine: InterviewEngine | None = None) -> web.Application:
+    app = web.Application()
+    app["engine"] = engine or InterviewEngine()
+    # Агенты и граф создаются при старте сервера, а не на первом запросе
+    app["engine"].warm_up()
+    app["sessions"] = SessionStore(config.server_max_sessions, config.server_session_idle_ttl_s)
+    app["turn_slots"] = asyncio.Semaphore(config.server_max_concurrent_turns)
+    app["shutting_down"] = False
+    app.router.add_post("/sessions", create_session)
+    app.router.add_post("/sessions/{session_id}/turns", submit_turn)
+    app.router.add_delete("/sessions/{session_id}", close_session)
+    app.router.add_get("/healthz", healthz)
+    app.on_startup.append(_on_startup)
+    app.on_shutdown.append(_on_shutdown)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sobeser HTTP server")
+    parser.add_argument("--host", default=config.server_host)
+    parser.add_argument("--port", type=int, default=config.server_port)
+    parser.add_argument("--max-sessions", type=int, default=config.server_max_sessions)
+    parser.add_argument("--max-concurrent-turns", type=int, default=config.server_max_concurrent_turns)
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="профилировать узлы графа (файлы в logs/profiles)")
+    args = parser.parse_args()
+
+    config.server_max_sessions = args.max_sessions
+    config.server_max_concurrent_turns = args.max_concurrent_turns
+    if args.profile:
+        config.profile_mode = args.profile
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[logging.StreamHandler(sys.stdout)])
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,4 +14,14 @@ class AgentState(TypedDict):
     difficulty_level: int
     is_finished: bool
     turn_count: int
-
+    session_id: str
+    # Намерение последнего ответа кандидата (intent.Intent), определяется до observer
+    turn_intent: str
+    # Последняя структурированная оценка observer (nodes.observer_node.ObserverVerdict)
+    observer_verdict: dict
+    # Rolling summary мыслей observer и число уже свёрнутых в него мыслей
+    observer_summary: str
+    observer_summary_thoughts: int
+    # Черновик финального фидбэка и число мыслей observer, по которым он составлен
+    feedback_draft: str
+    feedback_draft_thoughts: int
@@ -1,5 +1,7 @@
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 import logging
+from config import config
+from context_builder import ContextBuilder, count_tokens
 
 
 logger = logging.getLogger(__name__)
@@ -8,15 +10,17 @@ logger = logging.getLogger(__name__)
 # Мысли observer решил суммаризовывать,
 # так как очень сильно засорялось контекстное окно, когда кидал сырой текст,
 # просто обрывался final_feedback, возможно, просто я чет не то написал
-def summarize_observer_thoughts(observer_thoughts: list, observer_agent) -> str:
+async def summarize_observer_thoughts(observer_thoughts: list, summarizer_agent) -> str:
     if not observer_thoughts:
         return "Наблюдатель не предоставил анализа."
 
     full_thoughts = "\n".join(observer_thoughts)
 
-    if len(full_thoughts) < 3000:
+    if count_tokens(full_thoughts) < config.summary_threshold_tokens:
         return full_thoughts
 
+    full_thoughts = ContextBuilder("summarizer").add_text(full_thoughts)
+
     logger.debug(f"Summarizing observer thoughts: {len(full_thoughts)} characters, {len(observer_thoughts)} thoughts")
     
     try:
@@ -42,7 +46,7 @@ def summarize_observer_thoughts(observer_thoughts: list, observer_agent) -> str:
             HumanMessage(content="Суммаризируй анализ наблюдателя, сохранив всю важную информацию.")
         ]
         
-        summary_result = observer_agent.invoke({"messages": summary_messages})
+        summary_result = await summarizer_agent.ainvoke({"messages": summary_messages})
         summary_messages_result = summary_result.get("messages", [])
         
         summary = ""
@@ -63,3 +67,59 @@ def summarize_observer_thoughts(observer_thoughts: list, observer_agent) -> str:
         logger.exception("Error summarizing thoughts, using truncated version")
         return "\n".join(observer_thoughts[-3:])
 
+
+async def fold_observer_thoughts(summary: str, new_thoughts: list, summarizer_agent) -> str:
+    """Дописывает в накопленное резюме только новые мысли observer (rolling summary).
+
+    Пока резюме с новыми мыслями короткое, они просто склеиваются без вызова LLM.
+    """
+    if not new_thoughts:
+        return summary
+
+    delta = "\n".join(new_thoughts)
+    combined = f"{summary}\n{delta}" if summary else delta
+    if count_tokens(combined) < config.summary_threshold_tokens:
+        return combined
+
+    builder = ContextBuilder("summarizer")
+    delta = builder.add_text(delta, max_share=0.5)
+    summary = builder.add_text(summary)
+
+    logger.debug("Folding %s new observer thoughts into summary of %s characters", len(new_thoughts), len(summary))
+
+    fold_prompt = f"""Ты — помощник, который суммирует анализ наблюдателя за техническим интервью.
+
+    Тебе дано текущее резюме наблюдений и новые рассуждения наблюдателя по последним ответам кандидата.
+    Обнови резюме, встроив в него новые рассуждения. Сохрани:
+
+    1. По каждой теме/вопросу: что кандидат ответил правильно, а что неправильно
+    2. Ключевые ошибки и пробелы в знаниях
+    3. Сильные стороны кандидата
+    4. Какие темы были затронуты
+
+    ВАЖНО: Будь максимально лаконичным, но не теряй критически важную информацию для фидбэка.
+
+    Текущее резюме:
+    {summary or "(пока пусто)"}
+
+    Новые рассуждения наблюдателя:
+    {delta}"""
+
+    fold_messages = [
+        SystemMessage(content=fold_prompt),
+        HumanMessage(content="Верни обновлённое резюме целиком.")
+    ]
+
+    fold_result = await summarizer_agent.ainvoke({"messages": fold_messages})
+
+    updated = ""
+    for msg in reversed(fold_result.get("messages", [])):
+        if isinstance(msg, AIMessage):
+            updated = msg.content
+            break
+
+    if not updated:
+        raise ValueError("Summarizer returned empty summary")
+
+    logger.debug("Rolling summary updated: %s characters", len(updated))
+    return updated
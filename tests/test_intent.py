@@ -0,0 +1,47 @@
+import pytest
+
+from intent import Intent, IntentClassifier
+
+
+@pytest.fixture
+def classifier():
+    return IntentClassifier()
+
+
+@pytest.mark.parametrize("text", [
+    "Ок, сложность O(n log n)",
+    "Ага, dict на хэш-таблице",
+    "Спасибо! Ответ: через GIL",
+    "hi, используем asyncio.gather",
+    "Пропустим... нет, deque",
+    "Не знаю точно, но думаю, что GIL",
+])
+def test_short_substantive_answer_is_answer(classifier, text):
+    assert classifier.classify(text) == Intent.ANSWER
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("", Intent.EMPTY),
+    ("...", Intent.EMPTY),
+    ("Не знаю", Intent.DONT_KNOW),
+    ("Ну, честно говоря, не знаю.", Intent.DONT_KNOW),
+    ("Пропустим", Intent.DONT_KNOW),
+    ("Ок, не помню", Intent.DONT_KNOW),
+    ("Привет!", Intent.OFF_TOPIC),
+    ("Ок, спасибо", Intent.OFF_TOPIC),
+    ("Давай фидбэк", Intent.STOP),
+    ("Стоп, хватит, GIL это блокировка", Intent.STOP),
+])
+def test_trivial_answers(classifier, text, intent):
+    assert classifier.classify(text) == intent
+
+
+def test_long_answer_with_dont_know_is_answer(classifier):
+    text = "не знаю точно, но думаю, что GIL не даёт потокам выполнять байткод параллельно"
+    assert classifier.classify(text) == Intent.ANSWER
+
+
+def test_added_pattern_covers_answer(classifier):
+    assert classifier.classify("Салют!") == Intent.ANSWER
+    classifier.add_patterns(Intent.OFF_TOPIC, [r"салют"])
+    assert classifier.classify("Салют!") == Intent.OFF_TOPIC
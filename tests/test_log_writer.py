@@ -0,0 +1,61 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import log_writer
+from log_writer import JsonlLogWriter
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_flush_returns_after_fsync_error(tmp_path, monkeypatch):
+    writer = JsonlLogWriter(fsync_interval_s=0.05, compress_rotated=False)
+    path = str(tmp_path / "turns.jsonl")
+
+    def failing_fsync(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(log_writer.os, "fsync", failing_fsync)
+    writer.append(path, {"n": 1})
+    assert writer.flush(timeout=5)
+
+    # Поток писателя жив: следующие записи тоже доходят до файла
+    monkeypatch.undo()
+    writer.append(path, {"n": 2})
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert [record["n"] for record in _lines(path)] == [1, 2]
+
+
+def test_rotation_age_counts_from_first_record(tmp_path):
+    path = str(tmp_path / "runtime_traces.jsonl")
+    old_ts = (datetime.now() - timedelta(hours=2)).isoformat()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": old_ts}) + "\n")
+
+    # Новый процесс: файл уже старше окна ротации и должен ротироваться на первой записи
+    writer = JsonlLogWriter(rotate_interval_s=3600, compress_rotated=False)
+    writer.append(path, {"ts": datetime.now().isoformat()}, rotate=True)
+    writer.close()
+
+    rotated = [name for name in os.listdir(tmp_path) if name != "runtime_traces.jsonl"]
+    assert len(rotated) == 1
+    assert _lines(str(tmp_path / rotated[0])) == [{"ts": old_ts}]
+    assert len(_lines(path)) == 1
+
+
+def test_rotation_age_falls_back_to_mtime(tmp_path):
+    path = str(tmp_path / "plain.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"n": 0}) + "\n")
+    old = time.time() - 7200
+    os.utime(path, (old, old))
+
+    writer = JsonlLogWriter(rotate_interval_s=3600, compress_rotated=False)
+    writer.append(path, {"n": 1}, rotate=True)
+    writer.close()
+    assert len(os.listdir(tmp_path)) == 2
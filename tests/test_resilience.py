@@ -0,0 +1,181 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from config import config
+from metrics import collect_node_metrics, current_metrics
+from resilience import CircuitBreaker, ModelResilience
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+_REQUEST = SimpleNamespace(model=SimpleNamespace(model_name="m"))
+
+
+def _expire(breaker: CircuitBreaker) -> None:
+    breaker.opened_at -= breaker.recovery_s
+
+
+def _open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(config, "llm_retry_backoff_s", 0.001)
+    monkeypatch.setattr(config, "circuit_failure_threshold", 3)
+    monkeypatch.setattr(config, "circuit_recovery_s", 30.0)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("m", failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_allows_single_probe():
+    breaker = CircuitBreaker("m", failure_threshold=1)
+    _open_breaker(breaker)
+    _expire(breaker)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_probe_success_closes_breaker():
+    breaker = CircuitBreaker("m", failure_threshold=1)
+    _open_breaker(breaker)
+    _expire(breaker)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_probe_failure_reopens_breaker():
+    breaker = CircuitBreaker("m", failure_threshold=5)
+    _open_breaker(breaker)
+    _expire(breaker)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_released_probe_frees_slot_without_outcome():
+    breaker = CircuitBreaker("m", failure_threshold=1)
+    _open_breaker(breaker)
+    _expire(breaker)
+    failures = breaker.failures
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == "half_open"
+    assert breaker.failures == failures
+    assert breaker.allow()
+
+
+def _call(middleware, handler):
+    async def run():
+        with collect_node_metrics():
+            return await middleware.awrap_model_call(_REQUEST, handler)
+
+    return asyncio.run(run())
+
+
+def _raising(error: Exception):
+    async def handler(request):
+        raise error
+
+    return handler
+
+
+def test_non_retryable_probe_error_keeps_breaker_half_open():
+    resilience = ModelResilience()
+    middleware = resilience.middleware("observer", {"model": "m", "max_retries": 0})
+    breaker = resilience.breaker("m")
+    _open_breaker(breaker)
+    _expire(breaker)
+    failures = breaker.failures
+
+    with pytest.raises(_StatusError):
+        _call(middleware, _raising(_StatusError(400)))
+    assert breaker.state == "half_open"
+    assert breaker.failures == failures
+    assert breaker.allow()
+
+
+def test_non_retryable_errors_do_not_reset_failure_count():
+    resilience = ModelResilience()
+    middleware = resilience.middleware("observer", {"model": "m", "max_retries": 0})
+    for status in (503, 400, 503, 400, 503):
+        with pytest.raises(_StatusError):
+            _call(middleware, _raising(_StatusError(status)))
+    assert resilience.breaker("m").state == "open"
+
+
+def test_cancelled_probe_is_released():
+    resilience = ModelResilience()
+    middleware = resilience.middleware("observer", {"model": "m", "max_retries": 0})
+    breaker = resilience.breaker("m")
+    _open_breaker(breaker)
+    _expire(breaker)
+
+    async def hang(request):
+        await asyncio.sleep(10)
+
+    async def run():
+        with collect_node_metrics():
+            task = asyncio.create_task(middleware.awrap_model_call(_REQUEST, hang))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(run())
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_streamed_call_is_not_retried_after_first_token():
+    resilience = ModelResilience()
+    middleware = resilience.middleware("interviewer", {"model": "m", "max_retries": 3}, streamed=True)
+    calls = 0
+
+    async def fail_mid_stream(request):
+        nonlocal calls
+        calls += 1
+        current_metrics().set_once("ttft_ms", 1.0)
+        raise _StatusError(503)
+
+    with pytest.raises(_StatusError):
+        _call(middleware, fail_mid_stream)
+    assert calls == 1
+
+
+def test_streamed_call_is_retried_before_first_token():
+    resilience = ModelResilience()
+    middleware = resilience.middleware("interviewer", {"model": "m", "max_retries": 2}, streamed=True)
+    calls = 0
+
+    async def flaky(request):
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise _StatusError(503)
+        return "ok"
+
+    assert _call(middleware, flaky) == "ok"
+    assert calls == 3
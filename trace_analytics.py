@@ -0,0 +1,346 @@
+"""Анализ runtime-трейсов: перцентили латентности узлов, ошибки, расход, медленные сессии.
+
+Читает `runtime_traces.jsonl` вместе с ротированными файлами, в том числе
+сжатыми zstd. Длительности берутся из событий `end`, число входных сообщений —
+из парного события `start` того же узла и сессии.
+
+Запуск:
+    python trace_analytics.py                       # все трейсы в ./logs/
+    python trace_analytics.py logs/runtime_traces.20250101-120000.jsonl.zst --top 20
+    python trace_analytics.py --json > report.json
+"""
+import argparse
+import glob
+import io
+import json
+import logging
+import os
+import sys
+from collections import defaultdict
+from typing import Iterable, Iterator
+
+from logger import LOGS_DIR
+from metrics import percentile
+
+
+logger = logging.getLogger(__name__)
+
+TRACE_GLOB = "runtime_traces*.jsonl*"
+PERCENTILES = (50, 90, 99)
+# Границы корзин (включительно) для зависимости латентности от turn_count и input_messages
+TURN_BUCKETS = (5, 10, 20, 50)
+MESSAGE_BUCKETS = (10, 20, 50, 100)
+# Счётчики resilience.py в trace-событиях узлов
+RESILIENCE_FIELDS = ("llm_retries", "llm_hedges", "llm_hedge_wins", "circuit_rejected", "deadline_exceeded")
+
+
+def bucket_label(value: int | None, bounds: tuple[int, ...]) -> str:
+    if value is None:
+        return "?"
+    low = 0
+    for high in bounds:
+        if value <= high:
+            return f"{low}-{high}"
+        low = high + 1
+    return f"{low}+"
+
+
+def bucket_order(bounds: tuple[int, ...]) -> list[str]:
+    return [bucket_label(0, bounds)] + [bucket_label(b + 1, bounds) for b in bounds] + ["?"]
+
+
+def trace_files(paths: list[str]) -> list[str]:
+    """Файлы трейсов по путям (каталоги раскрываются), от старых ротированных к текущему."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, TRACE_GLOB)))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            logger.warning("Файл трейсов не найден: %s", path)
+    # Текущий файл (без суффикса ротации) — самый свежий
+    return sorted(set(files), key=lambda p: (os.path.basename(p).count(".") == 1, p))
+
+
+def _open_text(path: str) -> io.TextIOBase:
+    if path.endswith(".zst"):
+        import zstandard
+
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def read_events(files: Iterable[str]) -> Iterator[dict]:
+    for path in files:
+        with _open_text(path) as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Оборванная последняя строка после падения процесса
+                    logger.warning("Пропущена повреждённая строка %s:%s", path, line_no)
+
+
+class TraceStats:
+    """Агрегаты по потоку trace-событий."""
+
+    def __init__(self):
+        self.durations: dict[str, list[int]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.cancelled: dict[str, int] = defaultdict(int)
+        self.tokens: dict[str, int] = defaultdict(int)
+        # Входные токены и их часть, взятая из кэша промптов провайдера (prompt_assembly.py)
+        self.prompt_tokens: dict[str, int] = defaultdict(int)
+        self.cached_tokens: dict[str, int] = defaultdict(int)
+        self.cost_usd: dict[str, float] = defaultdict(float)
+        self.resilience: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        # Ожидание общего rate limiter (rate_limiter.py) на каждом завершении узла
+        self.rate_limit_wait: dict[str, list[int]] = defaultdict(list)
+        self.by_turn: dict[str, dict[str, list[int]]] = defaultdict(lambda: defaultdict(list))
+        self.by_messages: dict[str, dict[str, list[int]]] = defaultdict(lambda: defaultdict(list))
+        self.sessions: dict[str, dict] = defaultdict(
+            lambda: {"node_ms": defaultdict(int), "turns": set(), "errors": 0, "slowest": None}
+        )
+        # Время внутри вызовов модели, ошибки моделей и расход по (узел, модель)
+        self.models: dict[tuple, dict] = defaultdict(lambda: {"llm_ms": [], "llm_errors": 0, "cost_usd": 0.0})
+        # Последнее событие start по (session_id, node): из него берётся input_messages
+        self._starts: dict[tuple, dict] = {}
+
+    def add(self, event: dict) -> None:
+        node = event.get("node")
+        phase = event.get("phase")
+        key = (event.get("session_id"), node)
+        if phase == "start":
+            self._starts[key] = event
+            return
+        if phase not in ("end", "error", "cancelled"):
+            return
+        start = self._starts.pop(key, {})
+        # Токены и деньги тратятся и на отменённых и упавших вызовах
+        self.tokens[node] += event.get("prompt_tokens", 0) + event.get("completion_tokens", 0)
+        self.prompt_tokens[node] += event.get("prompt_tokens", 0)
+        self.cached_tokens[node] += event.get("cached_tokens", 0)
+        self.cost_usd[node] += event.get("cost_usd", 0)
+        for field in RESILIENCE_FIELDS:
+            self.resilience[node][field] += event.get(field, 0)
+        self.rate_limit_wait[node].append(event.get("rate_limit_wait_ms", 0))
+        if event.get("model"):
+            model = self.models[(node, event["model"])]
+            model["llm_ms"].append(event.get("llm_ms", 0))
+            model["llm_errors"] += event.get("llm_errors", 0)
+            model["cost_usd"] += event.get("cost_usd", 0)
+        if phase == "cancelled":
+            self.cancelled[node] += 1
+            return
+
+        session = self.sessions[event.get("session_id") or "?"]
+        if event.get("turn_count") is not None:
+            session["turns"].add(event["turn_count"])
+        if phase == "error":
+            self.errors[node] += 1
+            session["errors"] += 1
+            return
+
+        duration = event.get("duration_ms")
+        if duration is None:
+            return
+        self.durations[node].append(duration)
+        self.by_turn[node][bucket_label(event.get("turn_count"), TURN_BUCKETS)].append(duration)
+        self.by_messages[node][bucket_label(start.get("input_messages"), MESSAGE_BUCKETS)].append(duration)
+        session["node_ms"][node] += duration
+        if session["slowest"] is None or duration > session["slowest"][1]:
+            session["slowest"] = (node, duration)
+
+    def node_report(self) -> list[dict]:
+        rows = []
+        for node in sorted(set(self.durations) | set(self.errors) | set(self.cancelled)):
+            durations = self.durations.get(node, [])
+            finished = len(durations) + self.errors.get(node, 0)
+            row = {
+                "node": node,
+                "count": len(durations),
+                "errors": self.errors.get(node, 0),
+                "error_rate": round(self.errors.get(node, 0) / finished, 4) if finished else None,
+                "cancelled": self.cancelled.get(node, 0),
+                "tokens": self.tokens.get(node, 0),
+                "prompt_tokens": self.prompt_tokens.get(node, 0),
+                "cached_tokens": self.cached_tokens.get(node, 0),
+                "cached_share": (
+                    round(self.cached_tokens[node] / self.prompt_tokens[node], 4) if self.prompt_tokens.get(node) else None
+                ),
+                "cost_usd": round(self.cost_usd.get(node, 0), 6),
+                **{field: self.resilience[node][field] for field in RESILIENCE_FIELDS},
+            }
+            waits = self.rate_limit_wait.get(node, [])
+            row["rate_limited"] = sum(1 for wait in waits if wait)
+            row["p50_wait_ms"] = percentile(waits, 50) if waits else None
+            row["p90_wait_ms"] = percentile(waits, 90) if waits else None
+            row["max_wait_ms"] = max(waits) if waits else None
+            for q in PERCENTILES:
+                row[f"p{q}_ms"] = percentile(durations, q) if durations else None
+            row["max_ms"] = max(durations) if durations else None
+            rows.append(row)
+        return rows
+
+    def model_report(self) -> list[dict]:
+        """Латентность и расход по моделям узлов (профили Config.model_profiles, запасные модели)."""
+        rows = []
+        for (node, model), data in sorted(self.models.items()):
+            row = {
+                "node": node,
+                "model": model,
+                "count": len(data["llm_ms"]),
+                "llm_errors": data["llm_errors"],
+                "cost_usd": round(data["cost_usd"], 6),
+            }
+            for q in PERCENTILES[:2]:
+                row[f"p{q}_llm_ms"] = percentile(data["llm_ms"], q)
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _bucket_report(groups: dict[str, dict[str, list[int]]], bounds: tuple[int, ...]) -> dict:
+        return {
+            node: [
+                {
+                    "bucket": label,
+                    "count": len(groups[node][label]),
+                    "p50_ms": percentile(groups[node][label], 50),
+                    "p90_ms": percentile(groups[node][label], 90),
+                }
+                for label in bucket_order(bounds)
+                if groups[node].get(label)
+            ]
+            for node in sorted(groups)
+        }
+
+    @staticmethod
+    def _session_total_ms(node_ms: dict[str, int]) -> int:
+        # В pipeline-режиме узел "turn" уже включает вложенные observer и interviewer
+        nested = ("observer", "interviewer") if "turn" in node_ms else ()
+        return sum(ms for node, ms in node_ms.items() if node not in nested)
+
+    def session_report(self, top: int) -> list[dict]:
+        rows = [
+            {
+                "session_id": session_id,
+                "turns": len(data["turns"]),
+                "total_ms": self._session_total_ms(data["node_ms"]),
+                "errors": data["errors"],
+                "slowest_node": data["slowest"][0] if data["slowest"] else None,
+                "slowest_ms": data["slowest"][1] if data["slowest"] else None,
+            }
+            for session_id, data in self.sessions.items()
+        ]
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows[:top]
+
+    def report(self, top: int) -> dict:
+        return {
+            "nodes": self.node_report(),
+            "models": self.model_report(),
+            "latency_by_turn_count": self._bucket_report(self.by_turn, TURN_BUCKETS),
+            "latency_by_input_messages": self._bucket_report(self.by_messages, MESSAGE_BUCKETS),
+            "slowest_sessions": self.session_report(top),
+        }
+
+
+def analyze(files: Iterable[str], top: int = 10) -> dict:
+    stats = TraceStats()
+    for event in read_events(files):
+        stats.add(event)
+    return stats.report(top)
+
+
+def _fmt(value, column: str = "") -> str:
+    if value is None:
+        return "-"
+    if column in ("error_rate", "cached_share"):
+        return f"{value:.2%}"
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return str(value)
+
+
+def _print_table(title: str, rows: list[dict], columns: list[str]) -> None:
+    print(f"\n{title}")
+    if not rows:
+        print("  (нет данных)")
+        return
+    widths = [max(len(column), *(len(_fmt(row[column], column)) for row in rows)) for column in columns]
+    print("  " + "  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  " + "  ".join(_fmt(row[column], column).rjust(width) for column, width in zip(columns, widths)))
+
+
+def print_report(report: dict) -> None:
+    _print_table(
+        "Латентность узлов, мс",
+        report["nodes"],
+        ["node", "count", "p50_ms", "p90_ms", "p99_ms", "max_ms", "errors", "error_rate", "cancelled", "tokens", "cost_usd"],
+    )
+    _print_table(
+        "Устойчивость вызовов моделей (resilience.py)",
+        [row for row in report["nodes"] if any(row[field] for field in RESILIENCE_FIELDS)],
+        ["node", *RESILIENCE_FIELDS],
+    )
+    _print_table(
+        "Кэш промптов провайдера (prompt_assembly.py)",
+        [row for row in report["nodes"] if row["prompt_tokens"]],
+        ["node", "prompt_tokens", "cached_tokens", "cached_share"],
+    )
+    _print_table(
+        "Ожидание rate limiter, мс (rate_limiter.py)",
+        [row for row in report["nodes"] if row["rate_limited"]],
+        ["node", "count", "rate_limited", "p50_wait_ms", "p90_wait_ms", "max_wait_ms"],
+    )
+    _print_table(
+        "Модели узлов: время внутри вызовов, мс",
+        report["models"],
+        ["node", "model", "count", "p50_llm_ms", "p90_llm_ms", "llm_errors", "cost_usd"],
+    )
+    for key, title, bounds in (
+        ("latency_by_turn_count", "turn_count", TURN_BUCKETS),
+        ("latency_by_input_messages", "input_messages", MESSAGE_BUCKETS),
+    ):
+        # Сводная таблица: строки — корзины, колонки — узлы, в ячейках p50/p90
+        nodes = list(report[key])
+        cells: dict[str, dict] = {}
+        for node, rows in report[key].items():
+            for row in rows:
+                cells.setdefault(row["bucket"], {title: row["bucket"]})[node] = f"{row['p50_ms']}/{row['p90_ms']}"
+        rows = [{**{node: None for node in nodes}, **cells[label]} for label in bucket_order(bounds) if label in cells]
+        _print_table(f"Латентность p50/p90, мс, по {title}", rows, [title, *nodes])
+    _print_table(
+        "Самые медленные сессии",
+        report["slowest_sessions"],
+        ["session_id", "turns", "total_ms", "errors", "slowest_node", "slowest_ms"],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[LOGS_DIR], help="файлы трейсов или каталоги")
+    parser.add_argument("--top", type=int, default=10, help="сколько медленных сессий показать")
+    parser.add_argument("--json", action="store_true", help="вывести отчёт в JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[logging.StreamHandler(sys.stderr)])
+    files = trace_files(args.paths)
+    if not files:
+        logger.info("[Система]: Файлы трейсов не найдены: %s", ", ".join(args.paths))
+        sys.exit(1)
+
+    report = analyze(files, args.top)
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()